@@ -2,8 +2,10 @@ from django.contrib import admin
 from .models import (
     OrganizerRequest,
     Coupon,
+    CouponRedemption,
     Badge,
     UserBadge,
+    BadgeProgress,
     SubscriptionPlan,
     UserSubscription,
     RevenueDistribution,
@@ -12,8 +14,10 @@ from .models import (
 
 admin.site.register(OrganizerRequest)
 admin.site.register(Coupon)
+admin.site.register(CouponRedemption)
 admin.site.register(Badge)
 admin.site.register(UserBadge)
+admin.site.register(BadgeProgress)
 admin.site.register(SubscriptionPlan)
 admin.site.register(UserSubscription)
 admin.site.register(RevenueDistribution)
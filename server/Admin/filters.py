@@ -1,6 +1,7 @@
 import django_filters
 from .models import RevenueDistribution, UserSubscription
 from event.models import Event
+from event.search import trigram_search
 from users.models import Booking, WalletTransaction
 from django.db.models import Q
 from datetime import datetime, timedelta
@@ -21,9 +22,8 @@ class RevenueDistributionFilter(django_filters.FilterSet):
         fields = ["search", "date_range", "start_date", "end_date", "event_type"]
 
     def filter_search(self, queryset, name, value):
-        return queryset.filter(
-            Q(event__event_title__icontains=value)
-            | Q(event__organizer__username__icontains=value)
+        return trigram_search(
+            queryset, value, ["event__event_title", "event__organizer__username"]
         )
 
     def filter_date_range(self, queryset, name, value):
@@ -83,9 +83,7 @@ class BookingFilterHistory(django_filters.FilterSet):
         ]
 
     def filter_search(self, queryset, name, value):
-        return queryset.filter(
-            Q(event__event_title__icontains=value) | Q(user__username__icontains=value)
-        )
+        return trigram_search(queryset, value, ["event__event_title", "user__username"])
 
     def filter_date_range(self, queryset, name, value):
         today = datetime.now()
@@ -51,12 +51,6 @@ class Coupon(models.Model):
     used_count = models.PositiveIntegerField(
         default=0, help_text="How many times this coupon has been used"
     )
-    used_by = models.ManyToManyField(
-        Profile,
-        blank=True,
-        related_name="used_coupons",
-        help_text="Users who have used this coupon",
-    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -64,6 +58,38 @@ class Coupon(models.Model):
         return f"{self.code} - {self.title}"
 
 
+class CouponRedemption(models.Model):
+    """
+    One row per user who has used a coupon; the unique constraint is what
+    stops a user from redeeming it twice (see users.utils.coupon_utils).
+    """
+
+    coupon = models.ForeignKey(
+        Coupon, on_delete=models.CASCADE, related_name="redemptions"
+    )
+    user = models.ForeignKey(
+        Profile, on_delete=models.CASCADE, related_name="coupon_redemptions"
+    )
+    booking = models.ForeignKey(
+        "users.Booking",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="coupon_redemptions",
+    )
+    redeemed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["coupon", "user"], name="coupon_redemption_once_per_user"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.coupon.code}"
+
+
 class Badge(models.Model):
     """
     Stores badge definitions created by the admin.
@@ -121,6 +147,25 @@ class UserBadge(models.Model):
         return f"{self.user.username} - {self.badge.name}"
 
 
+class BadgeProgress(models.Model):
+    """
+    Per-user counters behind the badge criteria, one field per
+    ``Badge.criteria_type``. Kept current by services.badge_service so a
+    badge can be awarded when a counter crosses its target, without
+    recounting the source tables.
+    """
+
+    user = models.OneToOneField(
+        Profile, on_delete=models.CASCADE, related_name="badge_progress"
+    )
+    event_attended = models.PositiveIntegerField(default=0)
+    event_created = models.PositiveIntegerField(default=0)
+    feedback_given = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username} badge progress"
+
+
 class RefundTicket(models.Model):
     REFUND_STATUS_CHOICES = [
         ("Pending", "Pending"),
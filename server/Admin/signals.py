@@ -1,9 +1,23 @@
-from django.db.models.signals import post_migrate
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.dispatch import receiver
-from .models import SubscriptionPlan
+from users.utils.coupon_utils import invalidate_coupon
+from services.badge_service import invalidate_targets
+from .models import Badge, Coupon, SubscriptionPlan
 
 
 @receiver(post_migrate)
 def create_default_plans(sender, **kwargs):
     if sender.name == "Admin" or sender.label == "Admin":
         SubscriptionPlan.ensure_default_plans()
+
+
+@receiver([post_save, post_delete], sender=Coupon)
+def invalidate_coupon_cache(sender, instance, **kwargs):
+    code = instance.code
+    transaction.on_commit(lambda: invalidate_coupon(code))
+
+
+@receiver([post_save, post_delete], sender=Badge)
+def invalidate_badge_targets(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_targets)
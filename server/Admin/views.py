@@ -46,11 +46,11 @@ from .paginations import (
     SubscriptionPagination,
 )
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 from rest_framework.viewsets import ModelViewSet
 from event.models import *
 from .permissions import IsAdminUser
 from users.permissions import IsActiveUser
+from services import outbox_service
 import logging
 from django.db.models.functions import TruncDate
 from io import BytesIO
@@ -176,42 +176,44 @@ class OrganizerRequestUpdateStatus(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            organizer_request.status = new_status
-            organizer_request.handled_at = timezone.now()
-            organizer_request.admin_notes = admin_notes
-            organizer_request.save()
-
-            user_profile = organizer_request.user
-
-            if new_status == "approved":
-                user_profile.organizerVerified = True
-                notification_message = "Your organizer request has been approved! You can now create events."
-            elif new_status == "rejected":
-                user_profile.organizerVerified = False
-                if admin_notes:
-                    notification_message = f"Your organizer request has been rejected. Reason: {admin_notes}"
-                else:
-                    notification_message = "Your organizer request has been rejected. Please contact support for more information."
-            elif new_status == "pending":
-                user_profile.organizerVerified = False
-                notification_message = "Your organizer request is pending review."
-            user_profile.save()
-
-            from users.tasks import send_user_notification
-
-            send_user_notification.delay(user_profile.id, notification_message)
-
-            from chat.socketio_server import send_status_update_to_organizer
-
-            status_data = {
-                "type": "organizer_status_update",
-                "status": new_status,
-                "admin_notes": admin_notes,
-                "organizerVerified": user_profile.organizerVerified,
-                "message": notification_message,
-            }
+            with transaction.atomic():
+                organizer_request.status = new_status
+                organizer_request.handled_at = timezone.now()
+                organizer_request.admin_notes = admin_notes
+                organizer_request.save()
+
+                user_profile = organizer_request.user
+
+                if new_status == "approved":
+                    user_profile.organizerVerified = True
+                    notification_message = "Your organizer request has been approved! You can now create events."
+                elif new_status == "rejected":
+                    user_profile.organizerVerified = False
+                    if admin_notes:
+                        notification_message = f"Your organizer request has been rejected. Reason: {admin_notes}"
+                    else:
+                        notification_message = "Your organizer request has been rejected. Please contact support for more information."
+                elif new_status == "pending":
+                    user_profile.organizerVerified = False
+                    notification_message = "Your organizer request is pending review."
+                user_profile.save()
+
+                from users.tasks import send_user_notification
+
+                outbox_service.enqueue(
+                    send_user_notification, user_profile.id, notification_message
+                )
 
-            async_to_sync(send_status_update_to_organizer)(user_profile.id, status_data)
+                status_data = {
+                    "type": "organizer_status_update",
+                    "status": new_status,
+                    "admin_notes": admin_notes,
+                    "organizerVerified": user_profile.organizerVerified,
+                    "message": notification_message,
+                }
+                outbox_service.publish_to_user(
+                    user_profile.id, "organizer_status_update", status_data
+                )
 
             serializer = OrganizerRequestSerializer(organizer_request)
             return Response(serializer.data)
@@ -244,35 +246,40 @@ class OrganizerRequestBulkUpdate(APIView):
         )
 
         from users.tasks import send_user_notification
-        from chat.socketio_server import send_status_update_to_organizer
 
         updated_count = 0
         for request in requests:
-            request.status = new_status
-            request.handled_at = timezone.now()
-            request.save()
-
-            user_profile = request.user
-
-            if new_status == "approved":
-                user_profile.organizerVerified = True
-                notification_message = "Your organizer request has been approved! You can now create events."
-            elif new_status == "rejected":
-                user_profile.organizerVerified = False
-                notification_message = "Your organizer request has been rejected. Please contact support for more information."
+            # Each update commits together with its notifications.
+            with transaction.atomic():
+                request.status = new_status
+                request.handled_at = timezone.now()
+                request.save()
+
+                user_profile = request.user
+
+                if new_status == "approved":
+                    user_profile.organizerVerified = True
+                    notification_message = "Your organizer request has been approved! You can now create events."
+                elif new_status == "rejected":
+                    user_profile.organizerVerified = False
+                    notification_message = "Your organizer request has been rejected. Please contact support for more information."
 
-            user_profile.save()
+                user_profile.save()
 
-            send_user_notification.delay(user_profile.id, notification_message)
+                outbox_service.enqueue(
+                    send_user_notification, user_profile.id, notification_message
+                )
 
-            status_data = {
-                "type": "organizer_status_update",
-                "status": new_status,
-                "admin_notes": request.admin_notes or "",
-                "organizerVerified": user_profile.organizerVerified,
-                "message": notification_message,
-            }
-            async_to_sync(send_status_update_to_organizer)(user_profile.id, status_data)
+                status_data = {
+                    "type": "organizer_status_update",
+                    "status": new_status,
+                    "admin_notes": request.admin_notes or "",
+                    "organizerVerified": user_profile.organizerVerified,
+                    "message": notification_message,
+                }
+                outbox_service.publish_to_user(
+                    user_profile.id, "organizer_status_update", status_data
+                )
 
             updated_count += 1
 
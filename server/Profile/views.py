@@ -15,7 +15,9 @@ from django.utils import timezone
 from event.models import Event, Review
 from users.tasks import send_user_notification
 from chat.models import Conversation
+from django.db import transaction
 from django.db.models import Q
+from services import outbox_service
 
 
 class UserProfile(APIView):
@@ -117,21 +119,24 @@ class FollowView(APIView):
                     )
 
                 follow_status = "accepted" if has_premium else "pending"
-                follow = Follow.objects.create(
-                    follower=request.user, followed=followed_user, status=follow_status
-                )
+                with transaction.atomic():
+                    follow = Follow.objects.create(
+                        follower=request.user,
+                        followed=followed_user,
+                        status=follow_status,
+                    )
+                    if follow_status == "pending":
+                        outbox_service.enqueue(
+                            send_user_notification,
+                            followed_user.id,
+                            f"{request.user.username} send a following request",
+                        )
 
                 message = (
                     "Followed successfully."
                     if follow_status == "accepted"
                     else "Follow request sent."
                 )
-                if follow_status == "pending":
-                    send_user_notification.delay(
-                        followed_user.id,
-                        f"{request.user.username} send a following request",
-                    )
-
                 return Response(
                     {"message": message, "status": follow_status},
                     status=status.HTTP_201_CREATED,
@@ -201,6 +206,7 @@ class FollowRequestDetail(APIView):
                 {"error": "Follow request not found."}, status=status.HTTP_404_NOT_FOUND
             )
 
+    @transaction.atomic
     def accept_follow_request(self, request, follow_request):
         follow_request.status = "accepted"
         follow_request.save()
@@ -218,18 +224,19 @@ class FollowRequestDetail(APIView):
             convo.participants.set([follower_profile, followed_profile])
             convo.save()
         message = f"{followed_profile.username} accepted your follow request."
-        send_user_notification.delay(follower_profile.id, message)
+        outbox_service.enqueue(send_user_notification, follower_profile.id, message)
         return Response(
             {"message": "request accepted successfully"}, status=status.HTTP_200_OK
         )
 
+    @transaction.atomic
     def reject_follow_request(self, follow_request):
         follow_request.status = "rejected"
         follow_request.save()
         follower_profile = follow_request.follower
         followed_profile = follow_request.followed
         message = f"{followed_profile.username} rejected your follow request."
-        send_user_notification.delay(follower_profile.id, message)
+        outbox_service.enqueue(send_user_notification, follower_profile.id, message)
         return Response(
             {"message": "request reject successfully"}, status=status.HTTP_200_OK
         )
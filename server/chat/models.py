@@ -38,6 +38,7 @@ class Message(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     read = models.BooleanField(default=False)
     is_image = models.BooleanField(default=False)
+    image_variants = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return f"Message from {self.sender.username}"
@@ -84,6 +85,7 @@ class GroupMessage(models.Model):
         Profile, related_name="read_group_messages", blank=True
     )
     is_image = models.BooleanField(default=False)
+    image_variants = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return f"Group Message from {self.sender.username} in {self.conversation.name}"
@@ -1,11 +1,14 @@
 from rest_framework import serializers
 from .models import *
+from event.serializers import ImageVariantsField
 
 
 class UserListSerializer(serializers.ModelSerializer):
+    profile_picture_variants = ImageVariantsField()
+
     class Meta:
         model = Profile
-        fields = ["id", "username", "profile_picture"]
+        fields = ["id", "username", "profile_picture", "profile_picture_variants"]
 
 
 class ConversationSerializer(serializers.ModelSerializer):
@@ -38,6 +41,7 @@ class ConversationSerializer(serializers.ModelSerializer):
 
 class MessageSerializer(serializers.ModelSerializer):
     sender = UserListSerializer()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Message
@@ -49,6 +53,7 @@ class MessageSerializer(serializers.ModelSerializer):
             "timestamp",
             "read",
             "is_image",
+            "image_variants",
         ]
 
 
@@ -101,6 +106,7 @@ class GroupConversationSerializer(serializers.ModelSerializer):
 
 class GroupMessageSerializer(serializers.ModelSerializer):
     sender = UserListSerializer()
+    image_variants = ImageVariantsField()
     read_by_count = serializers.SerializerMethodField()
 
     class Meta:
@@ -113,6 +119,7 @@ class GroupMessageSerializer(serializers.ModelSerializer):
             "timestamp",
             "read_by_count",
             "is_image",
+            "image_variants",
         ]
 
     def get_read_by_count(self, obj):
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from event.tasks import generate_image_variants
+from .models import Message, GroupMessage
+
+
+@receiver(post_save, sender=Message)
+@receiver(post_save, sender=GroupMessage)
+def queue_chat_image_variants(sender, instance, created, **kwargs):
+    if created and instance.is_image:
+        source = "chat_image" if sender is Message else "group_chat_image"
+        transaction.on_commit(
+            lambda: generate_image_variants.delay(source, instance.pk)
+        )
@@ -57,11 +57,14 @@ def _redis_listener_thread():
 
                     room_name = data.get("room")
                     notification_data = data.get("data")
+                    # Plain notifications by default; waiting room updates
+                    # and the like name their own socket event.
+                    event_name = data.get("event", "notification")
 
                     if room_name and notification_data and main_event_loop:
                         # Schedule async emit in the main event loop
                         future = asyncio.run_coroutine_threadsafe(
-                            sio.emit("notification", notification_data, room=room_name),
+                            sio.emit(event_name, notification_data, room=room_name),
                             main_event_loop,
                         )
                         try:
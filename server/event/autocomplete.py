@@ -0,0 +1,208 @@
+"""
+Prefix index for the explore search box.
+
+Titles, cities, venues and organizer usernames of published upcoming events
+are kept in one Redis sorted set per kind. Every member has score 0 and
+reads ``"<normalized phrase>\\x00<display text>"``, so ZRANGEBYLEX returns
+the phrases starting with a prefix in a single call. Titles and venues are
+also indexed from each later word, so "nig" finds "Jazz Night". A hash per
+kind counts the events behind each display text and ranks the matches.
+
+Publishing an event adds its terms right away. Any other change to a
+published event (edit, unpublish, delete) queues a full rebuild, which is
+also scheduled periodically to drop events that have started.
+"""
+
+import logging
+import unicodedata
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+from django_redis import get_redis_connection
+from .filters import day_start
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+KINDS = {
+    "titles": "event_title",
+    "cities": "city",
+    "venues": "venue_name",
+    "organizers": "organizer__username",
+}
+# Kinds whose later words are indexed too.
+WORD_KINDS = {"titles", "venues"}
+MAX_WORDS = 6
+SCAN_LIMIT = 50
+DEFAULT_LIMIT = 5
+SEPARATOR = "\x00"
+REBUILD_LOCK_KEY = "autocomplete:rebuild:queued"
+REBUILD_DEBOUNCE = 10
+
+
+def index_key(kind):
+    return f"autocomplete:{kind}"
+
+
+def weights_key(kind):
+    return f"autocomplete:{kind}:weights"
+
+
+def upcoming_events():
+    return Event.objects.filter(
+        is_published=True, starts_at__gte=day_start(timezone.now().date())
+    )
+
+
+def normalize(text):
+    """
+    Casefolded words of ``text`` separated by single spaces. Accents on
+    Latin letters are dropped, so "Café" and "cafe" share a prefix; letters
+    and marks of other scripts are kept as they are.
+    """
+    chars = []
+    for char in unicodedata.normalize("NFKD", (text or "").casefold()):
+        if unicodedata.category(char).startswith("M"):
+            if chars and chars[-1].isascii():
+                continue
+            chars.append(char)
+        else:
+            chars.append(char if char.isalnum() else " ")
+    return " ".join("".join(chars).split())
+
+
+def phrases(kind, text):
+    """
+    Normalized phrases ``text`` is found under.
+    """
+    normalized = normalize(text)
+    if not normalized:
+        return []
+    if kind not in WORD_KINDS:
+        return [normalized]
+    words = normalized.split()
+    return [" ".join(words[start:]) for start in range(min(len(words), MAX_WORDS))]
+
+
+def members(kind, text):
+    return [f"{phrase}{SEPARATOR}{text}" for phrase in phrases(kind, text)]
+
+
+def rebuild():
+    """
+    Replace the whole index with the terms of currently upcoming events.
+    """
+    redis_conn = get_redis_connection("default")
+    events = upcoming_events()
+    pipe = redis_conn.pipeline()
+    total = 0
+    for kind, field in KINDS.items():
+        weights = dict(
+            events.exclude(**{field: ""})
+            .values_list(field)
+            .annotate(events=Count("id", distinct=True))
+            .values_list(field, "events")
+        )
+        pipe.delete(index_key(kind), weights_key(kind))
+        entries = {
+            member: 0 for text in weights for member in members(kind, text.strip())
+        }
+        if entries:
+            pipe.zadd(index_key(kind), entries)
+            pipe.hset(
+                weights_key(kind),
+                mapping={text.strip(): count for text, count in weights.items()},
+            )
+        total += len(weights)
+    # MULTI/EXEC, so readers never see a half-built index.
+    pipe.execute()
+    return total
+
+
+def add_event(event):
+    """
+    Index a newly published event without waiting for a rebuild.
+    """
+    values = {
+        "titles": event.event_title,
+        "cities": event.city,
+        "venues": event.venue_name,
+        "organizers": event.organizer.username,
+    }
+    pipe = get_redis_connection("default").pipeline()
+    for kind, text in values.items():
+        text = (text or "").strip()
+        entries = {member: 0 for member in members(kind, text)}
+        if entries:
+            pipe.zadd(index_key(kind), entries)
+            pipe.hsetnx(weights_key(kind), text, 1)
+    pipe.execute()
+
+
+def queue_rebuild():
+    from .tasks import rebuild_autocomplete_index
+
+    # Collapse bursts of edits into a single rebuild.
+    if cache.add(REBUILD_LOCK_KEY, True, REBUILD_DEBOUNCE):
+        rebuild_autocomplete_index.apply_async(countdown=REBUILD_DEBOUNCE)
+
+
+def lookup(redis_conn, prefix):
+    start = f"[{prefix}".encode()
+    end = start + b"\xff"
+    pipe = redis_conn.pipeline(transaction=False)
+    for kind in KINDS:
+        pipe.zrangebylex(index_key(kind), start, end, start=0, num=SCAN_LIMIT)
+    matches = {}
+    for kind, found in zip(KINDS, pipe.execute()):
+        texts = []
+        for member in found:
+            text = member.decode().split(SEPARATOR, 1)[1]
+            if text not in texts:
+                texts.append(text)
+        matches[kind] = texts
+    return matches
+
+
+def suggest(query, limit=DEFAULT_LIMIT):
+    """
+    ``{kind: [text, ...]}`` with up to ``limit`` matches per kind, the texts
+    shared by the most upcoming events first.
+    """
+    prefix = normalize(query)
+    if not prefix:
+        return {kind: [] for kind in KINDS}
+    try:
+        redis_conn = get_redis_connection("default")
+        matches = lookup(redis_conn, prefix)
+        pipe = redis_conn.pipeline(transaction=False)
+        for kind, texts in matches.items():
+            pipe.hmget(weights_key(kind), texts or [""])
+        weights = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Autocomplete index unavailable: {e}")
+        return suggest_from_database(prefix, limit)
+
+    results = {}
+    for (kind, texts), counts in zip(matches.items(), weights):
+        ranked = sorted(
+            zip(texts, counts), key=lambda item: (-int(item[1] or 0), item[0].lower())
+        )
+        results[kind] = [text for text, _ in ranked[:limit]]
+    return results
+
+
+def suggest_from_database(prefix, limit):
+    """
+    Slower fallback used while Redis is unreachable.
+    """
+    events = upcoming_events()
+    return {
+        kind: list(
+            events.filter(**{f"{field}__istartswith": prefix})
+            .values_list(field, flat=True)
+            .distinct()
+            .order_by(field)[:limit]
+        )
+        for kind, field in KINDS.items()
+    }
@@ -0,0 +1,323 @@
+"""
+Bulk creation of events for organizers who run recurring series.
+
+A batch is either a list of rows in the EventCreateView format (JSON or CSV
+with a JSON ``tickets`` column) or a clone of one event onto a list of
+dates. Every row is validated before anything is written. The events, their
+tickets and their group chats are then inserted with bulk_create in one
+transaction, and the subscription usage counter is charged once for the
+batch. Images are referenced by URL: a clone reuses the source event's
+variants, and any other image gets its variants built after commit.
+Batches above INLINE_LIMIT run in the import_events task, which reports
+progress through the job record kept in the cache.
+"""
+
+import csv
+import io
+import json
+import uuid
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from Admin.models import UserSubscription
+from chat.models import GroupConversation
+from services.badge_service import record_progress
+from . import autocomplete
+from . import cache as event_cache
+from . import media
+from .models import Event, Ticket
+from .search import rebuild_search_vectors
+from .serializers import EventImportSerializer
+
+MAX_EVENTS = 500
+INLINE_LIMIT = 10
+CHUNK_SIZE = 100
+JOB_TIMEOUT = 60 * 60 * 24
+
+
+class BulkImportError(Exception):
+    def __init__(self, message, errors=None, status=400):
+        super().__init__(message)
+        self.errors = errors or {}
+        self.status = status
+
+
+def parse_csv(upload):
+    reader = csv.DictReader(io.StringIO(upload.read().decode("utf-8-sig")))
+    # Empty cells mean "not given" so optional fields keep their defaults.
+    return [
+        {key.strip(): value for key, value in row.items() if key and value}
+        for row in reader
+    ]
+
+
+def clone_rows(event, dates):
+    """
+    One import row per date, copying the event, its tickets and its images.
+    """
+    row = dict(EventImportSerializer(event).data)
+    row["tickets"] = json.dumps(
+        [
+            {
+                "ticketType": ticket.ticket_type,
+                "ticketPrice": str(ticket.price),
+                "ticketQuantity": ticket.quantity,
+                "ticketDescription": ticket.description or "",
+            }
+            for ticket in event.tickets.all()
+        ]
+    )
+    length = event.end_date - event.start_date if event.end_date else None
+
+    rows = []
+    for value in dates:
+        start_date = parse_date(str(value).strip())
+        if start_date is None:
+            raise BulkImportError(f"Invalid date {value}")
+        end_date = start_date + length if length is not None else None
+        rows.append(
+            {
+                **row,
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat() if end_date else None,
+            }
+        )
+    return rows
+
+
+def rows_from_request(request):
+    """
+    Read the batch from a clone request, a CSV ``file`` or an ``events`` list.
+    """
+    data = request.data
+    if data.get("clone_event_id"):
+        try:
+            event = Event.objects.get(
+                id=data.get("clone_event_id"), organizer=request.user
+            )
+        except (Event.DoesNotExist, ValueError):
+            raise BulkImportError("Event does not exist")
+        dates = data.get("dates") or []
+        if isinstance(dates, str):
+            dates = [value for value in dates.split(",") if value.strip()]
+        rows = clone_rows(event, dates)
+    elif "file" in request.FILES:
+        try:
+            rows = parse_csv(request.FILES["file"])
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise BulkImportError(f"Could not read CSV file: {e}")
+    else:
+        rows = data.get("events") or []
+        if isinstance(rows, str):
+            try:
+                rows = json.loads(rows)
+            except ValueError:
+                raise BulkImportError("events must be a JSON list")
+        if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+            raise BulkImportError("events must be a JSON list")
+
+    if not rows:
+        raise BulkImportError("No events to create")
+    if len(rows) > MAX_EVENTS:
+        raise BulkImportError(f"A batch can create at most {MAX_EVENTS} events")
+
+    # The ticket field takes JSON text, as in EventCreateView.
+    for row in rows:
+        if isinstance(row.get("tickets"), list):
+            row["tickets"] = json.dumps(row["tickets"])
+    return rows
+
+
+def validate_rows(rows):
+    """
+    Validate every row and return their validated data, or raise with the
+    errors keyed by row index.
+    """
+    cleaned, errors = [], {}
+    for index, row in enumerate(rows):
+        serializer = EventImportSerializer(data=row)
+        if serializer.is_valid():
+            cleaned.append(serializer.validated_data)
+        else:
+            errors[index] = serializer.errors
+    if errors:
+        raise BulkImportError(
+            f"{len(errors)} of {len(rows)} events are invalid", errors
+        )
+    return cleaned
+
+
+def check_quota(organizer, count, lock=False):
+    subscriptions = UserSubscription.objects.select_related("plan")
+    if lock:
+        subscriptions = subscriptions.select_for_update()
+    subscription = subscriptions.filter(user=organizer, is_active=True).first()
+    if subscription is None or not subscription.is_valid():
+        raise BulkImportError(
+            "You need an active subscription to create events.", status=403
+        )
+    remaining = max(
+        0,
+        subscription.plan.event_creation_limit
+        - subscription.events_organized_current_month,
+    )
+    if count > remaining:
+        raise BulkImportError(
+            f"This batch has {count} events but your plan allows {remaining} "
+            "more this month.",
+            status=403,
+        )
+    return subscription
+
+
+def build_event(organizer, validated_data, published_at):
+    data = dict(validated_data)
+    tickets = data.pop("tickets")
+    EventImportSerializer().normalize_event_data(data)
+    event = Event(organizer=organizer, published_at=published_at, **data)
+    event.tickets_available = sum(fields["quantity"] for fields in tickets.values())
+    return event, tickets
+
+
+def known_variants(organizer, cleaned):
+    """
+    ``{(field, url): variants}`` from the organizer's existing events that
+    use the same image URLs, which covers every clone.
+    """
+    known = {}
+    for field in media.MEDIA_FIELDS:
+        urls = {data[field] for data in cleaned if data.get(field)}
+        if not urls:
+            continue
+        rows = (
+            Event.objects.filter(organizer=organizer, **{f"{field}__in": urls})
+            .exclude(**{f"{field}_variants": {}})
+            .values_list(field, f"{field}_variants")
+        )
+        for url, variants in rows:
+            known[(field, url)] = variants
+    return known
+
+
+def attach_variants(event, known):
+    """
+    Copy known variants onto the new event and return the image fields that
+    still need them built.
+    """
+    missing = []
+    for field in media.MEDIA_FIELDS:
+        url = getattr(event, field)
+        if not url:
+            continue
+        variants = known.get((field, str(url)))
+        if variants:
+            setattr(event, f"{field}_variants", variants)
+        else:
+            missing.append(field)
+    return missing
+
+
+def queue_variants(jobs):
+    from .tasks import generate_image_variants
+
+    for field, pk in jobs:
+        generate_image_variants.delay(field, pk)
+
+
+def create_events(organizer, cleaned, progress=None):
+    """
+    Insert the validated events with their tickets and group chats and
+    charge the organizer's subscription once. ``progress(done)`` is called
+    after every chunk.
+    """
+    published_at = timezone.now().date()
+    participants = GroupConversation.participants.through
+    known = known_variants(organizer, cleaned)
+    created = []
+    variant_jobs = []
+
+    with transaction.atomic():
+        subscription = check_quota(organizer, len(cleaned), lock=True)
+        UserSubscription.objects.filter(pk=subscription.pk).update(
+            events_organized_current_month=F("events_organized_current_month")
+            + len(cleaned)
+        )
+
+        for start in range(0, len(cleaned), CHUNK_SIZE):
+            built = [
+                build_event(organizer, data, published_at)
+                for data in cleaned[start : start + CHUNK_SIZE]
+            ]
+            missing = [attach_variants(event, known) for event, _ in built]
+            events = Event.objects.bulk_create([event for event, _ in built])
+            variant_jobs.extend(
+                (field, event.pk)
+                for event, fields in zip(events, missing)
+                for field in fields
+            )
+            Ticket.objects.bulk_create(
+                [
+                    Ticket(event=event, ticket_type=ticket_type, **fields)
+                    for event, tickets in built
+                    for ticket_type, fields in tickets.items()
+                ]
+            )
+            groups = GroupConversation.objects.bulk_create(
+                [
+                    GroupConversation(
+                        name=event.event_title, admin=organizer, event=event
+                    )
+                    for event in events
+                ]
+            )
+            participants.objects.bulk_create(
+                [
+                    participants(groupconversation_id=group.id, profile_id=organizer.id)
+                    for group in groups
+                ]
+            )
+            created.extend(events)
+            if progress:
+                progress(len(created))
+
+        # bulk_create skips the post_save handlers; do their work once.
+        rebuild_search_vectors(Event.objects.filter(pk__in=[e.pk for e in created]))
+        transaction.on_commit(event_cache.invalidate_catalog)
+        transaction.on_commit(autocomplete.queue_rebuild)
+        if variant_jobs:
+            transaction.on_commit(lambda: queue_variants(variant_jobs))
+        record_progress(organizer.id, "event_created", len(created))
+
+    return created
+
+
+def job_key(job_id):
+    return f"event_import:{job_id}"
+
+
+def start_job(organizer, rows):
+    from .tasks import import_events
+
+    job_id = uuid.uuid4().hex
+    cache.set(
+        job_key(job_id),
+        {"organizer": organizer.id, "status": "queued", "total": len(rows), "done": 0},
+        JOB_TIMEOUT,
+    )
+    import_events.delay(job_id, organizer.id, rows)
+    return job_id
+
+
+def update_job(job_id, **fields):
+    job = cache.get(job_key(job_id)) or {}
+    job.update(fields)
+    cache.set(job_key(job_id), job, JOB_TIMEOUT)
+
+
+def get_job(job_id, organizer):
+    job = cache.get(job_key(job_id))
+    if not job or job.get("organizer") != organizer.id:
+        return None
+    return job
@@ -0,0 +1,142 @@
+"""
+Response cache for the public event catalog.
+
+Only viewer-independent data is cached; per-user fields such as ``liked`` are
+overlaid by the views after a cache hit. Entries are dropped from the model
+signals in event.signals once the surrounding transaction commits.
+"""
+
+import hashlib
+import logging
+import time
+from functools import cache as memoize
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from .serializers import EventCompleteDataSerializer, EventSerializerExplore
+
+logger = logging.getLogger(__name__)
+
+DETAIL_TIMEOUT = 60 * 10
+CATALOG_TIMEOUT = 60
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+LOCK_POLL_INTERVAL = 0.05
+
+METRICS_KEY = "event_cache:metrics"
+CATALOG_GENERATION_KEY = "event_cache:catalog:generation"
+
+
+def detail_key(event_id):
+    return f"event_cache:detail:{event_id}"
+
+
+def complete_key(event_id):
+    return f"event_cache:complete:{event_id}"
+
+
+def catalog_key(path, query_params):
+    """
+    Catalog pages are keyed by their endpoint, query string and the current
+    catalog generation, so bumping the generation retires every cached page
+    at once. The path keeps endpoints with different pagination apart.
+    """
+    generation = cache.get(CATALOG_GENERATION_KEY) or 0
+    query = "&".join(
+        f"{key}={value}"
+        for key in sorted(query_params)
+        for value in query_params.getlist(key)
+    )
+    digest = hashlib.sha1(f"{path}?{query}".encode()).hexdigest()
+    return f"event_cache:catalog:{generation}:{digest}"
+
+
+@memoize
+def metrics_connection():
+    # Reused by every metric call instead of a lookup on each cache read.
+    return get_redis_connection("default")
+
+
+def record(name, outcome):
+    try:
+        metrics_connection().hincrby(METRICS_KEY, f"{name}:{outcome}", 1)
+    except Exception as e:
+        logger.warning(f"Could not record cache metric {name}:{outcome}: {e}")
+
+
+def stats():
+    try:
+        raw = metrics_connection().hgetall(METRICS_KEY)
+    except Exception as e:
+        logger.warning(f"Could not read cache metrics: {e}")
+        return {}
+    return {key.decode(): int(value) for key, value in raw.items()}
+
+
+def reset_stats():
+    try:
+        metrics_connection().delete(METRICS_KEY)
+    except Exception as e:
+        logger.warning(f"Could not reset cache metrics: {e}")
+
+
+def get_or_build(key, builder, timeout, name):
+    """
+    Return the cached value for ``key`` or build it.
+
+    Only one caller rebuilds a missing key: it takes a short lock with
+    cache.add, and concurrent callers poll for the fresh value instead of all
+    hitting the database at once. If the lock holder is too slow, waiters
+    build the value themselves without caching it. When the cache is down
+    (cache errors are ignored, so add returns None) nobody can hold the
+    lock and every caller builds straight away.
+    """
+    value = cache.get(key)
+    if value is not None:
+        record(name, "hit")
+        return value
+
+    lock_key = f"{key}:lock"
+    locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    if locked is None:
+        return builder()
+    if locked:
+        record(name, "miss")
+        try:
+            value = builder()
+            cache.set(key, value, timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            record(name, "wait_hit")
+            return value
+
+    record(name, "wait_timeout")
+    return builder()
+
+
+def invalidate_event(event_id):
+    cache.delete_many([detail_key(event_id), complete_key(event_id)])
+
+
+def invalidate_catalog():
+    try:
+        cache.incr(CATALOG_GENERATION_KEY)
+    except ValueError:
+        cache.set(CATALOG_GENERATION_KEY, 1, None)
+
+
+def warm_event(event):
+    cache.set(
+        detail_key(event.id), dict(EventSerializerExplore(event).data), DETAIL_TIMEOUT
+    )
+    cache.set(
+        complete_key(event.id),
+        dict(EventCompleteDataSerializer(event).data),
+        DETAIL_TIMEOUT,
+    )
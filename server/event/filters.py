@@ -1,8 +1,29 @@
 import django_filters
 from .models import Event
+from .search import build_search_query, search_rank, trigram_search
+from .geo import DEFAULT_RADIUS_KM, MAX_RADIUS_KM, parse_point, within_radius
 from django.utils import timezone
-from datetime import datetime, timedelta
-from django.db.models import Count, Q
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+
+def day_start(day):
+    """
+    Midnight UTC of ``day``, matching how Event.starts_at is generated.
+    """
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def starts_between(queryset, first_day, end_day):
+    """
+    Events starting on ``first_day`` up to, but not including, ``end_day``.
+    """
+    return queryset.filter(
+        starts_at__gte=day_start(first_day), starts_at__lt=day_start(end_day)
+    )
 
 
 class EventFilter(django_filters.FilterSet):
@@ -11,52 +32,61 @@ class EventFilter(django_filters.FilterSet):
     time = django_filters.CharFilter(method="filter_by_time")
     popularity = django_filters.CharFilter(method="filter_by_popularity")
     search = django_filters.CharFilter(method="filter_by_search")
+    near = django_filters.CharFilter(method="filter_by_near")
 
     class Meta:
         model = Event
-        fields = ["category", "location", "time", "popularity", "search"]
+        fields = ["category", "location", "time", "popularity", "search", "near"]
 
     def filter_by_location(self, queryset, name, value):
-        return queryset.filter(
-            Q(city__icontains=value)
-            | Q(address__icontains=value)
-            | Q(venue_name__icontains=value)
-        )
+        return trigram_search(queryset, value, ["city", "address", "venue_name"])
 
     def filter_by_time(self, queryset, name, value):
-        from django.utils import timezone
-
-        now = timezone.now().date()
+        today = timezone.now().date()
 
         if value == "Today":
-            return queryset.filter(start_date=now)
+            return starts_between(queryset, today, today + timedelta(days=1))
         elif value == "This Week":
-            week_start = now - timedelta(days=now.weekday())
-            week_end = week_start + timedelta(days=6)
-            return queryset.filter(start_date__range=[week_start, week_end])
+            week_start = today - timedelta(days=today.weekday())
+            return starts_between(queryset, week_start, week_start + timedelta(days=7))
         elif value == "This Month":
-            return queryset.filter(
-                start_date__month=now.month, start_date__year=now.year
-            )
+            month_start = today.replace(day=1)
+            return starts_between(queryset, month_start, next_month(month_start))
         elif value == "Upcoming":
-            return queryset.filter(start_date__gte=now)
+            return queryset.filter(starts_at__gte=day_start(today))
         return queryset
 
     def filter_by_popularity(self, queryset, name, value):
         if value == "Most Liked":
             return queryset.order_by("-like_count")
         elif value == "Most Attended":
-            return queryset.annotate(
-                attendee_count=Count("tickets__sold_quantity")
-            ).order_by("-attendee_count")
+            return queryset.order_by("-tickets_sold")
         elif value == "Trending":
-            return queryset.order_by("-comment_count", "-like_count")
+            return queryset.order_by("-trending_score")
         return queryset
 
     def filter_by_search(self, queryset, name, value):
-        return queryset.filter(
-            Q(event_title__icontains=value)
-            | Q(description__icontains=value)
-            | Q(venue_name__icontains=value)
-            | Q(organizer__username__icontains=value)
+        query = build_search_query(value)
+        if query is None:
+            return queryset
+        queryset = queryset.filter(search_vector=query).annotate(
+            search_rank=search_rank(query)
         )
+        if not self.data.get("popularity"):
+            queryset = queryset.order_by("-search_rank", "-created_at")
+        return queryset
+
+    def filter_by_near(self, queryset, name, value):
+        point = parse_point(value)
+        if point is None:
+            return queryset
+        try:
+            radius = float(self.data.get("radius", DEFAULT_RADIUS_KM))
+        except (TypeError, ValueError):
+            radius = DEFAULT_RADIUS_KM
+        radius = min(max(radius, 0), MAX_RADIUS_KM)
+
+        queryset = within_radius(queryset, *point, radius)
+        if not self.data.get("popularity"):
+            queryset = queryset.order_by("distance")
+        return queryset
@@ -0,0 +1,116 @@
+"""
+Offline geocoding and radius queries for events.
+
+Coordinates come from the bundled city table in ``data/cities.csv`` so event
+creation never calls an external geocoder. Radius searches first narrow to a
+latitude/longitude bounding box, which the composite B-tree index on
+``(latitude, longitude)`` can serve, and then compute the exact haversine
+distance for the rows left inside the box.
+"""
+
+import csv
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+CITIES_FILE = Path(__file__).resolve().parent / "data" / "cities.csv"
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+DEFAULT_RADIUS_KM = 25
+MAX_RADIUS_KM = 500
+
+
+def normalize(name):
+    return re.sub(r"[^a-z0-9]+", " ", (name or "").lower()).strip()
+
+
+@lru_cache(maxsize=1)
+def load_cities():
+    """
+    Map every normalized city name and alias to ``(latitude, longitude)``.
+    """
+    cities = {}
+    with open(CITIES_FILE, newline="", encoding="utf-8") as fh:
+        for row in csv.DictReader(fh):
+            point = (float(row["latitude"]), float(row["longitude"]))
+            names = [row["name"], *filter(None, row["aliases"].split("|"))]
+            for name in names:
+                cities.setdefault(normalize(name), point)
+    return cities
+
+
+def geocode(city, address=None):
+    """
+    Return ``(latitude, longitude)`` for the event's city, falling back to
+    the comma-separated parts of its address, or ``(None, None)``.
+    """
+    cities = load_cities()
+    candidates = [city, *reversed((address or "").split(","))]
+    for candidate in candidates:
+        point = cities.get(normalize(candidate))
+        if point:
+            return point
+    return None, None
+
+
+def parse_point(value):
+    """
+    Parse ``"lat,lng"`` into floats, or return None if it is not a valid point.
+    """
+    try:
+        lat, lng = (float(part) for part in value.split(","))
+    except (AttributeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+def bounding_box(lat, lng, radius_km):
+    """
+    ``(min_lat, max_lat, min_lng, max_lng)`` enclosing the radius. The
+    longitude bounds are None when the box reaches a pole or wraps around the
+    antimeridian, in which case only the latitude band is used.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = lat - lat_delta, lat + lat_delta
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90), min(max_lat, 90), None, None
+
+    lng_delta = lat_delta / math.cos(math.radians(lat))
+    min_lng, max_lng = lng - lng_delta, lng + lng_delta
+    if min_lng < -180 or max_lng > 180:
+        return min_lat, max_lat, None, None
+    return min_lat, max_lat, min_lng, max_lng
+
+
+def distance_km(lat, lng):
+    """
+    Haversine distance in kilometres from ``(lat, lng)`` to each row.
+    """
+    half_dlat = Radians(F("latitude") - Value(lat)) / 2
+    half_dlng = Radians(F("longitude") - Value(lng)) / 2
+    a = Power(Sin(half_dlat), 2) + Value(math.cos(math.radians(lat))) * Cos(
+        Radians(F("latitude"))
+    ) * Power(Sin(half_dlng), 2)
+    return Value(2 * EARTH_RADIUS_KM) * ASin(
+        Sqrt(Least(a, Value(1.0), output_field=FloatField()))
+    )
+
+
+def within_radius(queryset, lat, lng, radius_km):
+    """
+    Restrict ``queryset`` to events within ``radius_km`` of the point and
+    annotate each with ``distance``.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+    queryset = queryset.filter(latitude__range=(min_lat, max_lat))
+    if min_lng is not None:
+        queryset = queryset.filter(longitude__range=(min_lng, max_lng))
+    return queryset.annotate(distance=distance_km(lat, lng)).filter(
+        distance__lte=radius_km
+    )
@@ -0,0 +1,217 @@
+"""
+Ticket inventory: time-boxed reservations, sales and returns.
+
+A hold moves seats from available to ``Ticket.held_quantity`` with one
+conditional UPDATE per ticket type, in a transaction that commits before the
+buyer pays, so no row lock is kept across the payment provider call.
+Checkout converts the holds into sold seats; holds that run out are handed
+back to inventory by the release_expired_ticket_holds task, and cancelled
+seats come back through return_seats.
+
+Nothing here reads a counter and writes it back: each change is a single
+``UPDATE ... WHERE`` that only matches while enough seats remain, and the
+``ticket_no_oversell`` CHECK constraint rejects anything that slips past.
+Every function touches ticket rows in primary key order so concurrent
+buyers of several ticket types cannot deadlock. Since the updates bypass
+the Ticket post_save handlers, each one drops the event's cached payloads
+itself once it commits.
+"""
+
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .models import Event, Ticket, TicketHold
+from .signals import drop_cached_event
+
+HOLD_TTL = timedelta(minutes=10)
+# How long a reservation stays valid once the buyer starts paying.
+PAYMENT_TTL = timedelta(minutes=15)
+SWEEP_BATCH = 500
+
+
+def place_holds(user, event, selected_tickets, ttl=HOLD_TTL):
+    """
+    Reserve ``{ticket_type: quantity}`` for ``user`` all-or-nothing and
+    return ``(reservation_id, holds)``.
+    """
+    try:
+        quantities = {
+            ticket_type: int(quantity)
+            for ticket_type, quantity in selected_tickets.items()
+            if int(quantity) > 0
+        }
+    except (AttributeError, TypeError, ValueError):
+        raise ValidationError("Invalid ticket selection.")
+    if not quantities:
+        raise ValidationError("No tickets selected.")
+
+    tickets = {
+        ticket.ticket_type: ticket
+        for ticket in event.tickets.filter(ticket_type__in=quantities)
+    }
+    for ticket_type in quantities:
+        if ticket_type not in tickets:
+            raise ValidationError(f"{ticket_type} tickets are not sold for this event.")
+
+    reservation_id = uuid.uuid4()
+    expires_at = timezone.now() + ttl
+    ordered = sorted(tickets.values(), key=lambda ticket: ticket.pk)
+
+    with transaction.atomic():
+        for ticket in ordered:
+            quantity = quantities[ticket.ticket_type]
+            reserved = Ticket.objects.filter(
+                pk=ticket.pk,
+                quantity__gte=F("sold_quantity") + F("held_quantity") + quantity,
+            ).update(held_quantity=F("held_quantity") + quantity)
+            if not reserved:
+                raise ValidationError(
+                    f"Not enough {ticket.ticket_type} tickets available."
+                )
+
+        holds = TicketHold.objects.bulk_create(
+            [
+                TicketHold(
+                    reservation_id=reservation_id,
+                    user=user,
+                    event=event,
+                    ticket=ticket,
+                    quantity=quantities[ticket.ticket_type],
+                    expires_at=expires_at,
+                )
+                for ticket in ordered
+            ]
+        )
+        event.adjust_counters(tickets_available=-sum(quantities.values()))
+        drop_cached_event(event.pk)
+
+    return reservation_id, holds
+
+
+def extend_holds(user, event, reservation_id, ttl=PAYMENT_TTL):
+    """
+    Check that every hold of the reservation is still active and give the
+    buyer ``ttl`` to finish paying. Returns the holds.
+    """
+    now = timezone.now()
+    holds = list(
+        TicketHold.objects.filter(
+            reservation_id=reservation_id, user=user, event=event
+        ).select_related("ticket")
+    )
+    if not holds or any(
+        hold.status != "active" or hold.expires_at <= now for hold in holds
+    ):
+        raise ValidationError("Your ticket reservation has expired.")
+
+    extended = TicketHold.objects.filter(
+        pk__in=[hold.pk for hold in holds], status="active"
+    ).update(expires_at=now + ttl)
+    if extended != len(holds):
+        raise ValidationError("Your ticket reservation has expired.")
+    return holds
+
+
+def convert_holds(holds):
+    """
+    Turn held seats into sold ones. Must run inside the checkout transaction;
+    raises if the sweeper released any of the holds first.
+    """
+    claimed = TicketHold.objects.filter(
+        pk__in=[hold.pk for hold in holds], status="active"
+    ).update(status="converted")
+    if claimed != len(holds):
+        raise ValidationError("Your ticket reservation has expired.")
+
+    for hold in sorted(holds, key=lambda hold: hold.ticket_id):
+        Ticket.objects.filter(pk=hold.ticket_id).update(
+            held_quantity=F("held_quantity") - hold.quantity,
+            sold_quantity=F("sold_quantity") + hold.quantity,
+        )
+        hold.status = "converted"
+    Event.objects.filter(pk=holds[0].event_id).update(
+        tickets_sold=F("tickets_sold") + sum(hold.quantity for hold in holds)
+    )
+    drop_cached_event(holds[0].event_id)
+
+
+def return_seats(event_id, quantities):
+    """
+    Put cancelled seats of one event, ``{ticket_id: quantity}``, back on
+    sale. Must run inside the caller's transaction; raises if a tier has
+    fewer sold seats.
+    """
+    for ticket_id in sorted(quantities):
+        quantity = quantities[ticket_id]
+        returned = Ticket.objects.filter(
+            pk=ticket_id, sold_quantity__gte=quantity
+        ).update(sold_quantity=F("sold_quantity") - quantity)
+        if not returned:
+            raise ValidationError("Cannot cancel more tickets than were sold.")
+    drop_cached_event(event_id)
+
+
+def release_holds(hold_ids):
+    """
+    Give the seats of the still active holds in ``hold_ids`` back to
+    inventory and return how many holds were released. Holds locked by a
+    checkout in progress are skipped.
+    """
+    with transaction.atomic():
+        holds = list(
+            TicketHold.objects.select_for_update(skip_locked=True).filter(
+                pk__in=hold_ids, status="active"
+            )
+        )
+        if not holds:
+            return 0
+        TicketHold.objects.filter(pk__in=[hold.pk for hold in holds]).update(
+            status="released"
+        )
+
+        per_ticket, per_event = defaultdict(int), defaultdict(int)
+        for hold in holds:
+            per_ticket[hold.ticket_id] += hold.quantity
+            per_event[hold.event_id] += hold.quantity
+        for ticket_id in sorted(per_ticket):
+            Ticket.objects.filter(pk=ticket_id).update(
+                held_quantity=F("held_quantity") - per_ticket[ticket_id]
+            )
+        for event_id in sorted(per_event):
+            Event.objects.filter(pk=event_id).update(
+                tickets_available=F("tickets_available") + per_event[event_id]
+            )
+            drop_cached_event(event_id)
+    return len(holds)
+
+
+def release_reservation(user, reservation_id):
+    hold_ids = TicketHold.objects.filter(
+        reservation_id=reservation_id, user=user, status="active"
+    ).values_list("pk", flat=True)
+    return release_holds(list(hold_ids))
+
+
+def release_expired(now=None):
+    """
+    Release every active hold past its expiry, SWEEP_BATCH at a time.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        hold_ids = list(
+            TicketHold.objects.filter(status="active", expires_at__lte=now)
+            .order_by("expires_at")
+            .values_list("pk", flat=True)[:SWEEP_BATCH]
+        )
+        if not hold_ids:
+            return released
+        count = release_holds(hold_ids)
+        released += count
+        if count == 0:
+            # Everything left is locked by checkouts that are converting it.
+            return released
@@ -0,0 +1,233 @@
+"""
+Write-behind buffer for event likes.
+
+Each event's current likers live in a Redis set, loaded from the database on
+first use, so a like/unlike toggle is answered from Redis alone. Toggles are
+also recorded as the latest state per user in a pending hash; the flusher
+task turns those into bulk ``Like`` inserts and deletes plus one counter
+update per event. New likes are tallied for the organizer digest instead of
+notifying on every click.
+"""
+
+import logging
+import uuid
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django_redis import get_redis_connection
+from users.models import Profile
+from . import cache as event_cache
+from .models import Event, Like
+
+logger = logging.getLogger(__name__)
+
+DIRTY_KEY = "likes:dirty"
+DIGEST_KEY = "likes:digest"
+DIGEST_LAST_KEY = "likes:digest:last"
+# Placeholder member so an event with no likes still has a (loaded) set.
+SENTINEL = "-"
+MEMBERS_TIMEOUT = 60 * 60 * 24 * 7
+LOAD_CHUNK = 5000
+
+TOGGLE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {-1, 0}
+end
+local liked = 1
+if redis.call('SISMEMBER', KEYS[1], ARGV[1]) == 1 then
+    redis.call('SREM', KEYS[1], ARGV[1])
+    liked = 0
+else
+    redis.call('SADD', KEYS[1], ARGV[1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('HSET', KEYS[2], ARGV[1], liked)
+redis.call('SADD', KEYS[3], ARGV[2])
+return {liked, redis.call('SCARD', KEYS[1]) - 1}
+"""
+
+# Publish a fully built set unless another request already loaded one.
+LOAD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('DEL', KEYS[2])
+    return 0
+end
+redis.call('RENAME', KEYS[2], KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+def members_key(event_id):
+    return f"likes:members:{event_id}"
+
+
+def pending_key(event_id):
+    return f"likes:pending:{event_id}"
+
+
+def get_connection():
+    return get_redis_connection("default")
+
+
+def load(redis_conn, event_id):
+    staging = f"{members_key(event_id)}:load:{uuid.uuid4().hex}"
+    user_ids = list(
+        Like.objects.filter(event_id=event_id).values_list("user_id", flat=True)
+    )
+    pipe = redis_conn.pipeline(transaction=False)
+    pipe.sadd(staging, SENTINEL)
+    for start in range(0, len(user_ids), LOAD_CHUNK):
+        pipe.sadd(staging, *user_ids[start : start + LOAD_CHUNK])
+    pipe.execute()
+    redis_conn.register_script(LOAD_SCRIPT)(
+        keys=[members_key(event_id), staging], args=[MEMBERS_TIMEOUT]
+    )
+
+
+def toggle(event_id, user_id):
+    """
+    Flip ``user_id``'s like on the event and return ``(liked, like_count)``.
+    Raises redis errors to the caller.
+    """
+    redis_conn = get_connection()
+    script = redis_conn.register_script(TOGGLE_SCRIPT)
+    keys = [members_key(event_id), pending_key(event_id), DIRTY_KEY]
+    args = [user_id, event_id, MEMBERS_TIMEOUT]
+    liked, like_count = script(keys=keys, args=args)
+    if liked == -1:
+        load(redis_conn, event_id)
+        liked, like_count = script(keys=keys, args=args)
+    return bool(liked), like_count
+
+
+def viewer_state(event_id, user_id):
+    """
+    ``(liked, like_count)`` from the buffer, or None when the event's likers
+    are not loaded into Redis (the database is then current).
+    """
+    try:
+        pipe = get_connection().pipeline(transaction=False)
+        pipe.exists(members_key(event_id))
+        pipe.sismember(members_key(event_id), user_id)
+        pipe.scard(members_key(event_id))
+        loaded, liked, members = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not read like buffer for event {event_id}: {e}")
+        return None
+    if not loaded:
+        return None
+    return bool(liked), members - 1
+
+
+def take_pending(redis_conn, event_id):
+    pipe = redis_conn.pipeline()
+    pipe.hgetall(pending_key(event_id))
+    pipe.delete(pending_key(event_id))
+    pipe.srem(DIRTY_KEY, event_id)
+    pending, _, _ = pipe.execute()
+    return {int(user_id): value == b"1" for user_id, value in pending.items()}
+
+
+def restore_pending(redis_conn, event_id, pending):
+    # Never overwrite a toggle that arrived after the failed flush began.
+    pipe = redis_conn.pipeline()
+    for user_id, liked in pending.items():
+        pipe.hsetnx(pending_key(event_id), user_id, int(liked))
+    pipe.sadd(DIRTY_KEY, event_id)
+    pipe.execute()
+
+
+def apply_pending(event_id, pending):
+    """
+    Write one event's buffered toggles to the database and return the
+    profiles whose like is new.
+    """
+    liked = [user_id for user_id, value in pending.items() if value]
+    unliked = [user_id for user_id, value in pending.items() if not value]
+
+    with transaction.atomic():
+        existing = set(
+            Like.objects.filter(event_id=event_id, user_id__in=liked).values_list(
+                "user_id", flat=True
+            )
+        )
+        new_likers = list(
+            Profile.objects.filter(
+                id__in=[user_id for user_id in liked if user_id not in existing]
+            ).only("id", "username")
+        )
+        Like.objects.bulk_create(
+            [Like(event_id=event_id, user=profile) for profile in new_likers],
+            ignore_conflicts=True,
+        )
+        if unliked:
+            Like.objects.filter(event_id=event_id, user_id__in=unliked).delete()
+        Event.objects.filter(pk=event_id).update(
+            like_count=Coalesce(
+                Subquery(
+                    Like.objects.filter(event_id=OuterRef("pk"))
+                    .values("event_id")
+                    .annotate(total=Count("id"))
+                    .values("total")
+                ),
+                0,
+            )
+        )
+        transaction.on_commit(lambda: event_cache.invalidate_event(event_id))
+    return new_likers
+
+
+def flush():
+    """
+    Drain the pending toggles of every dirty event into the database.
+    """
+    redis_conn = get_connection()
+    event_ids = [int(event_id) for event_id in redis_conn.smembers(DIRTY_KEY)]
+    live = set(Event.objects.filter(pk__in=event_ids).values_list("pk", flat=True))
+    flushed = 0
+
+    for event_id in event_ids:
+        pending = take_pending(redis_conn, event_id)
+        if not pending:
+            continue
+        if event_id not in live:
+            redis_conn.delete(members_key(event_id))
+            continue
+        try:
+            new_likers = apply_pending(event_id, pending)
+        except Exception as e:
+            logger.error(f"Error flushing likes for event {event_id}: {str(e)}")
+            restore_pending(redis_conn, event_id, pending)
+            continue
+
+        if new_likers:
+            pipe = redis_conn.pipeline()
+            pipe.hincrby(DIGEST_KEY, event_id, len(new_likers))
+            pipe.hset(DIGEST_LAST_KEY, event_id, new_likers[-1].username)
+            pipe.execute()
+        flushed += 1
+
+    return flushed
+
+
+def take_digests():
+    """
+    Return and clear ``{event_id: (new_like_count, last_username)}``.
+    """
+    redis_conn = get_connection()
+    pipe = redis_conn.pipeline()
+    pipe.hgetall(DIGEST_KEY)
+    pipe.hgetall(DIGEST_LAST_KEY)
+    pipe.delete(DIGEST_KEY, DIGEST_LAST_KEY)
+    counts, names, _ = pipe.execute()
+    return {
+        int(event_id): (int(count), names.get(event_id, b"").decode())
+        for event_id, count in counts.items()
+    }
+
+
+def digest_message(event, count, username):
+    if count == 1:
+        return f"{username} liked your {event.event_title}"
+    return f"{count} people liked your {event.event_title} in the last 5 minutes"
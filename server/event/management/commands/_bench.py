@@ -0,0 +1,108 @@
+"""
+Helpers shared by the benchmark_* management commands.
+"""
+
+import random
+import statistics
+import time
+import uuid
+from datetime import timedelta
+from django.db import connection
+from django.utils import timezone
+from users.models import Profile
+from event.models import Event
+from event.geo import geocode
+
+CITIES = [
+    "Bangalore",
+    "Mumbai",
+    "Delhi",
+    "Chennai",
+    "Hyderabad",
+    "Kochi",
+    "Pune",
+    "Kolkata",
+    "Jaipur",
+    "Goa",
+]
+WORDS = [
+    "jazz",
+    "rock",
+    "tech",
+    "startup",
+    "python",
+    "design",
+    "summit",
+    "night",
+    "festival",
+    "workshop",
+    "music",
+    "food",
+    "art",
+    "film",
+    "comedy",
+    "yoga",
+    "marathon",
+    "robotics",
+    "poetry",
+    "cloud",
+]
+VENUES = ["Arena", "Hall", "Convention Centre", "Grounds", "Club", "Auditorium"]
+
+
+def seed_events(count, organizers=200, batch_size=5000, rng=None):
+    """
+    Bulk insert ``count`` published, upcoming events spread over a few
+    synthetic organizers and return the created organizers.
+    """
+    rng = rng or random.Random(42)
+    tag = uuid.uuid4().hex[:8]
+    profiles = Profile.objects.bulk_create(
+        Profile(username=f"bench_{tag}_{i}", email=f"bench_{tag}_{i}@example.com")
+        for i in range(organizers)
+    )
+    today = timezone.now().date()
+
+    def build(i):
+        words = rng.sample(WORDS, 3)
+        city = rng.choice(CITIES)
+        lat, lng = geocode(city)
+        return Event(
+            organizer=rng.choice(profiles),
+            event_title=" ".join(words).title(),
+            event_type=rng.choice(Event.EVENT_TYPE_CHOICES)[0],
+            description=" ".join(rng.choices(WORDS, k=30)),
+            venue_name=f"{city} {rng.choice(VENUES)}",
+            address=f"{rng.randint(1, 500)} {rng.choice(WORDS).title()} Road",
+            city=city,
+            # Scatter venues up to ~30 km around the city centre.
+            latitude=lat + rng.uniform(-0.27, 0.27),
+            longitude=lng + rng.uniform(-0.27, 0.27),
+            start_date=today + timedelta(days=rng.randint(-30, 180)),
+            start_time=f"{rng.randint(8, 22):02d}:00",
+            capacity=rng.randint(50, 5000),
+            is_published=True,
+            published_at=today,
+        )
+
+    for start in range(0, count, batch_size):
+        Event.objects.bulk_create(
+            build(i) for i in range(start, min(start + batch_size, count))
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {Event._meta.db_table}")
+    return profiles
+
+
+def time_queryset(make_queryset, runs=5):
+    """
+    Evaluate a fresh queryset ``runs`` times and return the median latency in
+    milliseconds.
+    """
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        make_queryset()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
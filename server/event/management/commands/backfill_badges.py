@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from services import badge_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount every user's badge progress from bookings, events and "
+        "reviews, and award the badges they have already earned."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        users, awarded = badge_service.backfill_badges(
+            chunk_size=options["chunk_size"],
+            progress=lambda done: self.stdout.write(f"  {done} users..."),
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Checked {users} users, awarded {awarded} badges")
+        )
@@ -0,0 +1,67 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from django.db import connections
+from event import media
+
+
+def render(source_name, pk, url):
+    # Runs in a worker process: build and upload only, the parent writes rows.
+    try:
+        return source_name, pk, url, media.build_variants(source_name, pk, url), None
+    except Exception as e:
+        return source_name, pk, url, None, str(e)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate responsive image variants for event banners, profile "
+        "pictures and chat images that do not have them yet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            action="append",
+            choices=sorted(media.SOURCES),
+            help="Only backfill this source (repeatable). Defaults to all.",
+        )
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--limit", type=int, help="Stop after this many images.")
+
+    def handle(self, *args, **options):
+        jobs = []
+        for source_name in options["source"] or sorted(media.SOURCES):
+            jobs.extend(
+                (source_name, pk, url)
+                for pk, url in media.pending_variants(source_name).iterator()
+            )
+        if options["limit"] is not None:
+            jobs = jobs[: options["limit"]]
+        if not jobs:
+            self.stdout.write("No images need variants.")
+            return
+
+        self.stdout.write(
+            f"Rendering {len(jobs)} images with {options['workers']} workers..."
+        )
+        # Forked workers must not inherit the parent's open DB connections.
+        connections.close_all()
+
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            futures = [pool.submit(render, *job) for job in jobs]
+            for future in as_completed(futures):
+                source_name, pk, url, variants, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f"{source_name} {pk}: {error}")
+                    continue
+                media.apply_variants(source_name, pk, url, variants)
+                done += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated variants for {done} images ({failed} failed)"
+            )
+        )
@@ -0,0 +1,132 @@
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from Admin.models import Coupon, CouponRedemption
+from users.models import Booking, Profile
+from users.utils.booking_utils import create_ticket_purchases
+from users.utils.coupon_utils import redeem_coupon
+from event import holds
+from event.models import Event, Ticket, TicketPurchase
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_writes(booking, user, event, ticket_holds, coupon):
+    # The per-row writes checkout did before create_ticket_purchases.
+    for hold in ticket_holds:
+        purchase = TicketPurchase.objects.create(
+            buyer=user,
+            event=event,
+            ticket=hold.ticket,
+            quantity=hold.quantity,
+            used_tickets=0,
+            total_price=Decimal(hold.ticket.price) * Decimal(hold.quantity),
+            unique_qr_code=str(uuid.uuid4()),
+            booking_id=str(booking.booking_id),
+        )
+        booking.ticket_purchases.add(purchase)
+    if coupon:
+        coupon.used_count += 1
+        CouponRedemption.objects.create(coupon=coupon, user=user, booking=booking)
+        coupon.save()
+
+
+def batched_writes(booking, user, event, ticket_holds, coupon):
+    create_ticket_purchases(booking, ticket_holds)
+    if coupon:
+        redeem_coupon(coupon, user, booking)
+
+
+class Command(BaseCommand):
+    help = (
+        "Count the queries of the checkout write phase (purchases, booking "
+        "links and coupon use) per booking, per-row versus batched. Runs in "
+        "a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tiers",
+            type=int,
+            nargs="+",
+            default=[1, 3, 5, 10],
+            help="Ticket types bought in one booking.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["tiers"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, tier_counts):
+        tag = uuid.uuid4().hex[:8]
+        user = Profile.objects.create(
+            username=f"bench_{tag}", email=f"bench_{tag}@example.com"
+        )
+        today = timezone.now().date()
+        event = Event.objects.create(
+            organizer=user,
+            event_title=f"Checkout writes {tag}",
+            event_type="Concert",
+            description="-",
+            venue_name="-",
+            address="-",
+            city="-",
+            start_date=today + timedelta(days=30),
+            start_time="19:00",
+            capacity=10000,
+            published_at=today,
+            is_published=True,
+        )
+        tickets = Ticket.objects.bulk_create(
+            Ticket(event=event, ticket_type=f"Tier {i}", price=10, quantity=1000)
+            for i in range(max(tier_counts))
+        )
+        event.sync_ticket_counters()
+
+        self.stdout.write(f"{'tiers':>6} {'coupon':>7} {'per-row':>8} {'batched':>8}")
+        for count in tier_counts:
+            for with_coupon in (False, True):
+                results = []
+                for writes in (legacy_writes, batched_writes):
+                    _, ticket_holds = holds.place_holds(
+                        user,
+                        event,
+                        {ticket.ticket_type: 1 for ticket in tickets[:count]},
+                    )
+                    holds.convert_holds(ticket_holds)
+                    booking = Booking.objects.create(
+                        user=user,
+                        event=event,
+                        payment_method="wallet",
+                        subtotal=count * 10,
+                        total=count * 10,
+                    )
+                    coupon = None
+                    if with_coupon:
+                        coupon = Coupon.objects.create(
+                            code=f"B{uuid.uuid4().hex[:10]}",
+                            title="Benchmark",
+                            discount_type="fixed",
+                            discount_value=1,
+                            min_order_amount=0,
+                            start_date=today,
+                            end_date=today,
+                            usage_limit=100,
+                        )
+                    with CaptureQueriesContext(connection) as queries:
+                        writes(booking, user, event, ticket_holds, coupon)
+                    results.append(len(queries))
+                self.stdout.write(
+                    f"{count:>6} {'yes' if with_coupon else 'no':>7} "
+                    f"{results[0]:>8} {results[1]:>8}"
+                )
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from event.filters import EventFilter
+from event.geo import distance_km, geocode
+from event.models import Event
+from ._bench import seed_events, time_queryset
+
+CASES = [("Kochi", 10), ("Bangalore", 25), ("Mumbai", 50), ("Delhi", 150)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the bounding-box radius filter against a full haversine scan "
+        "and the substring location filter on a synthetic catalog. Runs inside "
+        "a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=100_000)
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--page-size", type=int, default=9)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write(f"Seeding {options['events']} events...")
+            seed_events(options["events"])
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        page_size = options["page_size"]
+        base = Event.objects.filter(
+            is_published=True, start_date__gte=timezone.now().date()
+        ).order_by("-created_at")
+
+        def substring(city):
+            queryset = EventFilter({"location": city}, queryset=base).qs
+            return queryset.count(), list(queryset[:page_size])
+
+        def full_scan(lat, lng, radius):
+            queryset = (
+                base.annotate(distance=distance_km(lat, lng))
+                .filter(distance__lte=radius)
+                .order_by("distance")
+            )
+            return queryset.count(), list(queryset[:page_size])
+
+        def bounding_box(lat, lng, radius):
+            queryset = EventFilter(
+                {"near": f"{lat},{lng}", "radius": radius}, queryset=base
+            ).qs
+            return queryset.count(), list(queryset[:page_size])
+
+        self.stdout.write(
+            f"{'case':<16}{'matches':>9}{'substring ms':>14}"
+            f"{'full scan ms':>14}{'bbox ms':>10}"
+        )
+        for city, radius in CASES:
+            lat, lng = geocode(city)
+            matches = bounding_box(lat, lng, radius)[0]
+            before = time_queryset(lambda: substring(city), options["runs"])
+            scan = time_queryset(lambda: full_scan(lat, lng, radius), options["runs"])
+            after = time_queryset(
+                lambda: bounding_box(lat, lng, radius), options["runs"]
+            )
+            self.stdout.write(
+                f"{f'{city} {radius}km':<16}{matches:>9}{before:>14.2f}"
+                f"{scan:>14.2f}{after:>10.2f}"
+            )
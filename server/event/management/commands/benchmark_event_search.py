@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from event.filters import EventFilter
+from event.models import Event
+from event.search import rebuild_search_vectors
+from ._bench import seed_events, time_queryset
+
+TERMS = ["jazz", "python summit", "bangalore", "rob", "festival night"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare icontains search against the full-text search filter on a "
+        "synthetic catalog. Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=100_000)
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--page-size", type=int, default=9)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write(f"Seeding {options['events']} events...")
+            seed_events(options["events"])
+            rebuild_search_vectors()
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        page_size = options["page_size"]
+        base = Event.objects.filter(
+            is_published=True, start_date__gte=timezone.now().date()
+        ).order_by("-created_at")
+
+        def legacy(term):
+            queryset = base.filter(
+                Q(event_title__icontains=term)
+                | Q(description__icontains=term)
+                | Q(venue_name__icontains=term)
+                | Q(city__icontains=term)
+                | Q(organizer__username__icontains=term)
+            )
+            return queryset.count(), list(queryset[:page_size])
+
+        def full_text(term):
+            queryset = EventFilter({"search": term}, queryset=base).qs
+            return queryset.count(), list(queryset[:page_size])
+
+        self.stdout.write(f"{'term':<18}{'icontains ms':>14}{'tsvector ms':>14}")
+        for term in TERMS:
+            before = time_queryset(lambda: legacy(term), options["runs"])
+            after = time_queryset(lambda: full_text(term), options["runs"])
+            self.stdout.write(f"{term:<18}{before:>14.2f}{after:>14.2f}")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from event import cache as event_cache
+
+
+class Command(BaseCommand):
+    help = "Print hit/miss counters of the event response cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Clear the counters afterwards."
+        )
+
+    def handle(self, *args, **options):
+        counters = event_cache.stats()
+        names = sorted({key.split(":")[0] for key in counters})
+        for name in names:
+            hits = counters.get(f"{name}:hit", 0) + counters.get(f"{name}:wait_hit", 0)
+            misses = counters.get(f"{name}:miss", 0) + counters.get(
+                f"{name}:wait_timeout", 0
+            )
+            total = hits + misses
+            ratio = (hits / total * 100) if total else 0
+            self.stdout.write(
+                f"{name:<10} hits={hits} misses={misses} "
+                f"wait_timeouts={counters.get(f'{name}:wait_timeout', 0)} "
+                f"hit_ratio={ratio:.1f}%"
+            )
+        if options["reset"]:
+            event_cache.reset_stats()
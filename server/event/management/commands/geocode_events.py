@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from event.geo import geocode
+from event.models import Event
+
+
+class Command(BaseCommand):
+    help = "Fill in event coordinates from the bundled city table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-geocode events that already have coordinates.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        queryset = Event.objects.only("id", "city", "address")
+        if not options["all"]:
+            queryset = queryset.filter(latitude__isnull=True)
+
+        batch, updated, missing = [], 0, 0
+        for event in queryset.iterator(chunk_size=options["batch_size"]):
+            event.latitude, event.longitude = geocode(event.city, event.address)
+            if event.latitude is None:
+                missing += 1
+                if not options["all"]:
+                    continue
+            batch.append(event)
+            if len(batch) >= options["batch_size"]:
+                updated += Event.objects.bulk_update(batch, ["latitude", "longitude"])
+                batch = []
+        if batch:
+            updated += Event.objects.bulk_update(batch, ["latitude", "longitude"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Geocoded {updated} events ({missing} cities not in the table)"
+            )
+        )
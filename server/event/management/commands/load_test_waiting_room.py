@@ -0,0 +1,158 @@
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+from rest_framework.exceptions import ValidationError
+from users.models import Profile
+from event import holds, waiting_room
+from event.models import Event, Ticket
+
+# Queue entries use ids well clear of real users; only the Redis side sees them.
+FIRST_BUYER_ID = 10**9
+# Admitted buyers check out at once here, where real ones spend a while on
+# the payment form; ticking faster than the admit_waiting_buyers schedule
+# spreads each second's admissions the same way.
+TICK = 0.1
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Send many simultaneous buyers at one event, once through the waiting "
+        "room and once (--no-queue) straight at checkout, and report checkout "
+        "latency over the run. Creates and deletes its own event."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buyers", type=int, default=10000)
+        parser.add_argument("--seats", type=int, default=2000)
+        parser.add_argument(
+            "--rate", type=int, default=40, help="Admissions per second."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=32,
+            help="Concurrent DB connections; keep below max_connections.",
+        )
+        parser.add_argument("--no-queue", action="store_true")
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        buyer = Profile.objects.create(
+            username=f"queue_{tag}", email=f"queue_{tag}@example.com"
+        )
+        today = timezone.now().date()
+        event = Event.objects.create(
+            organizer=buyer,
+            event_title=f"Waiting room load {tag}",
+            event_type="Concert",
+            description="-",
+            venue_name="-",
+            address="-",
+            city="-",
+            start_date=today + timedelta(days=30),
+            start_time="19:00",
+            capacity=options["seats"],
+            published_at=today,
+            is_published=True,
+            queue_enabled=not options["no_queue"],
+            queue_admit_rate=options["rate"],
+        )
+        Ticket.objects.create(
+            event=event, ticket_type="Regular", price=1, quantity=options["seats"]
+        )
+        event.sync_ticket_counters()
+
+        latencies = []
+        lock = threading.Lock()
+
+        def checkout(_):
+            started = time.perf_counter()
+            try:
+                _, placed = holds.place_holds(
+                    buyer, event, {"Regular": 1}, ttl=timedelta(minutes=1)
+                )
+                with transaction.atomic():
+                    holds.convert_holds(placed)
+            except ValidationError:
+                pass
+            finally:
+                connection.close()
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        buyer_ids = range(FIRST_BUYER_ID, FIRST_BUYER_ID + options["buyers"])
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+                if options["no_queue"]:
+                    wait([pool.submit(checkout, user_id) for user_id in buyer_ids])
+                else:
+                    self.run_queue(event, buyer_ids, pool, checkout)
+            elapsed = time.perf_counter() - started
+        finally:
+            redis_conn = get_redis_connection("default")
+            redis_conn.delete(
+                waiting_room.queue_key(event.id),
+                waiting_room.counter_key(event.id),
+                waiting_room.admitted_key(event.id),
+                waiting_room.bucket_key(event.id),
+            )
+            redis_conn.srem(waiting_room.ACTIVE_KEY, event.id)
+            redis_conn.hdel(waiting_room.RATES_KEY, event.id)
+            event.refresh_from_db()
+            sold = event.tickets_sold
+            event.delete()
+            buyer.delete()
+
+        self.stdout.write(
+            f"{len(latencies)} checkouts in {elapsed:.1f}s, {sold} tickets sold"
+        )
+        self.stdout.write(
+            f"checkout ms  p50 {statistics.median(latencies):.1f}  "
+            f"p95 {percentile(latencies, 0.95):.1f}  "
+            f"p99 {percentile(latencies, 0.99):.1f}"
+        )
+        # Flat latency means no tenth of the run is much slower than the rest.
+        tenth = max(1, len(latencies) // 10)
+        for start in range(0, len(latencies), tenth):
+            chunk = latencies[start : start + tenth]
+            self.stdout.write(
+                f"  checkouts {start + 1:>6}-{start + len(chunk):<6} "
+                f"p50 {statistics.median(chunk):6.1f}  "
+                f"p99 {percentile(chunk, 0.99):6.1f}"
+            )
+
+    def run_queue(self, event, buyer_ids, pool, checkout):
+        def join(user_id):
+            began = time.perf_counter()
+            waiting_room.join(event, user_id)
+            return (time.perf_counter() - began) * 1000
+
+        with ThreadPoolExecutor(max_workers=64) as joiners:
+            join_latencies = list(joiners.map(join, buyer_ids))
+        self.stdout.write(
+            f"{len(join_latencies)} buyers joined; join ms  "
+            f"p50 {statistics.median(join_latencies):.2f}  "
+            f"p99 {percentile(join_latencies, 0.99):.2f}"
+        )
+
+        redis_conn = get_redis_connection("default")
+        pending = []
+        while redis_conn.zcard(waiting_room.queue_key(event.id)):
+            tick_started = time.time()
+            admitted = waiting_room.admit(event.id, event.queue_admit_rate)
+            pending.extend(pool.submit(checkout, user_id) for user_id in admitted)
+            time.sleep(max(0.0, TICK - (time.time() - tick_started)))
+        wait(pending)
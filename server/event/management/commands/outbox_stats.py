@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from services import outbox_service
+
+
+class Command(BaseCommand):
+    help = "Print the outbox backlog and the relay's delivery lag."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Clear the lag counters afterwards."
+        )
+
+    def handle(self, *args, **options):
+        stats = outbox_service.stats()
+        self.stdout.write(
+            f"pending={stats['pending']} failing={stats['failing']} "
+            f"oldest_pending={stats['oldest_pending_seconds']:.1f}s"
+        )
+        self.stdout.write(
+            f"dispatched={stats['dispatched']} last_lag={stats['last_lag_ms']}ms "
+            f"max_lag={stats['max_lag_ms']}ms "
+            f"last_dispatch_at={stats['last_dispatch_at'] or '-'}"
+        )
+        if options["reset"]:
+            outbox_service.reset_metrics()
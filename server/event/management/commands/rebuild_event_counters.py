@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from event.models import Event, Like, Comment, Ticket
+
+
+def _subquery(queryset, aggregate):
+    return Coalesce(
+        Subquery(
+            queryset.filter(event=OuterRef("pk"))
+            .values("event")
+            .annotate(total=aggregate)
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+class Command(BaseCommand):
+    help = "Rebuild Event engagement and ticket counters from the source tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--event",
+            type=int,
+            action="append",
+            dest="event_ids",
+            help="Only rebuild the given event id (can be repeated).",
+        )
+
+    def handle(self, *args, **options):
+        events = Event.objects.all()
+        if options["event_ids"]:
+            events = events.filter(pk__in=options["event_ids"])
+
+        tickets_sold = _subquery(Ticket.objects, Sum("sold_quantity"))
+        tickets_total = _subquery(Ticket.objects, Sum("quantity"))
+        tickets_held = _subquery(Ticket.objects, Sum("held_quantity"))
+        updated = events.update(
+            like_count=_subquery(Like.objects, Count("id")),
+            comment_count=_subquery(Comment.objects, Count("id")),
+            tickets_sold=tickets_sold,
+            tickets_available=Greatest(
+                tickets_total - tickets_sold - tickets_held, Value(0)
+            ),
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters for {updated} events"))
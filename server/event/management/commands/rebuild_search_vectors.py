@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from event.search import rebuild_search_vectors
+
+
+class Command(BaseCommand):
+    help = "Recompute the full-text search vector of every event."
+
+    def handle(self, *args, **options):
+        updated = rebuild_search_vectors()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt search vectors for {updated} events")
+        )
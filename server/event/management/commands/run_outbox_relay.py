@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from services import outbox_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver outbox messages to Celery and Redis pub/sub as their "
+        "transactions commit. Several relays may run at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=outbox_service.BATCH_SIZE)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.5,
+            help="Seconds to wait when the outbox is empty.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Drain what is pending and exit."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            outbox_service.run_relay(
+                batch_size=options["batch_size"],
+                interval=options["interval"],
+                once=options["once"],
+            )
+        except KeyboardInterrupt:
+            pass
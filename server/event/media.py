@@ -0,0 +1,247 @@
+"""
+Image processing for event media, profile pictures and chat images.
+
+Event banners and promotional images are written to a local staging
+directory during the request and the event is marked
+``media_status="pending"``. The process_event_media task then renders them
+with Pillow, pushes the results through the configured storage backend
+(``EVENT_MEDIA_STORAGE``) and swaps the URLs onto the event in a single
+conditional UPDATE, so a slower task for an older upload can never
+overwrite a newer one. The staging directory must be shared between the web
+and worker containers.
+
+Every image listed in SOURCES also gets fixed-width derivatives (thumb, card,
+hero) in WebP and JPEG, stored as a variants map next to the original URL:
+``{"thumb": {"width": 320, "webp": url, "jpeg": url}, ...}``. Images that
+are already uploaded elsewhere (profile pictures, chat images) are fetched
+back by generate_image_variants, and backfill_image_variants covers rows
+that predate this.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import uuid
+from collections import namedtuple
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps
+import requests
+
+logger = logging.getLogger(__name__)
+
+MEDIA_FIELDS = ("event_banner", "promotional_image")
+# Longest edge of the image that replaces an event upload.
+ORIGINAL_EDGE = 1920
+VARIANT_WIDTHS = {"thumb": 320, "card": 640, "hero": 1280}
+FORMATS = {"webp": ("WEBP", "webp"), "jpeg": ("JPEG", "jpg")}
+QUALITY = 82
+FETCH_TIMEOUT = 15
+
+ImageSource = namedtuple(
+    "ImageSource", ["model", "url_field", "variants_field", "filters"]
+)
+
+SOURCES = {
+    "event_banner": ImageSource(
+        "event.Event", "event_banner", "event_banner_variants", {}
+    ),
+    "promotional_image": ImageSource(
+        "event.Event", "promotional_image", "promotional_image_variants", {}
+    ),
+    "profile_picture": ImageSource(
+        "users.Profile", "profile_picture", "profile_picture_variants", {}
+    ),
+    "chat_image": ImageSource(
+        "chat.Message", "content", "image_variants", {"is_image": True}
+    ),
+    "group_chat_image": ImageSource(
+        "chat.GroupMessage", "content", "image_variants", {"is_image": True}
+    ),
+}
+
+
+class CloudinaryMediaStorage:
+    def save(self, name, content):
+        import cloudinary.uploader
+
+        public_id, _ = os.path.splitext(name)
+        result = cloudinary.uploader.upload(
+            content, public_id=public_id, resource_type="image", overwrite=True
+        )
+        return result["url"]
+
+
+class LocalMediaStorage:
+    """
+    Stand-in backend that keeps processed images under MEDIA_ROOT.
+    """
+
+    def __init__(self):
+        self.storage = FileSystemStorage()
+
+    def save(self, name, content):
+        saved = self.storage.save(name, ContentFile(content))
+        return self.storage.url(saved)
+
+
+def get_storage():
+    return import_string(settings.EVENT_MEDIA_STORAGE)()
+
+
+def staging_storage():
+    return FileSystemStorage(location=settings.EVENT_MEDIA_STAGING_ROOT)
+
+
+def stage(upload):
+    """
+    Save an uploaded file to the staging directory and return its name.
+    """
+    _, ext = os.path.splitext(upload.name)
+    return staging_storage().save(f"{uuid.uuid4().hex}{ext.lower()}", upload)
+
+
+def discard_staged(names):
+    storage = staging_storage()
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError as e:
+            logger.warning(f"Could not delete staged media {name}: {e}")
+
+
+def load_image(fileobj):
+    """
+    Decode an image, apply its EXIF orientation and flatten it onto white.
+    """
+    with Image.open(fileobj) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            return background
+        return image.convert("RGB")
+
+
+def encode(image, fmt):
+    pil_format, _ = FORMATS[fmt]
+    buffer = io.BytesIO()
+    if pil_format == "JPEG":
+        image.save(buffer, "JPEG", quality=QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(buffer, pil_format, quality=QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def resize_to_width(image, width):
+    # Never upscale; a small source simply yields smaller variants.
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def store_original(image, prefix, storage):
+    original = image.copy()
+    original.thumbnail((ORIGINAL_EDGE, ORIGINAL_EDGE), Image.LANCZOS)
+    return storage.save(f"{prefix}-original.jpg", encode(original, "jpeg"))
+
+
+def store_variants(image, prefix, storage):
+    """
+    Render and store every width/format pair and return the variants map.
+    """
+    variants = {}
+    for name, width in VARIANT_WIDTHS.items():
+        resized = resize_to_width(image, width)
+        variants[name] = {"width": resized.width}
+        for fmt, (_, ext) in FORMATS.items():
+            variants[name][fmt] = storage.save(
+                f"{prefix}-{name}-{fmt}.{ext}", encode(resized, fmt)
+            )
+    return variants
+
+
+def srcset(variants):
+    """
+    ``{"webp": "url 320w, ...", "jpeg": ...}`` for a variants map.
+    """
+    # Small sources give several variants the same width; list each once.
+    by_width = {variant["width"]: variant for variant in variants.values()}
+    ordered = [by_width[width] for width in sorted(by_width)]
+    return {
+        fmt: ", ".join(f"{variant[fmt]} {variant['width']}w" for variant in ordered)
+        for fmt in FORMATS
+    }
+
+
+def url_prefix(source_name, pk, url):
+    token = hashlib.sha1(url.encode()).hexdigest()[:12]
+    return f"images/{source_name}/{pk}-{token}"
+
+
+def fetch(url):
+    """
+    Read back a stored image, from MEDIA_ROOT when it is served locally.
+    """
+    if url.startswith(settings.MEDIA_URL):
+        storage = FileSystemStorage()
+        with storage.open(url[len(settings.MEDIA_URL) :], "rb") as fh:
+            return fh.read()
+    response = requests.get(url, timeout=FETCH_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+def build_variants(source_name, pk, url):
+    """
+    Fetch ``url`` and store its variants. Touches no database state, so it
+    is safe to run in backfill worker processes.
+    """
+    image = load_image(io.BytesIO(fetch(url)))
+    return store_variants(image, url_prefix(source_name, pk, url), get_storage())
+
+
+def apply_variants(source_name, pk, url, variants):
+    """
+    Save the variants unless the image was replaced while they were built.
+    """
+    source = SOURCES[source_name]
+    model = apps.get_model(source.model)
+    return model.objects.filter(pk=pk, **{source.url_field: url}).update(
+        **{source.variants_field: variants}
+    )
+
+
+def pending_variants(source_name):
+    """
+    ``(pk, url)`` pairs of rows in a source that have no variants yet.
+    """
+    source = SOURCES[source_name]
+    model = apps.get_model(source.model)
+    return (
+        model.objects.filter(**source.filters, **{source.variants_field: {}})
+        .exclude(**{f"{source.url_field}__isnull": True})
+        .exclude(**{source.url_field: ""})
+        .values_list("pk", source.url_field)
+        .order_by("pk")
+    )
+
+
+def publish(event_id, field, staged_name, storage):
+    """
+    Store the original and variants of one staged event upload and return
+    ``(url, variants)``.
+    """
+    with staging_storage().open(staged_name, "rb") as fh:
+        image = load_image(fh)
+    prefix = f"images/{field}/{event_id}-{os.path.splitext(staged_name)[0]}"
+    return (
+        store_original(image, prefix, storage),
+        store_variants(image, prefix, storage),
+    )
@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import F, Func, Q, Sum
 from users.models import Profile, Booking
 import uuid
 
@@ -17,6 +20,12 @@ class Event(models.Model):
         ("Festival", "Festival"),
     ]
 
+    MEDIA_STATUS_CHOICES = [
+        ("ready", "Ready"),
+        ("pending", "Pending"),
+        ("failed", "Failed"),
+    ]
+
     # Basic Information
     organizer = models.ForeignKey(
         Profile, on_delete=models.CASCADE, related_name="events"
@@ -31,12 +40,26 @@ class Event(models.Model):
     venue_name = models.CharField(max_length=255, db_index=True)
     address = models.CharField(max_length=255, db_index=True)
     city = models.CharField(max_length=100, db_index=True)
+    # Geocoded from the bundled city table (see event.geo)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
 
     # Date and Time
     start_date = models.DateField()
     end_date = models.DateField(blank=True, null=True)
     start_time = models.TimeField()
     end_time = models.TimeField(blank=True, null=True)
+    # start_date + start_time as one indexable instant (dates are stored in UTC)
+    starts_at = models.GeneratedField(
+        expression=Func(
+            F("start_date"),
+            F("start_time"),
+            arg_joiner=" + ",
+            template="((%(expressions)s) AT TIME ZONE 'UTC')",
+        ),
+        output_field=models.DateTimeField(),
+        db_persist=True,
+    )
 
     # Event Settings
     visibility = models.CharField(
@@ -49,6 +72,14 @@ class Event(models.Model):
     # Branding
     event_banner = models.URLField(max_length=500, blank=True, null=True)
     promotional_image = models.URLField(max_length=500, blank=True, null=True)
+    # Uploads awaiting event.tasks.process_event_media, keyed by field name
+    pending_media = models.JSONField(default=dict, blank=True)
+    # Responsive derivatives of the images above (see event.media)
+    event_banner_variants = models.JSONField(default=dict, blank=True)
+    promotional_image_variants = models.JSONField(default=dict, blank=True)
+    media_status = models.CharField(
+        max_length=10, choices=MEDIA_STATUS_CHOICES, default="ready"
+    )
     is_draft = models.BooleanField(default=False)
     is_published = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -56,18 +87,111 @@ class Event(models.Model):
     revenue_distributed = models.BooleanField(default=False)
     published_at = models.DateField()
     cancel_ticket = models.BooleanField(default=False)
+    # Send buyers through the waiting room before checkout (see event.waiting_room)
+    queue_enabled = models.BooleanField(default=False)
+    queue_admit_rate = models.PositiveIntegerField(
+        default=20, help_text="Buyers let into checkout per second in queue mode"
+    )
 
-    def __str__(self):
-        return f"{self.event_title} by {self.organizer.username}"
+    # Engagement counters, maintained incrementally (see adjust_counters)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    tickets_sold = models.PositiveIntegerField(default=0)
+    tickets_available = models.PositiveIntegerField(default=0)
+    # Forward-decayed popularity, refreshed by event.tasks.update_trending_scores
+    trending_score = models.FloatField(default=0)
 
-    def like_count(self):
-        return self.likes.count()
+    # Full-text document, refreshed on save (see event.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="event_search_vector_gin"),
+            GinIndex(
+                fields=["event_title"],
+                opclasses=["gin_trgm_ops"],
+                name="event_title_trgm",
+            ),
+            GinIndex(
+                fields=["city"], opclasses=["gin_trgm_ops"], name="event_city_trgm"
+            ),
+            GinIndex(
+                fields=["address"],
+                opclasses=["gin_trgm_ops"],
+                name="event_address_trgm",
+            ),
+            GinIndex(
+                fields=["venue_name"],
+                opclasses=["gin_trgm_ops"],
+                name="event_venue_trgm",
+            ),
+            # Upcoming published catalog and the time-window filters
+            models.Index(
+                fields=["starts_at", "created_at"],
+                name="event_upcoming_idx",
+                condition=Q(is_published=True),
+            ),
+            # Bounding-box prefilter for radius searches (see event.geo)
+            models.Index(
+                fields=["latitude", "longitude"],
+                name="event_lat_lng_idx",
+                condition=Q(is_published=True, latitude__isnull=False),
+            ),
+            # Keyset pagination of the explore feed (see event.paginations)
+            models.Index(
+                fields=["-created_at", "-id"],
+                name="event_feed_recent_idx",
+                condition=Q(is_published=True),
+            ),
+            models.Index(
+                fields=["-like_count", "-id"],
+                name="event_feed_liked_idx",
+                condition=Q(is_published=True),
+            ),
+            models.Index(
+                fields=["-tickets_sold", "-id"],
+                name="event_feed_attended_idx",
+                condition=Q(is_published=True),
+            ),
+            models.Index(
+                fields=["-trending_score", "-id"],
+                name="event_feed_trending_idx",
+                condition=Q(is_published=True),
+            ),
+        ]
 
-    def comment_count(self):
-        return self.comments.count()
+    def __str__(self):
+        return f"{self.event_title} by {self.organizer.username}"
 
     def total_tickets_sold(self):
-        return sum(ticket.sold_quantity for ticket in self.tickets.all())
+        return self.tickets_sold
+
+    def adjust_counters(self, **deltas):
+        """
+        Atomically shift the denormalized counters, e.g.
+        ``event.adjust_counters(like_count=1)``.
+        """
+        updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if updates:
+            Event.objects.filter(pk=self.pk).update(**updates)
+
+    def sync_ticket_counters(self):
+        """
+        Recompute tickets_sold/tickets_available from the event's ticket rows;
+        seats under an active hold are not available.
+        """
+        totals = self.tickets.aggregate(
+            quantity=Sum("quantity"),
+            sold=Sum("sold_quantity"),
+            held=Sum("held_quantity"),
+        )
+        self.tickets_sold = totals["sold"] or 0
+        self.tickets_available = max(
+            0, (totals["quantity"] or 0) - self.tickets_sold - (totals["held"] or 0)
+        )
+        Event.objects.filter(pk=self.pk).update(
+            tickets_sold=self.tickets_sold, tickets_available=self.tickets_available
+        )
 
 
 class Ticket(models.Model):
@@ -82,14 +206,69 @@ class Ticket(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.IntegerField(default=0)
     sold_quantity = models.IntegerField(default=0)
+    # Seats reserved by active TicketHolds, not yet paid for
+    held_quantity = models.IntegerField(default=0)
     description = models.TextField(blank=True, null=True)
 
     class Meta:
         unique_together = ("event", "ticket_type")
+        constraints = [
+            # No oversell, whatever path writes the counters (see event.holds)
+            models.CheckConstraint(
+                condition=Q(sold_quantity__gte=0, held_quantity__gte=0)
+                & Q(quantity__gte=F("sold_quantity") + F("held_quantity")),
+                name="ticket_no_oversell",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.ticket_type} ticket for {self.event.event_title}"
 
+    @property
+    def available_quantity(self):
+        return max(0, self.quantity - self.sold_quantity - self.held_quantity)
+
+
+class TicketHold(models.Model):
+    """
+    Seats of one ticket type set aside for a buyer while they pay (see
+    event.holds). Holds sharing a reservation_id are checked out together.
+    """
+
+    STATUS_CHOICES = [
+        ("active", "Active"),
+        ("converted", "Converted"),
+        ("released", "Released"),
+    ]
+
+    reservation_id = models.UUIDField(default=uuid.uuid4, db_index=True)
+    user = models.ForeignKey(
+        Profile, on_delete=models.CASCADE, related_name="ticket_holds"
+    )
+    event = models.ForeignKey(
+        Event, on_delete=models.CASCADE, related_name="ticket_holds"
+    )
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name="holds")
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="active")
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # The sweeper's scan for expired holds
+            models.Index(
+                fields=["expires_at"],
+                name="ticket_hold_active_idx",
+                condition=Q(status="active"),
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.quantity} {self.ticket.ticket_type} held for {self.user.username}"
+        )
+
 
 class TicketPurchase(models.Model):
     buyer = models.ForeignKey(
@@ -178,3 +357,25 @@ class Review(models.Model):
 
     def __str__(self):
         return f"{self.rating} by {self.user.username} for {self.event.event_title}"
+
+
+class EventSimilarity(models.Model):
+    """
+    Top item-item neighbours of an event, rebuilt periodically by
+    event.recommendations.
+    """
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="neighbors")
+    neighbor = models.ForeignKey(
+        Event, on_delete=models.CASCADE, related_name="neighbor_of"
+    )
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ("event", "neighbor")
+        indexes = [
+            models.Index(fields=["event", "-score"], name="event_similarity_event_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} ~ {self.neighbor_id} ({self.score:.3f})"
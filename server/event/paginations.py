@@ -0,0 +1,137 @@
+import base64
+import json
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class EventKeysetPagination(BasePagination):
+    """
+    Keyset pagination for infinite-scroll feeds.
+
+    The queryset's ordering is completed with ``-id`` so every row has a unique
+    position, and the cursor carries the sort-key values of the last row
+    returned. The next page is a range scan past that tuple, so there is no
+    COUNT(*) and no OFFSET, and rows inserted while a client is scrolling
+    never shift or duplicate entries on later pages.
+    """
+
+    page_size = 9
+    page_size_query_param = "limit"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.after(cursor))
+
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        ordering = [
+            field for field in queryset.query.order_by if isinstance(field, str)
+        ]
+        if not ordering:
+            ordering = ["-created_at"]
+        if not {"id", "-id", "pk", "-pk"}.intersection(ordering):
+            ordering.append("-id")
+        return ordering
+
+    def after(self, values):
+        """
+        Build ``(a, b, c) > (x, y, z)`` in the direction of each sort key as
+        ``a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)``.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.cursor_for(self.page[-1])
+        )
+
+    def cursor_for(self, obj):
+        """
+        Cursor for the page that starts right after ``obj``.
+        """
+        values = [getattr(obj, field.lstrip("-")) for field in self.ordering]
+        return self.encode_cursor(values)
+
+    def encode_cursor(self, values):
+        # default=str keeps full microsecond precision on datetimes, which
+        # the equality half of the keyset comparison depends on.
+        payload = json.dumps(
+            {"o": self.ordering, "v": values}, default=str, separators=(",", ":")
+        )
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values = payload["v"]
+            ordering = payload["o"]
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # A cursor only makes sense for the sort it was issued for.
+        if ordering != self.ordering or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+
+class CommentKeysetPagination(EventKeysetPagination):
+    """
+    Newest-first comment pages. The ordering is fixed so the event detail
+    response can hand out a cursor for the page after its embedded comments.
+    """
+
+    page_size = 10
+    ordering = ["-created_at", "-id"]
+
+    def get_ordering(self, queryset):
+        return list(self.ordering)
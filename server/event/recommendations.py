@@ -0,0 +1,183 @@
+"""
+Item-item collaborative filtering for the "recommended events" list.
+
+The rebuild job turns recent likes, bookings, reviews and follows into a
+sparse user x event matrix, computes the cosine similarity between event
+columns and keeps the TOP_K most similar upcoming events per event in
+EventSimilarity. Serving a user's list is then a single query over that
+table: the neighbours of everything the user interacted with, summed per
+neighbour. Users with no neighbours (new accounts, or only stale activity)
+fall back to the trending order.
+"""
+
+import logging
+import math
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+from Profile.models import Follow
+from users.models import Booking
+from .filters import day_start
+from .models import Event, EventSimilarity, Like, Review
+
+logger = logging.getLogger(__name__)
+
+LOOKBACK = timedelta(days=180)
+WEIGHTS = {"like": 1.0, "booking": 3.0, "follow": 0.5}
+TOP_K = 20
+# Bound the pairwise work per user; heavy users keep their strongest items.
+MAX_ITEMS_PER_USER = 200
+MIN_COMMON_USERS = 2
+CREATE_BATCH_SIZE = 5000
+
+
+def review_weight(rating):
+    # 1 star counts against the event, 3 is neutral, 5 is as strong as a booking.
+    return (rating - 3) * 1.5
+
+
+def interactions(since):
+    """
+    ``{user_id: {event_id: weight}}`` for activity after ``since``.
+    """
+    matrix = defaultdict(lambda: defaultdict(float))
+
+    def add(user_id, event_id, weight):
+        matrix[user_id][event_id] += weight
+
+    for user_id, event_id in Like.objects.filter(created_at__gte=since).values_list(
+        "user_id", "event_id"
+    ):
+        add(user_id, event_id, WEIGHTS["like"])
+
+    for user_id, event_id in (
+        Booking.objects.filter(created_at__gte=since)
+        .values_list("user_id", "event_id")
+        .distinct()
+    ):
+        add(user_id, event_id, WEIGHTS["booking"])
+
+    for user_id, event_id, rating in Review.objects.filter(
+        created_at__gte=since
+    ).values_list("user_id", "event_id", "rating"):
+        add(user_id, event_id, review_weight(rating))
+
+    # Following an organizer is a weak vote for each of their recent events.
+    for user_id, event_id in Follow.objects.filter(
+        status="accepted", followed__events__created_at__gte=since
+    ).values_list("follower_id", "followed__events__id"):
+        add(user_id, event_id, WEIGHTS["follow"])
+
+    return matrix
+
+
+def similarities(matrix, candidates):
+    """
+    Cosine similarity between event columns, keeping for every event its
+    TOP_K most similar events from ``candidates``.
+    """
+    norms = defaultdict(float)
+    dots = defaultdict(lambda: defaultdict(float))
+    common = defaultdict(lambda: defaultdict(int))
+
+    for items in matrix.values():
+        items = {event_id: w for event_id, w in items.items() if w}
+        if len(items) > MAX_ITEMS_PER_USER:
+            strongest = sorted(items, key=lambda e: abs(items[e]), reverse=True)
+            items = {
+                event_id: items[event_id] for event_id in strongest[:MAX_ITEMS_PER_USER]
+            }
+        for event_id, weight in items.items():
+            norms[event_id] += weight * weight
+        for event_id, weight in items.items():
+            for other_id, other_weight in items.items():
+                if other_id != event_id and other_id in candidates:
+                    dots[event_id][other_id] += weight * other_weight
+                    common[event_id][other_id] += 1
+
+    neighbors = {}
+    for event_id, row in dots.items():
+        scored = [
+            (other_id, dot / math.sqrt(norms[event_id] * norms[other_id]))
+            for other_id, dot in row.items()
+            if dot > 0 and common[event_id][other_id] >= MIN_COMMON_USERS
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        if scored:
+            neighbors[event_id] = scored[:TOP_K]
+    return neighbors
+
+
+def rebuild(now=None):
+    """
+    Recompute and replace every event's neighbour list.
+    """
+    now = now or timezone.now()
+    matrix = interactions(now - LOOKBACK)
+    candidates = set(
+        Event.objects.filter(
+            is_published=True, starts_at__gte=day_start(now.date())
+        ).values_list("pk", flat=True)
+    )
+    neighbors = similarities(matrix, candidates)
+
+    rows = [
+        EventSimilarity(event_id=event_id, neighbor_id=other_id, score=score)
+        for event_id, scored in neighbors.items()
+        for other_id, score in scored
+    ]
+    with transaction.atomic():
+        EventSimilarity.objects.all().delete()
+        EventSimilarity.objects.bulk_create(rows, batch_size=CREATE_BATCH_SIZE)
+    return len(neighbors)
+
+
+def interacted_events(user):
+    """
+    Subqueries for the events a user has already engaged with.
+    """
+    return [
+        Like.objects.filter(user=user).values("event_id"),
+        Booking.objects.filter(user=user).values("event_id"),
+        Review.objects.filter(user=user, rating__gte=3).values("event_id"),
+        Event.objects.filter(
+            organizer__followers__follower=user,
+            organizer__followers__status="accepted",
+        ).values("id"),
+    ]
+
+
+def upcoming_events():
+    return Event.objects.filter(
+        is_published=True, starts_at__gte=day_start(timezone.now().date())
+    )
+
+
+def recommended_events(user, limit):
+    """
+    The user's best unseen upcoming events by summed neighbour similarity,
+    and whether the list is personalized. Falls back to trending events when
+    there is nothing to go on.
+    """
+    seen = interacted_events(user)
+    from_seen = Q()
+    for events in seen:
+        from_seen |= Q(neighbor_of__event__in=events)
+
+    # Events by followed organizers stay eligible; the rest were already seen.
+    queryset = upcoming_events().exclude(organizer=user)
+    for events in seen[:3]:
+        queryset = queryset.exclude(pk__in=events)
+
+    recommended = list(
+        queryset.filter(from_seen)
+        .annotate(recommendation_score=Sum("neighbor_of__score"))
+        .order_by("-recommendation_score", "-id")[:limit]
+    )
+    if recommended:
+        return recommended, True
+
+    trending = queryset.order_by("-trending_score", "-id")[:limit]
+    return list(trending), False
@@ -0,0 +1,112 @@
+import re
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramWordSimilarity,
+)
+from django.db import connection
+from django.db.models import (
+    CharField,
+    F,
+    FloatField,
+    Lookup,
+    OuterRef,
+    Q,
+    Subquery,
+    TextField,
+    Value,
+)
+from django.db.models.functions import Cast, Greatest
+from users.models import Profile
+from .models import Event
+
+SEARCH_CONFIG = "english"
+SEARCH_FIELDS = {"event_title", "venue_name", "city", "description", "organizer"}
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@CharField.register_lookup
+@TextField.register_lookup
+class ILike(Lookup):
+    """
+    ``col ILIKE pattern`` on the bare column. ``icontains`` compiles to
+    ``UPPER(col) LIKE UPPER(...)`` on PostgreSQL, which a gin_trgm_ops index
+    on ``col`` cannot serve; ILIKE can.
+    """
+
+    lookup_name = "ilike"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} ILIKE {rhs}", [*lhs_params, *rhs_params]
+
+
+def event_search_vector(organizer_name):
+    """
+    Weighted document for an event: title > venue/city > description > organizer.
+    """
+    return (
+        SearchVector("event_title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("venue_name", "city", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+        + SearchVector(organizer_name, weight="D", config=SEARCH_CONFIG)
+    )
+
+
+def refresh_search_vector(event):
+    Event.objects.filter(pk=event.pk).update(
+        search_vector=event_search_vector(Value(event.organizer.username))
+    )
+
+
+def rebuild_search_vectors(queryset=None):
+    queryset = Event.objects.all() if queryset is None else queryset
+    organizer_name = Subquery(
+        Profile.objects.filter(pk=OuterRef("organizer_id")).values("username")[:1]
+    )
+    return queryset.update(search_vector=event_search_vector(organizer_name))
+
+
+def build_search_query(value):
+    """
+    Turn free text into a prefix tsquery so partially typed words still match,
+    e.g. "jazz nig" -> 'jazz' & 'nig':*.
+    """
+    tokens = TOKEN_RE.findall(value.lower())
+    if not tokens:
+        return None
+    terms = [f"'{token}'" for token in tokens]
+    terms[-1] += ":*"
+    return SearchQuery(" & ".join(terms), search_type="raw", config=SEARCH_CONFIG)
+
+
+def search_rank(query):
+    # ts_rank returns a real; widen it so the value survives a round trip
+    # through a keyset cursor and compares equal afterwards.
+    return Cast(SearchRank(F("search_vector"), query), FloatField())
+
+
+def trigram_search(queryset, value, fields):
+    """
+    Substring or typo-tolerant match of ``value`` against ``fields``, best
+    matches first. On the indexed Event columns both the ILIKE and the ``%>``
+    predicate can use the column's gin_trgm_ops index.
+    """
+    value = value.strip()
+    if not value:
+        return queryset
+    pattern = f"%{connection.ops.prep_for_like_query(value)}%"
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f"{field}__ilike": pattern})
+        condition |= Q(**{f"{field}__trigram_word_similar": value})
+    scores = [TrigramWordSimilarity(value, field) for field in fields]
+    similarity = Greatest(*scores) if len(scores) > 1 else scores[0]
+    return (
+        queryset.filter(condition)
+        .annotate(match_similarity=Cast(similarity, FloatField()))
+        .order_by("-match_similarity")
+    )
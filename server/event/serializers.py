@@ -1,14 +1,35 @@
 from rest_framework import serializers
 from .models import *
 from users.models import Profile
+from django.db.models import Exists, OuterRef, Prefetch
+from .paginations import CommentKeysetPagination
+from .geo import geocode
+from django.db import transaction
+from decimal import Decimal, InvalidOperation
+from . import media
+from .tasks import process_event_media
+from services import outbox_service
 import json
-import cloudinary.uploader
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Variants map from event.media plus ``srcset`` strings per format, or
+    None while no variants exist yet.
+    """
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        return {**value, "srcset": media.srcset(value)}
 
 
 class EventSerializer(serializers.ModelSerializer):
     tickets = serializers.CharField()
     event_banner = serializers.FileField(required=False, allow_null=True)
     promotional_image = serializers.FileField(required=False, allow_null=True)
+    event_banner_variants = ImageVariantsField()
+    promotional_image_variants = ImageVariantsField()
 
     class Meta:
         model = Event
@@ -21,6 +42,8 @@ class EventSerializer(serializers.ModelSerializer):
             "venue_name",
             "address",
             "city",
+            "latitude",
+            "longitude",
             "start_date",
             "end_date",
             "start_time",
@@ -37,8 +60,18 @@ class EventSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
             "cancel_ticket",
+            "queue_enabled",
+            "queue_admit_rate",
+            "media_status",
+            "event_banner_variants",
+            "promotional_image_variants",
+        ]
+        read_only_fields = [
+            "organizer",
+            "created_at",
+            "updated_at",
+            "media_status",
         ]
-        read_only_fields = ["organizer", "created_at", "updated_at"]
 
     def create(self, validated_data):
         return self.save_event(validated_data)
@@ -46,70 +79,161 @@ class EventSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         return self.save_event(validated_data, instance)
 
-    def save_event(self, validated_data, instance=None):
+    def validate_tickets(self, value):
+        """
+        Parse the ticket JSON into ``{ticket_type: fields}``.
+        """
         try:
-            tickets_data = json.loads(validated_data.pop("tickets"))
-            request = self.context.get("request")
-
-            if "event_banner" in validated_data and validated_data["event_banner"]:
-                upload_result = cloudinary.uploader.upload(
-                    validated_data.pop("event_banner")
+            tickets_data = json.loads(value)
+            tickets = {}
+            for ticket_data in tickets_data:
+                ticket_type = ticket_data["ticketType"]
+                if ticket_type in tickets:
+                    raise serializers.ValidationError(
+                        f"Duplicate ticket type {ticket_type}"
+                    )
+                tickets[ticket_type] = {
+                    "price": Decimal(str(ticket_data["ticketPrice"])),
+                    "quantity": int(ticket_data["ticketQuantity"]),
+                    "description": ticket_data.get("ticketDescription", ""),
+                }
+        except (TypeError, ValueError, KeyError, InvalidOperation) as e:
+            raise serializers.ValidationError(f"Invalid tickets: {e}")
+
+        if self.instance:
+            self.check_sold_quantities(self.instance.tickets.all(), tickets)
+        return tickets
+
+    def check_sold_quantities(self, existing, tickets):
+        for ticket in existing:
+            quantity = tickets.get(ticket.ticket_type, {}).get("quantity", 0)
+            taken = ticket.sold_quantity + ticket.held_quantity
+            if quantity < taken:
+                raise serializers.ValidationError(
+                    f"{ticket.ticket_type} already has {taken} tickets sold or "
+                    f"reserved and cannot be reduced to {quantity}"
                 )
-                validated_data["event_banner"] = upload_result["url"]
-
-            if (
-                "promotional_image" in validated_data
-                and validated_data["promotional_image"]
-            ):
-                upload_result = cloudinary.uploader.upload(
-                    validated_data.pop("promotional_image")
+
+    def sync_tickets(self, instance, tickets):
+        """
+        Bring the event's tickets in line with ``tickets`` in at most three
+        statements, keeping sold_quantity and purchases of kept types.
+        """
+        existing = {
+            ticket.ticket_type: ticket
+            for ticket in Ticket.objects.select_for_update().filter(event=instance)
+        }
+        # Re-checked under the row locks in case tickets sold since validation.
+        self.check_sold_quantities(existing.values(), tickets)
+
+        to_create, to_update = [], []
+        for ticket_type, fields in tickets.items():
+            ticket = existing.get(ticket_type)
+            if ticket is None:
+                to_create.append(
+                    Ticket(event=instance, ticket_type=ticket_type, **fields)
                 )
-                validated_data["promotional_image"] = upload_result["url"]
+                continue
+            if any(getattr(ticket, key) != value for key, value in fields.items()):
+                for key, value in fields.items():
+                    setattr(ticket, key, value)
+                to_update.append(ticket)
+        removed = [
+            ticket.pk
+            for ticket_type, ticket in existing.items()
+            if ticket_type not in tickets
+        ]
 
-            validated_data["age_restriction"] = bool(
-                validated_data.get("age_restriction", False)
-            )
-            validated_data["is_draft"] = bool(validated_data.get("is_draft", False))
-            validated_data["is_published"] = bool(
-                validated_data.get("is_published", False)
+        if removed:
+            Ticket.objects.filter(pk__in=removed).delete()
+        if to_update:
+            Ticket.objects.bulk_update(to_update, ["price", "quantity", "description"])
+        if to_create:
+            Ticket.objects.bulk_create(to_create)
+
+    def normalize_event_data(self, validated_data):
+        validated_data["age_restriction"] = bool(
+            validated_data.get("age_restriction", False)
+        )
+        validated_data["is_draft"] = bool(validated_data.get("is_draft", False))
+        validated_data["is_published"] = bool(validated_data.get("is_published", False))
+
+        # Clients may send coordinates; otherwise look the city up offline.
+        if (
+            validated_data.get("latitude") is None
+            or validated_data.get("longitude") is None
+        ):
+            validated_data["latitude"], validated_data["longitude"] = geocode(
+                validated_data.get("city"), validated_data.get("address")
             )
+        return validated_data
 
-            if instance:
-                for key, value in validated_data.items():
-                    setattr(instance, key, value)
-                instance.save()
-                Ticket.objects.filter(event=instance).delete()
-            else:
-                validated_data["organizer"] = request.user
-                instance = Event.objects.create(**validated_data)
+    def save_event(self, validated_data, instance=None):
+        staged = {}
+        try:
+            tickets = validated_data.pop("tickets")
+            request = self.context.get("request")
 
-            for ticket_data in tickets_data:
-                Ticket.objects.create(
-                    event=instance,
-                    ticket_type=ticket_data["ticketType"],
-                    price=ticket_data["ticketPrice"],
-                    quantity=ticket_data["ticketQuantity"],
-                    description=ticket_data.get("ticketDescription", ""),
-                )
+            # Images are processed off the request by process_event_media.
+            for field in media.MEDIA_FIELDS:
+                if validated_data.get(field):
+                    staged[field] = media.stage(validated_data.pop(field))
+            if staged:
+                pending = {**(instance.pending_media if instance else {}), **staged}
+                validated_data["pending_media"] = pending
+                validated_data["media_status"] = "pending"
+
+            self.normalize_event_data(validated_data)
+
+            with transaction.atomic():
+                if instance:
+                    for key, value in validated_data.items():
+                        setattr(instance, key, value)
+                    instance.save()
+                else:
+                    validated_data["organizer"] = request.user
+                    instance = Event.objects.create(**validated_data)
+
+                self.sync_tickets(instance, tickets)
+                instance.sync_ticket_counters()
+                if staged:
+                    # Through the outbox, so a broker outage after commit
+                    # delays the processing instead of losing it.
+                    outbox_service.enqueue(process_event_media, instance.id)
 
             return instance
-        except Exception as e:
+        except Exception:
+            media.discard_staged(staged.values())
             raise
 
 
-class EventPreviewSerializer(serializers.ModelSerializer):
-    like_count = serializers.SerializerMethodField()
-    comment_count = serializers.SerializerMethodField()
+class EventImportSerializer(EventSerializer):
+    """
+    One row of a bulk import. Images are given as already hosted URLs;
+    their variants are never taken from the row (see bulk.attach_variants).
+    """
 
-    def get_like_count(self, obj):
-        return obj.likes.count()
+    event_banner = serializers.URLField(
+        max_length=500, required=False, allow_null=True, allow_blank=True
+    )
+    promotional_image = serializers.URLField(
+        max_length=500, required=False, allow_null=True, allow_blank=True
+    )
 
-    def get_comment_count(self, obj):
-        return obj.comments.count()
+
+class EventPreviewSerializer(serializers.ModelSerializer):
+    event_banner_variants = ImageVariantsField()
 
     class Meta:
         model = Event
-        fields = ["id", "event_title", "event_banner", "like_count", "comment_count"]
+        fields = [
+            "id",
+            "event_title",
+            "event_banner",
+            "event_banner_variants",
+            "like_count",
+            "comment_count",
+        ]
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -117,13 +241,25 @@ class CommentSerializer(serializers.ModelSerializer):
     profile_picture = serializers.CharField(
         source="user.profile_picture", read_only=True
     )
+    profile_picture_variants = ImageVariantsField(
+        source="user.profile_picture_variants"
+    )
 
     class Meta:
         model = Comment
-        fields = ["id", "username", "profile_picture", "text", "created_at"]
+        fields = [
+            "id",
+            "username",
+            "profile_picture",
+            "profile_picture_variants",
+            "text",
+            "created_at",
+        ]
 
 
 class TicketSerializer(serializers.ModelSerializer):
+    available_quantity = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Ticket
         fields = [
@@ -133,6 +269,8 @@ class TicketSerializer(serializers.ModelSerializer):
             "quantity",
             "description",
             "sold_quantity",
+            "held_quantity",
+            "available_quantity",
         ]
 
 
@@ -143,11 +281,15 @@ class EventSerializerExplore(serializers.ModelSerializer):
     organizer_profile_picture = serializers.CharField(
         source="organizer.profile_picture", read_only=True
     )
-    comments = CommentSerializer(many=True, read_only=True)
+    organizer_profile_picture_variants = ImageVariantsField(
+        source="organizer.profile_picture_variants"
+    )
+    event_banner_variants = ImageVariantsField()
+    promotional_image_variants = ImageVariantsField()
+    comments = serializers.SerializerMethodField()
+    comments_cursor = serializers.SerializerMethodField()
     tickets = TicketSerializer(many=True, read_only=True)
-    like_count = serializers.SerializerMethodField()
-    comment_count = serializers.SerializerMethodField()
-    total_tickets_sold = serializers.SerializerMethodField()
+    total_tickets_sold = serializers.IntegerField(source="tickets_sold", read_only=True)
     liked = serializers.SerializerMethodField()
 
     class Meta:
@@ -169,10 +311,14 @@ class EventSerializerExplore(serializers.ModelSerializer):
             "age_restriction",
             "special_instructions",
             "event_banner",
+            "event_banner_variants",
             "promotional_image",
+            "promotional_image_variants",
             "organizer_username",
             "organizer_profile_picture",
+            "organizer_profile_picture_variants",
             "comments",
+            "comments_cursor",
             "tickets",
             "like_count",
             "comment_count",
@@ -182,16 +328,53 @@ class EventSerializerExplore(serializers.ModelSerializer):
             "liked",
         ]
 
-    def get_like_count(self, obj):
-        return obj.like_count()
+    @staticmethod
+    def setup_eager_loading(queryset, user=None):
+        """
+        Load everything the serializer reads in three queries: the event with
+        its organizer (and the viewer's like as an EXISTS subquery), its
+        tickets, and the first page of comments with their authors.
+        """
+        page_size = CommentKeysetPagination.page_size
+        comments = Comment.objects.select_related("user").order_by(
+            *CommentKeysetPagination.ordering
+        )
+        queryset = queryset.select_related("organizer").prefetch_related(
+            "tickets",
+            Prefetch(
+                "comments", queryset=comments[: page_size + 1], to_attr="comment_page"
+            ),
+        )
+        if user is not None and user.is_authenticated:
+            queryset = queryset.annotate(
+                liked=Exists(Like.objects.filter(event=OuterRef("pk"), user=user))
+            )
+        return queryset
+
+    def get_comment_page(self, obj):
+        if not hasattr(obj, "comment_page"):
+            obj.comment_page = list(
+                obj.comments.select_related("user").order_by(
+                    *CommentKeysetPagination.ordering
+                )[: CommentKeysetPagination.page_size + 1]
+            )
+        return obj.comment_page
 
-    def get_comment_count(self, obj):
-        return obj.comment_count()
+    def get_comments(self, obj):
+        page = self.get_comment_page(obj)[: CommentKeysetPagination.page_size]
+        return CommentSerializer(page, many=True).data
 
-    def get_total_tickets_sold(self, obj):
-        return obj.total_tickets_sold()
+    def get_comments_cursor(self, obj):
+        page = self.get_comment_page(obj)
+        if len(page) <= CommentKeysetPagination.page_size:
+            return None
+        return CommentKeysetPagination().cursor_for(
+            page[CommentKeysetPagination.page_size - 1]
+        )
 
     def get_liked(self, obj):
+        if hasattr(obj, "liked"):
+            return obj.liked
         request = self.context.get("request")
         if request and request.user.is_authenticated:
             user_pro = request.user
@@ -230,7 +413,36 @@ class EventCompleteDataSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Event
-        fields = "__all__"
+        # Listed explicitly so internal columns (search, trending, media and
+        # queue state, counters) stay out of the public payload.
+        fields = [
+            "id",
+            "organizer",
+            "event_title",
+            "event_type",
+            "description",
+            "venue_name",
+            "address",
+            "city",
+            "start_date",
+            "end_date",
+            "start_time",
+            "end_time",
+            "visibility",
+            "capacity",
+            "age_restriction",
+            "special_instructions",
+            "event_banner",
+            "promotional_image",
+            "is_draft",
+            "is_published",
+            "created_at",
+            "updated_at",
+            "revenue_distributed",
+            "published_at",
+            "cancel_ticket",
+            "tickets",
+        ]
 
 
 class BookedEventSerializer(serializers.ModelSerializer):
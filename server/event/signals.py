@@ -0,0 +1,108 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_migrate
+from django.dispatch import receiver
+from .models import Event, Ticket, Like, Comment
+from .search import SEARCH_FIELDS, refresh_search_vector
+from django.utils import timezone
+from . import autocomplete
+from . import cache as event_cache
+from . import waiting_room
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fields that feed the autocomplete index (see event.autocomplete).
+AUTOCOMPLETE_FIELDS = {
+    "event_title",
+    "city",
+    "venue_name",
+    "is_published",
+    "start_date",
+    "start_time",
+}
+# Fields the waiting room tick reads from Redis (see event.waiting_room).
+WAITING_ROOM_FIELDS = {"queue_enabled", "queue_admit_rate"}
+
+
+@receiver(pre_migrate)
+def create_search_extensions(sender, using="default", **kwargs):
+    # The trigram indexes on Event and Profile need pg_trgm before they are built.
+    if sender.name != "event":
+        return
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+
+@receiver(post_save, sender=Event)
+def update_event_search_vector(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    refresh_search_vector(instance)
+
+
+def drop_cached_event(event_id, catalog=False):
+    # Run after commit so a concurrent reader cannot re-cache the old row.
+    def invalidate():
+        event_cache.invalidate_event(event_id)
+        if catalog:
+            event_cache.invalidate_catalog()
+
+    transaction.on_commit(invalidate)
+
+
+@receiver([post_save, post_delete], sender=Event)
+def invalidate_event_cache(sender, instance, **kwargs):
+    drop_cached_event(instance.pk, catalog=True)
+
+
+@receiver([post_save, post_delete], sender=Ticket)
+@receiver([post_save, post_delete], sender=Like)
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_event_cache_for_related(sender, instance, **kwargs):
+    # Catalog cards only carry counters, which the short catalog TTL absorbs.
+    drop_cached_event(instance.event_id)
+
+
+@receiver(post_save, sender=Event)
+def refresh_autocomplete(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields and not AUTOCOMPLETE_FIELDS.intersection(update_fields):
+        return
+
+    def refresh():
+        try:
+            if instance.is_published and instance.start_date >= timezone.now().date():
+                autocomplete.add_event(instance)
+            if not created:
+                # Drop terms the edit or unpublish made stale.
+                autocomplete.queue_rebuild()
+        except Exception as e:
+            logger.warning(f"Could not update autocomplete for {instance.pk}: {e}")
+
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=Event)
+def sync_waiting_room_rate(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not WAITING_ROOM_FIELDS.intersection(update_fields):
+        return
+
+    def sync():
+        try:
+            waiting_room.sync_rate(instance)
+        except Exception as e:
+            logger.warning(f"Could not update waiting room rate for {instance.pk}: {e}")
+
+    transaction.on_commit(sync)
+
+
+@receiver(post_delete, sender=Event)
+def drop_from_autocomplete(sender, instance, **kwargs):
+    def refresh():
+        try:
+            autocomplete.queue_rebuild()
+        except Exception as e:
+            logger.warning(f"Could not queue autocomplete rebuild: {e}")
+
+    transaction.on_commit(refresh)
@@ -0,0 +1,218 @@
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def update_trending_scores():
+    try:
+        from . import trending
+
+        touched = trending.update()
+        logger.info(f"Updated trending scores for {touched} events")
+        return f"Updated trending scores for {touched} events"
+
+    except Exception as e:
+        logger.error(f"Error updating trending scores: {str(e)}")
+        raise
+
+
+@shared_task
+def flush_like_buffer():
+    try:
+        from . import likes
+
+        flushed = likes.flush()
+        logger.info(f"Flushed buffered likes for {flushed} events")
+        return f"Flushed buffered likes for {flushed} events"
+
+    except Exception as e:
+        logger.error(f"Error flushing like buffer: {str(e)}")
+        raise
+
+
+@shared_task
+def send_like_digests():
+    try:
+        from . import likes
+        from .models import Event
+        from users.tasks import send_user_notification
+
+        digests = likes.take_digests()
+        events = Event.objects.filter(pk__in=digests).only(
+            "id", "event_title", "organizer_id"
+        )
+        for event in events:
+            count, username = digests[event.id]
+            send_user_notification.delay(
+                event.organizer_id, likes.digest_message(event, count, username)
+            )
+
+        logger.info(f"Sent like digests for {len(events)} events")
+        return f"Sent like digests for {len(events)} events"
+
+    except Exception as e:
+        logger.error(f"Error sending like digests: {str(e)}")
+        raise
+
+
+@shared_task
+def process_event_media(event_id):
+    from . import media
+    from .models import Event
+    from .signals import drop_cached_event
+
+    try:
+        event = Event.objects.only("pending_media").get(pk=event_id)
+    except Event.DoesNotExist:
+        return f"Event {event_id} no longer exists"
+
+    pending = event.pending_media
+    if not pending:
+        return f"No pending media for event {event_id}"
+
+    try:
+        storage = media.get_storage()
+        published = {
+            field: media.publish(event_id, field, staged_name, storage)
+            for field, staged_name in pending.items()
+        }
+    except Exception as e:
+        logger.error(f"Error processing media for event {event_id}: {str(e)}")
+        Event.objects.filter(pk=event_id, pending_media=pending).update(
+            pending_media={}, media_status="failed"
+        )
+        media.discard_staged(pending.values())
+        drop_cached_event(event_id, catalog=True)
+        raise
+
+    # Only the task for the latest uploads may swap the URLs in.
+    fields = {}
+    for field, (url, variants) in published.items():
+        fields[field] = url
+        fields[f"{field}_variants"] = variants
+    updated = Event.objects.filter(pk=event_id, pending_media=pending).update(
+        **fields, pending_media={}, media_status="ready"
+    )
+    if not updated:
+        logger.info(f"Media for event {event_id} was superseded by a newer upload")
+        return f"Media for event {event_id} superseded"
+
+    media.discard_staged(pending.values())
+    drop_cached_event(event_id, catalog=True)
+    logger.info(f"Processed {len(published)} media files for event {event_id}")
+    return f"Processed {len(published)} media files for event {event_id}"
+
+
+@shared_task
+def generate_image_variants(source_name, pk):
+    from . import media
+    from django.apps import apps
+
+    source = media.SOURCES[source_name]
+    model = apps.get_model(source.model)
+    url = (
+        model.objects.filter(pk=pk, **source.filters)
+        .values_list(source.url_field, flat=True)
+        .first()
+    )
+    if not url:
+        return f"No {source_name} image for {pk}"
+
+    try:
+        variants = media.build_variants(source_name, pk, url)
+        media.apply_variants(source_name, pk, url, variants)
+        return f"Generated {source_name} variants for {pk}"
+
+    except Exception as e:
+        logger.error(f"Error generating {source_name} variants for {pk}: {str(e)}")
+        raise
+
+
+@shared_task
+def import_events(job_id, organizer_id, rows):
+    from . import bulk
+    from users.models import Profile
+
+    try:
+        organizer = Profile.objects.get(pk=organizer_id)
+        bulk.update_job(job_id, status="running")
+        cleaned = bulk.validate_rows(rows)
+        events = bulk.create_events(
+            organizer,
+            cleaned,
+            progress=lambda done: bulk.update_job(job_id, done=done),
+        )
+    except bulk.BulkImportError as e:
+        bulk.update_job(job_id, status="failed", error=str(e), errors=e.errors)
+        logger.info(f"Event import {job_id} rejected: {str(e)}")
+        return f"Event import {job_id} rejected: {str(e)}"
+    except Exception as e:
+        bulk.update_job(job_id, status="failed", error="Import failed")
+        logger.error(f"Error importing events for job {job_id}: {str(e)}")
+        raise
+
+    bulk.update_job(
+        job_id,
+        status="completed",
+        done=len(events),
+        event_ids=[event.id for event in events],
+    )
+    logger.info(f"Imported {len(events)} events for job {job_id}")
+    return f"Imported {len(events)} events for job {job_id}"
+
+
+@shared_task
+def update_event_recommendations():
+    try:
+        from . import recommendations
+
+        events = recommendations.rebuild()
+        logger.info(f"Rebuilt recommendation neighbours for {events} events")
+        return f"Rebuilt recommendation neighbours for {events} events"
+
+    except Exception as e:
+        logger.error(f"Error rebuilding event recommendations: {str(e)}")
+        raise
+
+
+@shared_task
+def rebuild_autocomplete_index():
+    try:
+        from . import autocomplete
+
+        terms = autocomplete.rebuild()
+        logger.info(f"Rebuilt autocomplete index with {terms} terms")
+        return f"Rebuilt autocomplete index with {terms} terms"
+
+    except Exception as e:
+        logger.error(f"Error rebuilding autocomplete index: {str(e)}")
+        raise
+
+
+@shared_task
+def release_expired_ticket_holds():
+    try:
+        from . import holds
+
+        released = holds.release_expired()
+        logger.info(f"Released {released} expired ticket holds")
+        return f"Released {released} expired ticket holds"
+
+    except Exception as e:
+        logger.error(f"Error releasing expired ticket holds: {str(e)}")
+        raise
+
+
+@shared_task
+def admit_waiting_buyers():
+    try:
+        from . import waiting_room
+
+        admitted = waiting_room.tick()
+        return f"Admitted {admitted} buyers from waiting rooms"
+
+    except Exception as e:
+        logger.error(f"Error admitting buyers from waiting rooms: {str(e)}")
+        raise
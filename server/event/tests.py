@@ -1,3 +1,212 @@
-from django.test import TestCase
-
-# Create your tests here.
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from users.models import Profile
+from . import cache as event_cache
+from . import holds
+from .models import Comment, Event, Ticket
+from .paginations import CommentKeysetPagination
+
+
+class EventDetailQueryTests(TestCase):
+    """
+    Query budget of the event detail modal: the event, its tickets and its
+    first page of comments load in three queries however many comments the
+    event has, and later comment pages in one.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = Profile.objects.create_user(
+            username="organizer", email="organizer@example.com", password="x"
+        )
+        cls.viewer = Profile.objects.create_user(
+            username="viewer", email="viewer@example.com", password="x"
+        )
+        cls.event = Event.objects.create(
+            organizer=cls.organizer,
+            event_title="Jazz Night",
+            event_type="Concert",
+            description="Live jazz.",
+            venue_name="Blue Hall",
+            address="1 Main Street",
+            city="Kochi",
+            start_date=date.today() + timedelta(days=30),
+            start_time=time(19, 0),
+            capacity=100,
+            published_at=date.today(),
+            is_published=True,
+        )
+        for ticket_type in ("Regular", "Gold", "VIP"):
+            Ticket.objects.create(
+                event=cls.event, ticket_type=ticket_type, price=10, quantity=30
+            )
+        commenters = [
+            Profile.objects.create_user(
+                username=f"fan{i}", email=f"fan{i}@example.com", password="x"
+            )
+            for i in range(5)
+        ]
+        Comment.objects.bulk_create(
+            Comment(user=commenters[i % 5], event=cls.event, text=f"Comment {i}")
+            for i in range(CommentKeysetPagination.page_size * 2 + 3)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+        event_cache.invalidate_event(self.event.id)
+        self.addCleanup(event_cache.invalidate_event, self.event.id)
+
+    def test_detail_cache_miss_uses_three_queries(self):
+        url = reverse("event-details-modal", args=[self.event.id])
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["tickets"]), 3)
+        self.assertEqual(
+            len(response.data["comments"]), CommentKeysetPagination.page_size
+        )
+        self.assertIsNotNone(response.data["comments_cursor"])
+        self.assertFalse(response.data["liked"])
+
+    def test_comment_pages_use_one_query(self):
+        url = reverse("event-comments", args=[self.event.id])
+        seen = []
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(comment["id"] for comment in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(len(seen), CommentKeysetPagination.page_size * 2 + 3)
+        self.assertEqual(len(set(seen)), len(seen))
+
+
+class EventCatalogCacheTests(TestCase):
+    """
+    The page-number list and the cursor feed share a queryset and a cache,
+    but each must be served its own pagination.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = Profile.objects.create_user(
+            username="organizer", email="organizer@example.com", password="x"
+        )
+        Event.objects.create(
+            organizer=cls.organizer,
+            event_title="Jazz Night",
+            event_type="Concert",
+            description="Live jazz.",
+            venue_name="Blue Hall",
+            address="1 Main Street",
+            city="Kochi",
+            start_date=date.today() + timedelta(days=30),
+            start_time=time(19, 0),
+            capacity=100,
+            published_at=date.today(),
+            is_published=True,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+        event_cache.invalidate_catalog()
+        self.addCleanup(event_cache.invalidate_catalog)
+
+    def test_list_and_feed_do_not_share_cached_pages(self):
+        query = {"limit": 5}
+        listed = self.client.get(reverse("event-preview-list"), query)
+        feed = self.client.get(reverse("event-preview-feed"), query)
+        self.assertEqual(listed.status_code, 200)
+        self.assertEqual(feed.status_code, 200)
+        self.assertEqual(set(listed.data), {"count", "next", "previous", "results"})
+        self.assertEqual(set(feed.data), {"next", "results"})
+
+        # Served again, now from the cache, each keeps its own shape.
+        self.assertIn(
+            "count", self.client.get(reverse("event-preview-list"), query).data
+        )
+        self.assertNotIn(
+            "count", self.client.get(reverse("event-preview-feed"), query).data
+        )
+
+
+class TicketCheckoutRaceTests(TransactionTestCase):
+    """
+    Many buyers racing for one ticket tier through the hold and checkout
+    path. Each buyer runs on its own connection, so the rows are really
+    committed and the locks really contended.
+    """
+
+    buyers = 200
+    seats = 50
+    workers = 32
+
+    def setUp(self):
+        self.buyer = Profile.objects.create_user(
+            username="buyer", email="buyer@example.com", password="x"
+        )
+        self.event = Event.objects.create(
+            organizer=self.buyer,
+            event_title="Checkout race",
+            event_type="Concert",
+            description="-",
+            venue_name="-",
+            address="-",
+            city="-",
+            start_date=date.today() + timedelta(days=30),
+            start_time=time(19, 0),
+            capacity=self.seats,
+            published_at=date.today(),
+            is_published=True,
+        )
+        self.ticket = Ticket.objects.create(
+            event=self.event, ticket_type="Regular", price=1, quantity=self.seats
+        )
+        self.event.sync_ticket_counters()
+
+    def buy_concurrently(self):
+        start = threading.Barrier(self.workers)
+
+        def buy(index):
+            try:
+                if index < self.workers:
+                    start.wait(timeout=30)
+                _, placed = holds.place_holds(
+                    self.buyer, self.event, {"Regular": 1}, ttl=timedelta(minutes=1)
+                )
+                with transaction.atomic():
+                    holds.convert_holds(placed)
+                return True
+            except ValidationError:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return sum(pool.map(buy, range(self.buyers)))
+
+    def test_parallel_buyers_never_oversell(self):
+        purchases = self.buy_concurrently()
+
+        self.ticket.refresh_from_db()
+        self.assertLessEqual(self.ticket.sold_quantity, self.ticket.quantity)
+        self.assertEqual(purchases, self.ticket.quantity)
+        self.assertEqual(self.ticket.sold_quantity, purchases)
+        self.assertEqual(self.ticket.held_quantity, 0)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_sold, self.seats)
+
+    def test_constraint_rejects_direct_oversell(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Ticket.objects.filter(pk=self.ticket.pk).update(
+                sold_quantity=F("quantity") + 1
+            )
@@ -0,0 +1,171 @@
+"""
+Time-decayed trending score for upcoming events.
+
+Scores use forward decay: every interaction at time ``t`` adds
+``weight * exp(LAMBDA * (t - epoch))``. Since all events share one epoch,
+ordering by the stored value is the same as ordering by the decayed score
+``sum(weight * exp(-LAMBDA * (now - t)))``, so events with no new activity
+never need to be rewritten. The epoch is moved forward with a full rebuild
+before the exponent grows large.
+
+Each run folds in the rows created in ``(watermark, now - SETTLE_LAG]`` and
+moves the watermark to the end of that window. A row's ``created_at`` is
+set when it is inserted, not when its transaction commits, so the lag lets
+slow transactions commit before their rows fall behind the watermark. The
+windows never overlap, so every row is counted exactly once.
+"""
+
+import logging
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.cache import cache
+from django.db.models import Case, F, FloatField, Sum, Value, When
+from django.db.models.functions import Exp, Extract
+from django.utils import timezone
+from django_redis import get_redis_connection
+from users.models import Booking
+from .models import Event, Like, Comment
+
+logger = logging.getLogger(__name__)
+
+HALF_LIFE = timedelta(hours=48)
+LAMBDA = math.log(2) / HALF_LIFE.total_seconds()
+WEIGHTS = {"like": 1.0, "comment": 2.0, "booking": 5.0, "view": 0.1}
+
+# Activity older than this contributes < 0.1% and is ignored by rebuilds.
+LOOKBACK = HALF_LIFE * 10
+# Rebuild against a fresh epoch before exp() gets anywhere near overflow.
+EPOCH_MAX_AGE = timedelta(days=30)
+UPDATE_CHUNK = 500
+# Longer than any transaction that writes likes, comments or bookings; a
+# checkout, Stripe call included, finishes within a minute.
+SETTLE_LAG = timedelta(minutes=2)
+
+EPOCH_KEY = "trending:epoch"
+# End of the last window folded in (now - SETTLE_LAG at that run).
+LAST_RUN_KEY = "trending:last_run"
+VIEWS_KEY = "trending:views"
+
+
+def record_view(event_id):
+    try:
+        get_redis_connection("default").hincrby(VIEWS_KEY, event_id, 1)
+    except Exception as e:
+        logger.warning(f"Could not record view for event {event_id}: {e}")
+
+
+def pop_views():
+    """
+    Atomically take the view counts collected since the last run.
+    """
+    try:
+        redis_conn = get_redis_connection("default")
+        pipe = redis_conn.pipeline()
+        pipe.hgetall(VIEWS_KEY)
+        pipe.delete(VIEWS_KEY)
+        views, _ = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not read event views: {e}")
+        return {}
+    return {int(event_id): int(count) for event_id, count in views.items()}
+
+
+def decayed_sum(queryset, field, epoch):
+    seconds = Extract(field, "epoch") - Value(epoch.timestamp())
+    return (
+        queryset.values("event_id")
+        .annotate(score=Sum(Exp(seconds * Value(LAMBDA)), output_field=FloatField()))
+        .values_list("event_id", "score")
+    )
+
+
+def activity_scores(since, until, epoch):
+    """
+    Forward-decayed score contributed by likes, comments and bookings created
+    in ``(since, until]``, keyed by event id.
+    """
+    today = until.date()
+    sources = [
+        (Like.objects, "like"),
+        (Comment.objects, "comment"),
+        (Booking.objects, "booking"),
+    ]
+    scores = {}
+    for manager, kind in sources:
+        queryset = manager.filter(
+            created_at__gt=since,
+            created_at__lte=until,
+            event__is_published=True,
+            event__start_date__gte=today,
+        )
+        for event_id, score in decayed_sum(queryset, "created_at", epoch):
+            scores[event_id] = scores.get(event_id, 0.0) + WEIGHTS[kind] * score
+    return scores
+
+
+def add_scores(scores, replace=False):
+    items = list(scores.items())
+    for start in range(0, len(items), UPDATE_CHUNK):
+        chunk = items[start : start + UPDATE_CHUNK]
+        delta = Case(
+            *[When(pk=event_id, then=Value(score)) for event_id, score in chunk],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+        Event.objects.filter(pk__in=[event_id for event_id, _ in chunk]).update(
+            trending_score=delta if replace else F("trending_score") + delta
+        )
+
+
+def rebuild(now=None):
+    """
+    Recompute every upcoming event's score from scratch against a new epoch.
+    """
+    now = now or timezone.now()
+    epoch = now
+    until = now - SETTLE_LAG
+    scores = activity_scores(now - LOOKBACK, until, epoch)
+    Event.objects.exclude(trending_score=0).update(trending_score=0)
+    add_scores(scores, replace=True)
+    cache.set(EPOCH_KEY, epoch.timestamp(), None)
+    cache.set(LAST_RUN_KEY, until.timestamp(), None)
+    return len(scores)
+
+
+def update(now=None):
+    """
+    Fold activity since the last run into the stored scores, touching only
+    events that saw likes, comments, bookings or views in between.
+    """
+    now = now or timezone.now()
+    epoch_ts = cache.get(EPOCH_KEY)
+    last_run_ts = cache.get(LAST_RUN_KEY)
+    if epoch_ts is None or last_run_ts is None:
+        pop_views()
+        return rebuild(now)
+
+    epoch = datetime.fromtimestamp(epoch_ts, tz=dt_timezone.utc)
+    if now - epoch > EPOCH_MAX_AGE:
+        pop_views()
+        return rebuild(now)
+
+    last_run = datetime.fromtimestamp(last_run_ts, tz=dt_timezone.utc)
+    until = max(last_run, now - SETTLE_LAG)
+    scores = activity_scores(last_run, until, epoch)
+
+    views = pop_views()
+    if views:
+        upcoming = set(
+            Event.objects.filter(
+                pk__in=views.keys(),
+                is_published=True,
+                start_date__gte=now.date(),
+            ).values_list("pk", flat=True)
+        )
+        view_score = WEIGHTS["view"] * math.exp(LAMBDA * (now - epoch).total_seconds())
+        for event_id in upcoming:
+            scores[event_id] = scores.get(event_id, 0.0) + views[event_id] * view_score
+
+    add_scores(scores)
+    cache.set(LAST_RUN_KEY, until.timestamp(), None)
+    return len(scores)
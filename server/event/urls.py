@@ -3,14 +3,35 @@ from .views import *
 
 urlpatterns = [
     path("create-event/", EventCreateView.as_view(), name="event_create"),
+    path("bulk-import/", EventBulkImportView.as_view(), name="event-bulk-import"),
+    path(
+        "bulk-import/<str:job_id>/",
+        EventBulkImportStatusView.as_view(),
+        name="event-bulk-import-status",
+    ),
     path("get-event/<int:event_id>/", GetEvent.as_view(), name="get-event"),
     path("interact/<int:event_id>/", like_or_comment, name="like_or_comment"),
     path("preview-explore/", EventPreviewList.as_view(), name="event-preview-list"),
+    path(
+        "preview-explore/feed/", EventPreviewFeed.as_view(), name="event-preview-feed"
+    ),
     path(
         "preview-explore/<int:event_id>/",
         EventDetailViewExplore.as_view(),
         name="event-details-modal",
     ),
+    path(
+        "preview-explore/<int:event_id>/comments/",
+        EventCommentList.as_view(),
+        name="event-comments",
+    ),
+    path("recommended/", RecommendedEventList.as_view(), name="event-recommended"),
+    path("autocomplete/", EventAutocomplete.as_view(), name="event-autocomplete"),
+    path(
+        "<int:event_id>/waiting-room/",
+        EventWaitingRoom.as_view(),
+        name="event-waiting-room",
+    ),
     path("stream/create/", LiveStreamCreateView.as_view(), name="stream-create"),
     path(
         "stream/<int:event_id>/", LiveStreamDetailView.as_view(), name="stream-detail"
@@ -9,19 +9,33 @@ from .serializers import (
     EventCompleteDataSerializer,
     BookingSerializer,
 )
-from django.db.models import Count
-from .serializers import EventPreviewSerializer, EventSerializerExplore
+from .serializers import (
+    EventPreviewSerializer,
+    EventSerializerExplore,
+    CommentSerializer,
+)
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.decorators import api_view, permission_classes
 from django.shortcuts import get_object_or_404
 from chat.models import GroupConversation
 from django.utils import timezone
-from rest_framework import generics, filters
-from .filters import EventFilter
+from rest_framework import generics
+from .filters import EventFilter, day_start
+from .paginations import EventKeysetPagination, CommentKeysetPagination
+from . import cache as event_cache
+from . import trending
+from . import likes as like_buffer
+from . import bulk
+from . import recommendations
+from . import autocomplete
+from . import waiting_room
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import permission_classes
 from users.tasks import send_user_notification
 from users.models import Booking
+from services import outbox_service
+from django.db import transaction
+from redis.exceptions import RedisError
 import logging
 from Admin.models import SubscriptionPlan
 from datetime import timedelta
@@ -142,6 +156,9 @@ class EventCreateView(APIView):
                     group_chat.name = event.event_title
                     group_chat.save()
 
+                if event.is_published:
+                    event_cache.warm_event(event)
+
                 return Response(
                     {
                         "success": True,
@@ -166,6 +183,62 @@ class EventCreateView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+class EventBulkImportView(APIView):
+    """
+    Create a batch of events (``events`` JSON list or CSV ``file``) or clone
+    ``clone_event_id`` onto ``dates``. Large batches are queued and can be
+    followed through EventBulkImportStatusView.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            rows = bulk.rows_from_request(request)
+            cleaned = bulk.validate_rows(rows)
+            bulk.check_quota(request.user, len(rows))
+
+            if len(rows) > bulk.INLINE_LIMIT:
+                job_id = bulk.start_job(request.user, rows)
+                return Response(
+                    {
+                        "success": True,
+                        "message": f"Importing {len(rows)} events",
+                        "job_id": job_id,
+                    },
+                    status=status.HTTP_202_ACCEPTED,
+                )
+
+            events = bulk.create_events(request.user, cleaned)
+            return Response(
+                {
+                    "success": True,
+                    "message": f"Created {len(events)} events",
+                    "event_ids": [event.id for event in events],
+                },
+                status=status.HTTP_201_CREATED,
+            )
+        except bulk.BulkImportError as e:
+            return Response(
+                {"success": False, "message": str(e), "errors": e.errors},
+                status=e.status,
+            )
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class EventBulkImportStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = bulk.get_job(job_id, request.user)
+        if job is None:
+            return Response(
+                {"error": "Import job not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({"job_id": job_id, **job})
+
+
 class EventPreviewPagination(PageNumberPagination):
     page_size = 9
     page_size_query_param = "limit"
@@ -174,33 +247,176 @@ class EventPreviewPagination(PageNumberPagination):
 
 class EventPreviewList(generics.ListAPIView):
     serializer_class = EventPreviewSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend]
     filterset_class = EventFilter
-    search_fields = ["event_title", "description", "venue_name", "city"]
     pagination_class = EventPreviewPagination
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        now = timezone.now().date()
-        queryset = (
-            Event.objects.filter(is_published=True, start_date__gte=now)
-            .annotate(
-                like_count=Count("likes", distinct=True),
-                comment_count=Count("comments", distinct=True),
+        queryset = Event.objects.filter(
+            is_published=True, starts_at__gte=day_start(timezone.now().date())
+        ).order_by("-created_at")
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        parent = super()
+        data = event_cache.get_or_build(
+            event_cache.catalog_key(request.path, request.query_params),
+            lambda: parent.list(request, *args, **kwargs).data,
+            event_cache.CATALOG_TIMEOUT,
+            "catalog",
+        )
+        return Response(data)
+
+
+class EventPreviewFeed(EventPreviewList):
+    """
+    Infinite-scroll variant of EventPreviewList using keyset cursors instead of
+    page numbers, so deep pages cost the same as the first one.
+    """
+
+    pagination_class = EventKeysetPagination
+
+
+class RecommendedEventList(APIView):
+    """
+    Upcoming events picked for the user from the item-item neighbours of
+    the events they engaged with, or trending events when there are none.
+    """
+
+    permission_classes = [IsAuthenticated]
+    default_limit = 12
+    max_limit = 50
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = max(1, min(limit, self.max_limit))
+
+        events, personalized = recommendations.recommended_events(request.user, limit)
+        return Response(
+            {
+                "personalized": personalized,
+                "results": EventPreviewSerializer(events, many=True).data,
+            }
+        )
+
+
+class EventAutocomplete(APIView):
+    """
+    Titles, cities, venues and organizers of upcoming events matching the
+    typed prefix ``?q=``, served from the Redis prefix index.
+    """
+
+    permission_classes = [IsAuthenticated]
+    max_limit = 10
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit", autocomplete.DEFAULT_LIMIT))
+        except ValueError:
+            limit = autocomplete.DEFAULT_LIMIT
+        limit = max(1, min(limit, self.max_limit))
+        query = request.query_params.get("q", "")[:100]
+        return Response(autocomplete.suggest(query, limit))
+
+
+class EventWaitingRoom(APIView):
+    """
+    Queue for checkout of an event in queue mode: POST joins (or returns the
+    current place), GET reports position and ETA, DELETE leaves. Updates are
+    also pushed to the notification socket as ``waiting_room`` events.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get_event(self, event_id):
+        return get_object_or_404(
+            Event, id=event_id, is_published=True, queue_enabled=True
+        )
+
+    def unavailable(self, event_id, error):
+        logger.error(f"Waiting room unavailable for event {event_id}: {error}")
+        return Response(
+            {"error": "The waiting room is unavailable, please try again."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+    def post(self, request, event_id):
+        event = self.get_event(event_id)
+        try:
+            return Response(waiting_room.join(event, request.user.id))
+        except RedisError as e:
+            return self.unavailable(event_id, e)
+
+    def get(self, request, event_id):
+        event = self.get_event(event_id)
+        try:
+            state = waiting_room.status(event, request.user.id)
+        except RedisError as e:
+            return self.unavailable(event_id, e)
+        if state is None:
+            return Response(
+                {"error": "You are not in the waiting room."},
+                status=status.HTTP_404_NOT_FOUND,
             )
-            .order_by("-created_at")
+        return Response(state)
+
+    def delete(self, request, event_id):
+        try:
+            waiting_room.leave(event_id, request.user.id)
+        except RedisError as e:
+            return self.unavailable(event_id, e)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class EventCommentList(generics.ListAPIView):
+    """
+    Comment pages following the first one embedded in the event detail
+    response; pass its ``comments_cursor`` as ``?cursor=``.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = CommentSerializer
+    pagination_class = CommentKeysetPagination
+
+    def get_queryset(self):
+        return Comment.objects.filter(event_id=self.kwargs["event_id"]).select_related(
+            "user"
         )
-        return queryset
 
 
 class EventDetailViewExplore(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, event_id):
+        viewer = {}
+
+        def build():
+            event = EventSerializerExplore.setup_eager_loading(
+                Event.objects.all(), request.user
+            ).get(id=event_id)
+            viewer["liked"] = event.liked
+            return dict(EventSerializerExplore(event).data)
+
         try:
-            event = Event.objects.get(id=event_id)
-            serializer = EventSerializerExplore(event, context={"request": request})
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            data = event_cache.get_or_build(
+                event_cache.detail_key(event_id),
+                build,
+                event_cache.DETAIL_TIMEOUT,
+                "detail",
+            )
+            trending.record_view(event_id)
+            buffered = like_buffer.viewer_state(event_id, request.user.id)
+            if buffered is not None:
+                viewer["liked"], viewer["like_count"] = buffered
+            elif "liked" not in viewer:
+                viewer["liked"] = Like.objects.filter(
+                    event_id=event_id, user=request.user
+                ).exists()
+            return Response({**data, **viewer}, status=status.HTTP_200_OK)
         except Event.DoesNotExist:
             return Response(
                 {"error": "Event not found"}, status=status.HTTP_404_NOT_FOUND
@@ -225,21 +441,47 @@ def like_or_comment(request, event_id):
 
 
 def handle_like(request, event):
+    try:
+        liked, like_count = like_buffer.toggle(event.id, request.user.id)
+    except RedisError as e:
+        logger.warning(f"Like buffer unavailable, writing through: {e}")
+        return handle_like_direct(request, event)
+
+    if liked:
+        return Response(
+            {"message": "Event liked", "like_count": like_count},
+            status=status.HTTP_201_CREATED,
+        )
+    return Response(
+        {"message": "Event unliked", "like_count": like_count},
+        status=status.HTTP_200_OK,
+    )
+
+
+def handle_like_direct(request, event):
     user = request.user
-    like, created = Like.objects.get_or_create(user=user, event=event)
+    with transaction.atomic():
+        like, created = Like.objects.get_or_create(user=user, event=event)
+        if created:
+            event.adjust_counters(like_count=1)
+            outbox_service.enqueue(
+                send_user_notification,
+                event.organizer_id,
+                f"{user.username} liked your {event.event_title}",
+            )
 
     if created:
-        send_user_notification.delay(
-            event.organizer.id, f"{user.username} liked your {event.event_title}"
-        )
+        event.refresh_from_db(fields=["like_count"])
         return Response(
-            {"message": "Event liked", "like_count": event.like_count()},
+            {"message": "Event liked", "like_count": event.like_count},
             status=status.HTTP_201_CREATED,
         )
     else:
         like.delete()
+        event.adjust_counters(like_count=-1)
+        event.refresh_from_db(fields=["like_count"])
         return Response(
-            {"message": "Event unliked", "like_count": event.like_count()},
+            {"message": "Event unliked", "like_count": event.like_count},
             status=status.HTTP_200_OK,
         )
 
@@ -253,10 +495,14 @@ def handle_comment(request, event):
             {"error": "Comment text is required"}, status=status.HTTP_400_BAD_REQUEST
         )
 
-    comment = Comment.objects.create(user=user, event=event, text=text)
-    send_user_notification.delay(
-        event.organizer.id, f"{user.username} commented on your {event.event_title}"
-    )
+    with transaction.atomic():
+        comment = Comment.objects.create(user=user, event=event, text=text)
+        event.adjust_counters(comment_count=1)
+        outbox_service.enqueue(
+            send_user_notification,
+            event.organizer_id,
+            f"{user.username} commented on your {event.event_title}",
+        )
 
     response_data = {
         "message": "Comment added",
@@ -366,9 +612,15 @@ class GetEvent(APIView):
 
     def get(self, reqeust, event_id):
         try:
-            event = Event.objects.get(id=event_id)
-            seriazlier = EventCompleteDataSerializer(event)
-            return Response(seriazlier.data)
+            data = event_cache.get_or_build(
+                event_cache.complete_key(event_id),
+                lambda: dict(
+                    EventCompleteDataSerializer(Event.objects.get(id=event_id)).data
+                ),
+                event_cache.DETAIL_TIMEOUT,
+                "complete",
+            )
+            return Response(data)
         except Event.DoesNotExist:
             return Response(
                 {"error": "Event does not exist"}, status=status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,266 @@
+"""
+Virtual waiting room for events in queue mode.
+
+Instead of every buyer racing to checkout when a popular event opens, buyers
+join a per-event FIFO in Redis (a sorted set scored by arrival number) and
+are let through at ``Event.queue_admit_rate`` per second by a token bucket.
+The admit_waiting_buyers task ticks every second: it refills each event's
+bucket, pops as many buyers as there are whole tokens and gives each a
+time-limited pass, all in one Lua script so concurrent ticks cannot admit
+anyone twice. Buyers holding a pass may place holds and check out; everyone
+else gets their position back.
+
+Admissions are pushed to the buyer's notification room right away; queue
+positions and ETAs are pushed every POSITION_PUSH_INTERVAL seconds. Both
+go over the existing notification socket as ``waiting_room`` events and are
+not stored as Notification rows.
+"""
+
+import json
+import logging
+import time
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_KEY = "waiting_room:active"
+RATES_KEY = "waiting_room:rates"
+NOTIFICATION_CHANNEL = "socketio_notifications"
+# How long an admitted buyer has to start checkout.
+ADMISSION_TTL = 10 * 60
+# Bucket capacity in seconds of admissions, so a missed tick is made up.
+BURST_SECONDS = 2
+POSITION_PUSH_INTERVAL = 5
+# Idle rooms are dropped from Redis after a day.
+ROOM_TTL = 60 * 60 * 24
+
+# KEYS: queue, counter, active set, rates, bucket
+# ARGV: user id, event id, rate, room ttl, now
+JOIN_SCRIPT = """
+local number = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not number then
+    number = redis.call('INCR', KEYS[2])
+    redis.call('ZADD', KEYS[1], number, ARGV[1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+redis.call('SADD', KEYS[3], ARGV[2])
+redis.call('HSET', KEYS[4], ARGV[2], ARGV[3])
+-- Start filling the bucket from the first arrival, not the first tick.
+redis.call('HSETNX', KEYS[5], 'ts', ARGV[5])
+redis.call('EXPIRE', KEYS[5], ARGV[4])
+return redis.call('ZRANK', KEYS[1], ARGV[1])
+"""
+
+# KEYS: queue, admitted, bucket, active set
+# ARGV: rate, burst, now, admission ttl, event id, room ttl
+ADMIT_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+local tokens = tonumber(redis.call('HGET', KEYS[3], 'tokens') or 0)
+local last = tonumber(redis.call('HGET', KEYS[3], 'ts') or now)
+tokens = math.min(burst, tokens + (now - last) * rate)
+local count = math.min(math.floor(tokens), redis.call('ZCARD', KEYS[1]))
+local admitted = {}
+if count > 0 then
+    local popped = redis.call('ZPOPMIN', KEYS[1], count)
+    for i = 1, #popped, 2 do
+        admitted[#admitted + 1] = popped[i]
+        redis.call('ZADD', KEYS[2], now + tonumber(ARGV[4]), popped[i])
+    end
+    tokens = tokens - count
+end
+redis.call('HSET', KEYS[3], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[2], ARGV[6])
+redis.call('EXPIRE', KEYS[3], ARGV[6])
+if redis.call('ZCARD', KEYS[1]) == 0 then
+    redis.call('SREM', KEYS[4], ARGV[5])
+end
+return admitted
+"""
+
+
+def queue_key(event_id):
+    return f"waiting_room:{event_id}:queue"
+
+
+def counter_key(event_id):
+    return f"waiting_room:{event_id}:counter"
+
+
+def admitted_key(event_id):
+    return f"waiting_room:{event_id}:admitted"
+
+
+def bucket_key(event_id):
+    return f"waiting_room:{event_id}:bucket"
+
+
+def eta_seconds(position, rate):
+    return int(position / max(1, rate)) + 1
+
+
+def join(event, user_id):
+    """
+    Put the buyer in the event's queue, keeping their place if they are
+    already in it, and return their status.
+    """
+    redis_conn = get_redis_connection("default")
+    if is_admitted(event.id, user_id, redis_conn):
+        return {"admitted": True, "position": 0, "eta_seconds": 0}
+    rank = redis_conn.eval(
+        JOIN_SCRIPT,
+        5,
+        queue_key(event.id),
+        counter_key(event.id),
+        ACTIVE_KEY,
+        RATES_KEY,
+        bucket_key(event.id),
+        user_id,
+        event.id,
+        event.queue_admit_rate,
+        ROOM_TTL,
+        time.time(),
+    )
+    position = int(rank) + 1
+    return {
+        "admitted": False,
+        "position": position,
+        "eta_seconds": eta_seconds(position, event.queue_admit_rate),
+    }
+
+
+def status(event, user_id):
+    """
+    The buyer's place in the queue, or None if they have not joined.
+    """
+    redis_conn = get_redis_connection("default")
+    if is_admitted(event.id, user_id, redis_conn):
+        return {"admitted": True, "position": 0, "eta_seconds": 0}
+    rank = redis_conn.zrank(queue_key(event.id), user_id)
+    if rank is None:
+        return None
+    position = rank + 1
+    return {
+        "admitted": False,
+        "position": position,
+        "eta_seconds": eta_seconds(position, event.queue_admit_rate),
+    }
+
+
+def leave(event_id, user_id):
+    redis_conn = get_redis_connection("default")
+    pipe = redis_conn.pipeline()
+    pipe.zrem(queue_key(event_id), user_id)
+    pipe.zrem(admitted_key(event_id), user_id)
+    pipe.execute()
+
+
+def sync_rate(event):
+    """
+    Store the event's admit rate for the tick, so a rate changed mid-sale
+    applies from the next tick rather than the next arrival.
+    """
+    redis_conn = get_redis_connection("default")
+    if event.queue_enabled:
+        redis_conn.hset(RATES_KEY, event.id, event.queue_admit_rate)
+    else:
+        redis_conn.hdel(RATES_KEY, event.id)
+
+
+def is_admitted(event_id, user_id, redis_conn=None):
+    redis_conn = redis_conn or get_redis_connection("default")
+    expires = redis_conn.zscore(admitted_key(event_id), user_id)
+    return expires is not None and expires > time.time()
+
+
+def admit(event_id, rate, redis_conn=None, now=None):
+    """
+    Let the next buyers of one event through and return their user ids.
+    """
+    redis_conn = redis_conn or get_redis_connection("default")
+    now = now or time.time()
+    rate = max(1, rate)
+    admitted = redis_conn.eval(
+        ADMIT_SCRIPT,
+        4,
+        queue_key(event_id),
+        admitted_key(event_id),
+        bucket_key(event_id),
+        ACTIVE_KEY,
+        rate,
+        rate * BURST_SECONDS,
+        now,
+        ADMISSION_TTL,
+        event_id,
+        ROOM_TTL,
+    )
+    return [int(user_id) for user_id in admitted]
+
+
+def publish(pipe, user_id, data):
+    pipe.publish(
+        NOTIFICATION_CHANNEL,
+        json.dumps(
+            {"room": f"notifications_{user_id}", "event": "waiting_room", "data": data}
+        ),
+    )
+
+
+def push_positions(redis_conn, event_id, rate):
+    waiting = redis_conn.zrange(queue_key(event_id), 0, -1)
+    pipe = redis_conn.pipeline(transaction=False)
+    for rank, user_id in enumerate(waiting):
+        position = rank + 1
+        publish(
+            pipe,
+            int(user_id),
+            {
+                "event_id": event_id,
+                "admitted": False,
+                "position": position,
+                "eta_seconds": eta_seconds(position, rate),
+            },
+        )
+    pipe.execute()
+
+
+def tick(now=None):
+    """
+    Admit buyers for every event with a queue, notify them and, every
+    POSITION_PUSH_INTERVAL seconds, push everyone's new position. Returns
+    the number of buyers admitted. Rooms leave the active set once their
+    queue is empty and come back with the next arrival.
+    """
+    redis_conn = get_redis_connection("default")
+    now = now or time.time()
+    push_positions_now = int(now) % POSITION_PUSH_INTERVAL == 0
+    total = 0
+    for raw_id in redis_conn.smembers(ACTIVE_KEY):
+        event_id = int(raw_id)
+        rate = int(redis_conn.hget(RATES_KEY, event_id) or 1)
+        try:
+            admitted = admit(event_id, rate, redis_conn, now)
+        except Exception as e:
+            logger.error(f"Could not admit buyers for event {event_id}: {e}")
+            continue
+        total += len(admitted)
+
+        pipe = redis_conn.pipeline(transaction=False)
+        for user_id in admitted:
+            publish(
+                pipe,
+                user_id,
+                {
+                    "event_id": event_id,
+                    "admitted": True,
+                    "expires_in": ADMISSION_TTL,
+                },
+            )
+        pipe.execute()
+
+        if push_positions_now:
+            push_positions(redis_conn, event_id, rate)
+    return total
@@ -5,6 +5,7 @@ from urllib.parse import urlparse
 
 from dotenv import load_dotenv
 from celery.schedules import crontab
+from corsheaders.defaults import default_headers
 import dj_database_url
 import cloudinary
 
@@ -80,6 +81,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "corsheaders",
     "rest_framework_simplejwt",
@@ -150,6 +152,19 @@ else:
 
 REDIS_URL = redis_url_env()
 
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": REDIS_URL,
+        "KEY_PREFIX": "evenxo",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            # Serve from the database rather than fail when Redis is down.
+            "IGNORE_EXCEPTIONS": True,
+        },
+    }
+}
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
@@ -174,6 +189,38 @@ CELERY_BEAT_SCHEDULE = {
         "task": "users.tasks.distribute_event_revenue",
         "schedule": crontab(hour=0, minute=0),
     },
+    "update-trending-scores-every-5-minutes": {
+        "task": "event.tasks.update_trending_scores",
+        "schedule": crontab(minute="*/5"),
+    },
+    "flush-like-buffer-every-minute": {
+        "task": "event.tasks.flush_like_buffer",
+        "schedule": crontab(minute="*"),
+    },
+    "send-like-digests-every-5-minutes": {
+        "task": "event.tasks.send_like_digests",
+        "schedule": crontab(minute="*/5"),
+    },
+    "update-event-recommendations-hourly": {
+        "task": "event.tasks.update_event_recommendations",
+        "schedule": crontab(minute=30),
+    },
+    "rebuild-autocomplete-index-every-15-minutes": {
+        "task": "event.tasks.rebuild_autocomplete_index",
+        "schedule": crontab(minute="*/15"),
+    },
+    "release-expired-ticket-holds-every-minute": {
+        "task": "event.tasks.release_expired_ticket_holds",
+        "schedule": crontab(minute="*"),
+    },
+    "admit-waiting-buyers-every-second": {
+        "task": "event.tasks.admit_waiting_buyers",
+        "schedule": 1.0,
+    },
+    "purge-idempotency-keys-hourly": {
+        "task": "users.tasks.purge_idempotency_keys",
+        "schedule": crontab(minute=45),
+    },
 }
 
 
@@ -248,6 +295,15 @@ MEDIA_URL = "/media/"
 
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Event images are staged here until event.tasks.process_event_media runs;
+# it must be shared between the web and Celery worker containers.
+EVENT_MEDIA_STAGING_ROOT = MEDIA_ROOT / "staging"
+
+# Backend that stores processed event images (see event.media).
+EVENT_MEDIA_STORAGE = os.getenv(
+    "EVENT_MEDIA_STORAGE", "event.media.CloudinaryMediaStorage"
+)
+
 DEFAULT_FILE_STORAGE = (
     "cloudinary_storage.storage.MediaCloudinaryStorage"
 )
@@ -280,6 +336,8 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+# Sent by clients that retry payments (see users.utils.idempotency_utils)
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
 SESSION_COOKIE_SECURE = True
 CSRF_COOKIE_SECURE = True
 CSRF_COOKIE_SAMESITE = "None"
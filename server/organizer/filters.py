@@ -1,5 +1,6 @@
 import django_filters
 from event.models import Event
+from event.filters import next_month, starts_between
 from django.utils.timezone import now
 from datetime import timedelta
 from django.db.models import Q
@@ -32,15 +33,13 @@ class OrganizerEventsFilter(django_filters.FilterSet):
         if value == "All":
             return queryset
         elif value == "today":
-            return queryset.filter(start_date=today)
+            return starts_between(queryset, today, today + timedelta(days=1))
         elif value == "Week":
             start_week = today - timedelta(days=today.weekday())
-            end_week = start_week + timedelta(days=6)
-            return queryset.filter(start_date__range=[start_week, end_week])
+            return starts_between(queryset, start_week, start_week + timedelta(days=7))
         elif value == "Month":
-            return queryset.filter(
-                start_date__year=today.year, start_date__month=today.month
-            )
+            start_month = today.replace(day=1)
+            return starts_between(queryset, start_month, next_month(start_month))
         return queryset
 
     def filter_organized(self, queryset, name, value):
@@ -98,13 +97,11 @@ class ParticipantedEventsFilter(django_filters.FilterSet):
         if value.lower() == "all":
             return queryset
         elif value.lower() == "today":
-            return queryset.filter(start_date=today)
+            return starts_between(queryset, today, today + timedelta(days=1))
         elif value.lower() == "week":
             start_week = today - timedelta(days=today.weekday())
-            end_week = start_week + timedelta(days=6)
-            return queryset.filter(start_date__range=[start_week, end_week])
+            return starts_between(queryset, start_week, start_week + timedelta(days=7))
         elif value.lower() == "month":
-            return queryset.filter(
-                start_date__year=today.year, start_date__month=today.month
-            )
+            start_month = today.replace(day=1)
+            return starts_between(queryset, start_month, next_month(start_month))
         return queryset
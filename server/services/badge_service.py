@@ -1,36 +1,192 @@
-from users.models import Booking
-from Admin.models import Badge, UserBadge
-from event.models import Ticket, Event
-import datetime
+"""
+Incremental badge engine.
 
+Every badge criteria has a per-user counter in BadgeProgress. Checkout (when
+a booking is paid for), and the Event and Review signals, call
+record_progress, which moves one counter with a single UPDATE. Only when
+the move crosses a badge target (targets are cached per criteria) does it
+queue award_badges through the outbox, which inserts the earned UserBadge
+rows in one statement after the write has committed. backfill_badges
+rebuilds the counters from the source tables and awards everything already
+earned, e.g. after a badge is added with a target users have passed.
+"""
 
-def check_and_assign_badges(profile):
-    role = "Organizer" if profile.organizerVerified else "User"
-    badges = Badge.objects.filter(applicable_role=role)
+from django.core.cache import cache
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from users.models import Booking, Profile
+from Admin.models import Badge, BadgeProgress, UserBadge
+from event.models import Event, Review
 
-    for badge in badges:
-        if UserBadge.objects.filter(user=profile, badge=badge).exists():
-            continue
+CRITERIA = ("event_attended", "event_created", "feedback_given")
+TARGETS_CACHE_TIMEOUT = 60 * 60
+# Badge.applicable_role stores the organizer role with this spelling.
+ORGANIZER_ROLES = ("Orgnanzer", "Organizer")
 
-        if badge.criteria_type == "event_attended":
-            attended_count = Booking.objects.filter(user=profile).distinct().count()
-            if attended_count >= badge.target_count:
-                assign_badge(profile, badge)
 
-        elif badge.criteria_type == "event_created":
-            created_count = Event.objects.filter(organizer=profile).count()
-            if created_count >= badge.target_count:
-                assign_badge(profile, badge)
+def targets_cache_key(criteria):
+    return f"badges:targets:{criteria}"
 
-        elif badge.criteria_type == "feedback_given":
-            feedback_count = 0
-            if feedback_count >= badge.target_count:
-                assign_badge(profile, badge)
 
+def invalidate_targets():
+    cache.delete_many([targets_cache_key(criteria) for criteria in CRITERIA])
 
-def assign_badge(profile, badge):
-    user_badge, created = UserBadge.objects.get_or_create(
-        user=profile, badge=badge, defaults={"date_earned": datetime.datetime.now()}
+
+def badge_targets(criteria):
+    """
+    The distinct target counts of the active badges for ``criteria``.
+    """
+    key = targets_cache_key(criteria)
+    targets = cache.get(key)
+    if targets is None:
+        targets = sorted(
+            set(
+                Badge.objects.filter(
+                    criteria_type=criteria, is_active=True
+                ).values_list("target_count", flat=True)
+            )
+        )
+        cache.set(key, targets, TARGETS_CACHE_TIMEOUT)
+    return targets
+
+
+def applicable_roles(profile):
+    return ORGANIZER_ROLES if profile.organizerVerified else ("User",)
+
+
+def source_counts(user_ids):
+    """
+    ``{user_id: {criteria: count}}`` recounted from the source tables.
+    """
+    counts = {user_id: dict.fromkeys(CRITERIA, 0) for user_id in user_ids}
+    sources = (
+        # Bookings only count once checkout has settled them.
+        (
+            "event_attended",
+            Booking.objects.filter(ticket_purchases__isnull=False),
+            "user_id",
+        ),
+        ("event_created", Event.objects, "organizer_id"),
+        ("feedback_given", Review.objects, "user_id"),
+    )
+    for criteria, queryset, field in sources:
+        rows = (
+            queryset.filter(**{f"{field}__in": user_ids})
+            .values(field)
+            .annotate(total=Count("pk", distinct=True))
+            .values_list(field, "total")
+        )
+        for user_id, total in rows:
+            counts[user_id][criteria] = total
+    return counts
+
+
+def record_progress(user_id, criteria, delta=1):
+    """
+    Move one of the user's badge counters by ``delta`` and, if that crosses
+    a badge target, queue award_badges. Runs inside the caller's
+    transaction, so the award is queued only if the change commits.
+    """
+    from services import outbox_service
+    from users.tasks import award_badges
+
+    updated = BadgeProgress.objects.filter(user_id=user_id).update(
+        **{criteria: Greatest(F(criteria) + delta, Value(0))}
+    )
+    if not updated:
+        if delta < 0:
+            # Nothing to take back, and the user may be mid-deletion.
+            return
+        # First change for this user: start from the real counts, which
+        # already include the row that triggered this call.
+        counts = source_counts([user_id])[user_id]
+        progress, created = BadgeProgress.objects.get_or_create(
+            user_id=user_id, defaults=counts
+        )
+        if not created:
+            return record_progress(user_id, criteria, delta)
+        new = counts[criteria]
+        old = max(0, new - delta)
+    elif delta > 0:
+        new = BadgeProgress.objects.values_list(criteria, flat=True).get(
+            user_id=user_id
+        )
+        old = max(0, new - delta)
+    else:
+        return
+
+    if any(old < target <= new for target in badge_targets(criteria)):
+        outbox_service.enqueue(award_badges, user_id, criteria, old, new)
+
+
+def award_badges(profile, criteria, old, new):
+    """
+    Give ``profile`` the active badges for ``criteria`` whose target lies in
+    ``(old, new]`` and return how many were new. Badges the user already
+    has are skipped, so the same award can safely run twice.
+    """
+    badges = (
+        Badge.objects.filter(
+            criteria_type=criteria,
+            is_active=True,
+            applicable_role__in=applicable_roles(profile),
+            target_count__gt=old,
+            target_count__lte=new,
+        )
+        .exclude(userbadge__user=profile)
+        .only("id")
     )
-    if created:
-        print("badge created")
+    now = timezone.now()
+    user_badges = [
+        UserBadge(user=profile, badge=badge, date_earned=now) for badge in badges
+    ]
+    UserBadge.objects.bulk_create(user_badges, ignore_conflicts=True)
+    return len(user_badges)
+
+
+def backfill_badges(chunk_size=1000, progress=None):
+    """
+    Recount every user's badge progress and award all badges already earned,
+    ``chunk_size`` users at a time. Returns ``(users, badges_awarded)``.
+    """
+    badges = list(Badge.objects.filter(is_active=True))
+    user_count = awarded = 0
+    last_id = 0
+    while True:
+        users = list(
+            Profile.objects.filter(pk__gt=last_id)
+            .order_by("pk")
+            .values_list("pk", "organizerVerified")[:chunk_size]
+        )
+        if not users:
+            break
+        last_id = users[-1][0]
+
+        counts = source_counts([user_id for user_id, _ in users])
+        BadgeProgress.objects.bulk_create(
+            [BadgeProgress(user_id=user_id, **counts[user_id]) for user_id, _ in users],
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=list(CRITERIA),
+        )
+        earned = set(
+            UserBadge.objects.filter(user_id__in=counts).values_list(
+                "user_id", "badge_id"
+            )
+        )
+        now = timezone.now()
+        user_badges = [
+            UserBadge(user_id=user_id, badge=badge, date_earned=now)
+            for user_id, organizer in users
+            for badge in badges
+            if badge.applicable_role in (ORGANIZER_ROLES if organizer else ("User",))
+            and counts[user_id][badge.criteria_type] >= badge.target_count
+            and (user_id, badge.id) not in earned
+        ]
+        UserBadge.objects.bulk_create(user_badges, ignore_conflicts=True)
+        awarded += len(user_badges)
+        user_count += len(users)
+        if progress:
+            progress(user_count)
+    return user_count, awarded
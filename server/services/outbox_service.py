@@ -0,0 +1,243 @@
+"""
+Transactional outbox.
+
+Views that change data and then trigger a Celery task or a socket push
+record that side effect as an OutboxMessage in the same transaction, so it
+is sent exactly when the change commits: never for a rolled-back request,
+and never lost because the broker was briefly unreachable. The relay
+(``manage.py run_outbox_relay``) drains undelivered messages in id order,
+sends them and marks them dispatched.
+
+Delivery is at least once. A relay that dies between sending and marking a
+batch sends it again, so tasks are published with the task id
+``outbox-<pk>`` and consumers skip ids they have already handled (see
+already_delivered / mark_delivered). Producers can also pass a
+``dedup_key`` to drop a second copy of the same effect at write time.
+"""
+
+import json
+import logging
+import time
+from datetime import timedelta
+from celery import current_app
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Min, Q
+from django.core.cache import cache
+from django.utils import timezone
+from django_redis import get_redis_connection
+from users.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+TASK_ID_PREFIX = "outbox-"
+METRICS_KEY = "outbox:metrics"
+NOTIFICATION_CHANNEL = "socketio_notifications"
+BATCH_SIZE = 100
+# Dispatched rows are kept this long for inspection, then purged.
+RETENTION = timedelta(days=1)
+# How long consumers remember a delivered task id; far beyond any redelivery.
+DELIVERED_TTL = 60 * 60 * 24
+
+
+def enqueue(task, *args, dedup_key=None, **kwargs):
+    """
+    Run the Celery ``task`` with these arguments once the current
+    transaction commits. Arguments must be JSON serializable.
+    """
+    return record("task", task.name, {"args": list(args), "kwargs": kwargs}, dedup_key)
+
+
+def publish(channel, message, dedup_key=None):
+    """
+    Publish ``message`` to a Redis pub/sub channel once the current
+    transaction commits.
+    """
+    return record("publish", channel, message, dedup_key)
+
+
+def publish_to_user(user_id, event, data):
+    """
+    Push a socket event to the user's notification room after commit.
+    """
+    return publish(
+        NOTIFICATION_CHANNEL,
+        {"room": f"notifications_{user_id}", "event": event, "data": data},
+    )
+
+
+def record(kind, topic, payload, dedup_key):
+    message = OutboxMessage(
+        kind=kind, topic=topic, payload=payload, dedup_key=dedup_key
+    )
+    if dedup_key is None:
+        message.save()
+    else:
+        OutboxMessage.objects.bulk_create([message], ignore_conflicts=True)
+    return message
+
+
+def task_id(message):
+    return f"{TASK_ID_PREFIX}{message.pk}"
+
+
+def delivered_key(task_id):
+    return f"outbox:delivered:{task_id}"
+
+
+def already_delivered(task_id):
+    """
+    Whether a task with this id already ran to completion. Only outbox task
+    ids are tracked; anything else is treated as new.
+    """
+    if not task_id or not task_id.startswith(TASK_ID_PREFIX):
+        return False
+    return cache.get(delivered_key(task_id)) is not None
+
+
+def mark_delivered(task_id):
+    if task_id and task_id.startswith(TASK_ID_PREFIX):
+        cache.set(delivered_key(task_id), True, DELIVERED_TTL)
+
+
+def send(message, pipe):
+    if message.kind == "task":
+        current_app.send_task(
+            message.topic,
+            args=message.payload.get("args", []),
+            kwargs=message.payload.get("kwargs", {}),
+            task_id=task_id(message),
+        )
+    else:
+        pipe.publish(message.topic, json.dumps(message.payload))
+
+
+def drain(batch_size=BATCH_SIZE):
+    """
+    Send one batch of undelivered messages in order and return how many
+    were sent. Rows are locked with SKIP LOCKED, so several relays can run
+    side by side without sending the same row twice. A message that fails
+    stops the batch, keeping later messages behind it, and is retried on
+    the next drain.
+    """
+    redis_conn = get_redis_connection("default")
+    with transaction.atomic():
+        batch = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(dispatched_at__isnull=True)
+            .order_by("id")[:batch_size]
+        )
+        if not batch:
+            return 0
+
+        pipe = redis_conn.pipeline(transaction=False)
+        sent = []
+        failed = error = None
+        for message in batch:
+            try:
+                send(message, pipe)
+            except Exception as e:
+                failed, error = message, e
+                logger.error(f"Could not dispatch outbox message {message.pk}: {e}")
+                break
+            sent.append(message)
+        try:
+            pipe.execute()
+        except Exception as e:
+            # Tasks already handed to the broker stay sent; the publishes did
+            # not go out, so keep only the messages before the first of them.
+            logger.error(f"Could not publish outbox messages: {e}")
+            first_publish = next(
+                (i for i, message in enumerate(sent) if message.kind == "publish"),
+                len(sent),
+            )
+            if first_publish < len(sent):
+                failed, error = sent[first_publish], e
+                sent = sent[:first_publish]
+
+        now = timezone.now()
+        if sent:
+            OutboxMessage.objects.filter(pk__in=[m.pk for m in sent]).update(
+                dispatched_at=now
+            )
+        if failed is not None:
+            OutboxMessage.objects.filter(pk=failed.pk).update(
+                attempts=failed.attempts + 1, last_error=str(error)[:1000]
+            )
+
+    if sent:
+        record_lag(redis_conn, sent, now)
+    return len(sent)
+
+
+def record_lag(redis_conn, sent, now):
+    lags = [(now - message.created_at).total_seconds() * 1000 for message in sent]
+    last_lag = int(lags[-1])
+    pipe = redis_conn.pipeline(transaction=False)
+    pipe.hincrby(METRICS_KEY, "dispatched", len(sent))
+    pipe.hset(METRICS_KEY, "last_lag_ms", last_lag)
+    pipe.hset(METRICS_KEY, "last_dispatch_at", now.isoformat())
+    pipe.execute()
+    # Read-modify-write is fine for a high-water mark only the relays update.
+    max_lag = int(max(lags))
+    if max_lag > int(redis_conn.hget(METRICS_KEY, "max_lag_ms") or 0):
+        redis_conn.hset(METRICS_KEY, "max_lag_ms", max_lag)
+
+
+def stats():
+    """
+    The backlog (pending count, age of the oldest pending message) from
+    the database and the relay's counters from Redis.
+    """
+    pending = OutboxMessage.objects.filter(dispatched_at__isnull=True).aggregate(
+        count=Count("id"),
+        failing=Count("id", filter=Q(attempts__gt=0)),
+        oldest=Min("created_at"),
+    )
+    metrics = {
+        key.decode(): value.decode()
+        for key, value in get_redis_connection("default").hgetall(METRICS_KEY).items()
+    }
+    oldest = pending["oldest"]
+    return {
+        "pending": pending["count"],
+        "failing": pending["failing"],
+        "oldest_pending_seconds": (
+            (timezone.now() - oldest).total_seconds() if oldest else 0
+        ),
+        "dispatched": int(metrics.get("dispatched", 0)),
+        "last_lag_ms": int(metrics.get("last_lag_ms", 0)),
+        "max_lag_ms": int(metrics.get("max_lag_ms", 0)),
+        "last_dispatch_at": metrics.get("last_dispatch_at"),
+    }
+
+
+def reset_metrics():
+    get_redis_connection("default").delete(METRICS_KEY)
+
+
+def purge_dispatched(now=None):
+    now = now or timezone.now()
+    deleted, _ = OutboxMessage.objects.filter(
+        dispatched_at__lte=now - RETENTION
+    ).delete()
+    return deleted
+
+
+def run_relay(batch_size=BATCH_SIZE, interval=0.5, once=False, purge_every=3600):
+    """
+    Drain until the outbox is empty, then poll every ``interval`` seconds.
+    """
+    last_purge = 0.0
+    while True:
+        close_old_connections()
+        try:
+            while drain(batch_size) == batch_size:
+                pass
+            if time.monotonic() - last_purge > purge_every:
+                purge_dispatched()
+                last_purge = time.monotonic()
+        except Exception as e:
+            logger.error(f"Outbox relay error: {e}")
+        if once:
+            return
+        time.sleep(interval)
@@ -1,5 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 import uuid
 
 
@@ -7,12 +9,22 @@ class Profile(AbstractUser):
     email = models.EmailField(unique=True, db_index=True)
     bio = models.TextField(blank=True)
     profile_picture = models.URLField(max_length=500, blank=True, null=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True)
     title = models.CharField(max_length=100, blank=True)
     phone = models.CharField(max_length=20, blank=True)
     location = models.CharField(max_length=100, blank=True)
     organizerVerified = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            GinIndex(
+                fields=["username"],
+                opclasses=["gin_trgm_ops"],
+                name="profile_username_trgm",
+            ),
+        ]
+
     def __str__(self):
         return self.username
 
@@ -173,3 +185,72 @@ class TicketRefund(models.Model):
 
     def __str__(self):
         return f"Refund of {self.quantity} {self.ticket_type} tickets - ₹{self.amount}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The response to the first request sent with a client's Idempotency-Key
+    (see users.utils.idempotency_utils). ``status_code`` is null while that
+    request is still running.
+    """
+
+    user = models.ForeignKey(
+        Profile, on_delete=models.CASCADE, related_name="idempotency_keys"
+    )
+    scope = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "scope", "key"], name="idempotency_key_once"
+            ),
+        ]
+        indexes = [
+            # The purge task's scan for expired keys
+            models.Index(fields=["created_at"], name="idempotency_key_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.scope} - {self.key}"
+
+
+class OutboxMessage(models.Model):
+    """
+    A side effect written in the same transaction as the change behind it
+    and delivered after commit by the outbox relay (see
+    services.outbox_service). ``topic`` is a Celery task name or a Redis
+    pub/sub channel, depending on ``kind``.
+    """
+
+    KIND_CHOICES = [
+        ("task", "Celery task"),
+        ("publish", "Redis publish"),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    topic = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    # Producers that may record the same effect twice pass a key to drop repeats
+    dedup_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The relay's scan for undelivered messages
+            models.Index(
+                fields=["id"],
+                name="outbox_pending_idx",
+                condition=models.Q(dispatched_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.topic} #{self.pk}"
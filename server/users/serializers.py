@@ -11,6 +11,7 @@ from Admin.models import (
     SubscriptionTransaction,
 )
 from event.models import Ticket, TicketPurchase, Event, Comment
+from event.serializers import ImageVariantsField
 
 redis_client = redis.Redis(
     host=config("REDIS_HOST", "localhost"),
@@ -145,6 +146,8 @@ class CommentSerializer(serializers.ModelSerializer):
 
 
 class TicketSerializer(serializers.ModelSerializer):
+    available_quantity = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Ticket
         fields = [
@@ -154,6 +157,8 @@ class TicketSerializer(serializers.ModelSerializer):
             "quantity",
             "description",
             "sold_quantity",
+            "held_quantity",
+            "available_quantity",
         ]
 
 
@@ -178,7 +183,10 @@ class ProfileEventSerializer(serializers.ModelSerializer):
     organizer_profile_picture = serializers.CharField(
         source="organizer.profile_picture", read_only=True
     )
-    like_count = serializers.SerializerMethodField()
+    organizer_profile_picture_variants = ImageVariantsField(
+        source="organizer.profile_picture_variants"
+    )
+    event_banner_variants = ImageVariantsField()
     liked = serializers.SerializerMethodField()
 
     class Meta:
@@ -201,15 +209,14 @@ class ProfileEventSerializer(serializers.ModelSerializer):
             "cancel_ticket",
             "special_instructions",
             "event_banner",
+            "event_banner_variants",
             "organizer_username",
             "organizer_profile_picture",
+            "organizer_profile_picture_variants",
             "like_count",
             "liked",
         ]
 
-    def get_like_count(self, obj):
-        return obj.likes.count()
-
     def get_liked(self, obj):
         request = self.context.get("request")
         if request and request.user.is_authenticated:
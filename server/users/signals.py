@@ -1,17 +1,26 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from event.models import Ticket, Event, TicketPurchase
-from users.models import Booking
-from services.badge_service import check_and_assign_badges
+from event.models import Ticket, Event, TicketPurchase, Review
+from services.badge_service import record_progress
 
 
-@receiver(post_save, sender=Booking)
-def ticket_purchase(sender, instance, created, **kwargs):
+@receiver(post_save, sender=Event)
+def check_after_event_creation(sender, instance, created, **kwargs):
     if created:
-        check_and_assign_badges(instance.user)
+        record_progress(instance.organizer_id, "event_created")
 
 
-@receiver(post_save, sender=Event)
-def check_after_event_creation(sender, instance, created, **kwargs):
+@receiver(post_delete, sender=Event)
+def event_removed(sender, instance, **kwargs):
+    record_progress(instance.organizer_id, "event_created", -1)
+
+
+@receiver(post_save, sender=Review)
+def review_given(sender, instance, created, **kwargs):
     if created:
-        check_and_assign_badges(instance.organizer)
+        record_progress(instance.user_id, "feedback_given")
+
+
+@receiver(post_delete, sender=Review)
+def review_removed(sender, instance, **kwargs):
+    record_progress(instance.user_id, "feedback_given", -1)
@@ -6,14 +6,18 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-@shared_task
-def send_user_notification(user_id, message):
+@shared_task(bind=True)
+def send_user_notification(self, user_id, message):
     try:
         from users.models import Profile
         from chat.models import Notification
         from django.conf import settings
+        from services import outbox_service
         import socketio
 
+        if outbox_service.already_delivered(self.request.id):
+            return f"Notification {self.request.id} already sent"
+
         user = Profile.objects.get(id=user_id)
         notification = Notification.objects.create(user=user, message=message)
 
@@ -52,6 +56,7 @@ def send_user_notification(user_id, message):
             logger.error(traceback.format_exc())
             raise
 
+        outbox_service.mark_delivered(self.request.id)
         return f"Notification sent to user {user_id}"
 
     except Exception as e:
@@ -109,3 +114,33 @@ def test_celery(test):
 @shared_task
 def distribute_event_revenue():
     pass
+
+
+@shared_task
+def purge_idempotency_keys():
+    try:
+        from users.utils.idempotency_utils import purge_expired
+
+        deleted = purge_expired()
+        logger.info(f"Purged {deleted} expired idempotency keys")
+        return f"Purged {deleted} expired idempotency keys"
+    except Exception as e:
+        logger.error(f"Error purging idempotency keys: {str(e)}")
+        raise
+
+
+@shared_task
+def award_badges(user_id, criteria, old, new):
+    try:
+        from users.models import Profile
+        from services import badge_service
+
+        profile = Profile.objects.filter(pk=user_id).first()
+        if profile is None:
+            return f"User {user_id} no longer exists"
+        awarded = badge_service.award_badges(profile, criteria, old, new)
+        logger.info(f"Awarded {awarded} {criteria} badges to user {user_id}")
+        return f"Awarded {awarded} {criteria} badges to user {user_id}"
+    except Exception as e:
+        logger.error(f"Error awarding badges to user {user_id}: {str(e)}")
+        raise
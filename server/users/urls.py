@@ -28,6 +28,7 @@ urlpatterns = [
         "update-profile-picture/", UpdateProfilePicture, name="update_profile_picture"
     ),
     path("checkout/", CheckoutAPIView.as_view(), name="checkout"),
+    path("checkout/hold/", TicketHoldAPIView.as_view(), name="checkout-hold"),
     path("apply-coupon/", ApplyCouponAPIView.as_view(), name="apply-coupon"),
     path("my-events/", joined_events, name="my-events"),
     path("cancel-ticket/", cancel_ticket, name="cancel-ticket"),
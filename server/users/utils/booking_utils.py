@@ -0,0 +1,31 @@
+import uuid
+from decimal import Decimal
+from event.models import TicketPurchase
+from users.models import Booking
+
+
+def create_ticket_purchases(booking, holds):
+    """
+    Create one TicketPurchase per converted hold and link them all to the
+    booking, in one INSERT each.
+    """
+    purchases = TicketPurchase.objects.bulk_create(
+        [
+            TicketPurchase(
+                buyer_id=booking.user_id,
+                event_id=booking.event_id,
+                ticket=hold.ticket,
+                quantity=hold.quantity,
+                used_tickets=0,
+                total_price=Decimal(hold.ticket.price) * Decimal(hold.quantity),
+                unique_qr_code=str(uuid.uuid4()),
+                booking_id=str(booking.booking_id),
+            )
+            for hold in holds
+        ]
+    )
+    links = Booking.ticket_purchases.through
+    links.objects.bulk_create(
+        [links(booking_id=booking.pk, ticketpurchase_id=p.pk) for p in purchases]
+    )
+    return purchases
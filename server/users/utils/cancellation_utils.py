@@ -0,0 +1,159 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+from rest_framework.exceptions import ValidationError
+from event import holds as ticket_holds
+from event.models import TicketPurchase
+from users.models import Booking, TicketRefund, Wallet, WalletTransaction
+
+
+def requested_quantities(tickets_to_cancel):
+    """
+    ``{purchase_id: quantity}`` from the request's ``tickets`` list, in
+    request order, with repeated ids added together.
+    """
+    requested = {}
+    for ticket_data in tickets_to_cancel:
+        ticket_id = ticket_data.get("ticket_id")
+        quantity = ticket_data.get("quantity", 0)
+        try:
+            ticket_id, quantity = int(ticket_id), int(quantity)
+        except (TypeError, ValueError):
+            raise ValidationError("Invalid ticket_id or quantity.")
+        if ticket_id <= 0 or quantity <= 0:
+            raise ValidationError("Invalid ticket_id or quantity.")
+        requested[ticket_id] = requested.get(ticket_id, 0) + quantity
+    return requested
+
+
+def cancel_tickets(user, booking, wallet, tickets_to_cancel):
+    """
+    Cancel part or all of a booking and refund the wallet. The booking and
+    the affected purchases are locked and read in two queries, refunds are
+    worked out in memory, and every write is a set-based or F() update, all
+    in one transaction. Returns ``(total_refund, canceled_tickets)``;
+    raises ValidationError, with nothing written, if any line is invalid.
+    """
+    requested = requested_quantities(tickets_to_cancel)
+    event = booking.event
+
+    with transaction.atomic():
+        # Serializes cancellations of one booking, so the discount share and
+        # the remaining ticket count below are read after any earlier cancel.
+        booking = Booking.objects.select_for_update().get(pk=booking.pk)
+        purchases = {
+            purchase.pk: purchase
+            for purchase in TicketPurchase.objects.select_for_update(of=("self",))
+            .select_related("ticket")
+            .filter(pk__in=requested, buyer=user, event=event, booking=booking)
+            .order_by("pk")
+        }
+        for ticket_id, quantity in requested.items():
+            purchase = purchases.get(ticket_id)
+            if purchase is None:
+                raise ValidationError(
+                    f"Ticket {ticket_id} does not belong to booking {booking.booking_id}."
+                )
+            if quantity > purchase.quantity:
+                raise ValidationError(
+                    f"Cannot cancel more than {purchase.quantity} tickets for ticket {ticket_id}."
+                )
+
+        total_all_ticket_count = (
+            TicketPurchase.objects.filter(
+                event=event, buyer=user, booking_id=str(booking.booking_id)
+            ).aggregate(Sum("quantity"))["quantity__sum"]
+            or 0
+        )
+
+        refund_amount = Decimal("0.00")
+        total_cancel_ticket_count = 0
+        seats = {}
+        emptied, reduced = [], {}
+        refunds, canceled_tickets = [], []
+        for ticket_id, quantity in requested.items():
+            purchase = purchases[ticket_id]
+            refund_for_ticket = purchase.total_price / purchase.quantity * quantity
+            refund_amount += refund_for_ticket
+            total_cancel_ticket_count += quantity
+            seats[purchase.ticket_id] = seats.get(purchase.ticket_id, 0) + quantity
+            if quantity == purchase.quantity:
+                emptied.append(ticket_id)
+            else:
+                reduced[ticket_id] = (quantity, refund_for_ticket)
+            refunds.append((purchase.ticket.ticket_type, quantity, refund_for_ticket))
+            canceled_tickets.append(
+                {
+                    "ticket_id": ticket_id,
+                    "ticket_type": purchase.ticket.ticket_type,
+                    "quantity": quantity,
+                    "refund_amount": float(refund_for_ticket),
+                }
+            )
+
+        ticket_holds.return_seats(event.pk, seats)
+        event.adjust_counters(
+            tickets_sold=-total_cancel_ticket_count,
+            tickets_available=total_cancel_ticket_count,
+        )
+        if emptied:
+            Booking.ticket_purchases.through.objects.filter(
+                booking_id=booking.pk, ticketpurchase_id__in=emptied
+            ).delete()
+            TicketPurchase.objects.filter(pk__in=emptied).delete()
+        if reduced:
+            TicketPurchase.objects.filter(pk__in=reduced).update(
+                quantity=Case(
+                    *[
+                        When(pk=pk, then=F("quantity") - Value(quantity))
+                        for pk, (quantity, _) in reduced.items()
+                    ]
+                ),
+                total_price=Case(
+                    *[
+                        When(pk=pk, then=F("total_price") - Value(refund))
+                        for pk, (_, refund) in reduced.items()
+                    ]
+                ),
+            )
+
+        final_refund_amount = refund_amount
+        if booking.track_discount > 0:
+            price_per_unit_refund_decrease = (
+                booking.track_discount / total_all_ticket_count
+            )
+            final_refund_amount = refund_amount - (
+                total_cancel_ticket_count * price_per_unit_refund_decrease
+            )
+            new_track_discount = booking.track_discount - round(
+                total_cancel_ticket_count * price_per_unit_refund_decrease, 2
+            )
+            booking.track_discount = max(0, new_track_discount)
+            booking.save(update_fields=["track_discount"])
+
+        if final_refund_amount > 0:
+            Wallet.objects.filter(pk=wallet.pk).update(
+                balance=F("balance") + final_refund_amount
+            )
+            wallet_transaction = WalletTransaction.objects.create(
+                wallet=wallet,
+                transaction_type="REFUND",
+                amount=final_refund_amount,
+                description=f"Refund for canceled tickets from {event.event_title}",
+                booking=booking,
+            )
+            TicketRefund.objects.bulk_create(
+                [
+                    TicketRefund(
+                        wallet_transaction=wallet_transaction,
+                        ticket_type=ticket_type,
+                        quantity=quantity,
+                        amount=amount,
+                        event=event,
+                        booking=booking,
+                    )
+                    for ticket_type, quantity, amount in refunds
+                ]
+            )
+
+    return final_refund_amount, canceled_tickets
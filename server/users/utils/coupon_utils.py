@@ -1,61 +1,67 @@
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.db.models import Exists, F, OuterRef
 from django.utils import timezone
-from django.shortcuts import get_object_or_404
 from rest_framework.exceptions import ValidationError
-from Admin.models import Coupon
-from event.models import Event
+from Admin.models import Coupon, CouponRedemption
 from decimal import Decimal
 
+COUPON_CACHE_TIMEOUT = 60 * 5
 
-def validate_coupon(code, user, event_id):
-    coupon = get_object_or_404(Coupon, code=code, is_active=True)
-    event = get_object_or_404(Event, id=event_id, is_published=True)
 
-    now = timezone.now().date()
-    if now < coupon.start_date or now > coupon.end_date:
-        raise ValidationError("Coupon is not valid at this time.")
+def coupon_cache_key(code):
+    return f"coupon:{code}"
 
-    if coupon.used_count >= coupon.usage_limit:
-        raise ValidationError("Coupon usage limit reached.")
-
-    if coupon.used_by.filter(id=user.id).exists():
-        raise ValidationError("You have already used this coupon.")
-
-    return coupon, event
 
+def invalidate_coupon(code):
+    cache.delete(coupon_cache_key(code))
 
-def calculate_coupon_discount(coupon, event, request_data):
-    subtotal = sum(
-        float(ticket.price) * int(request_data.get(ticket.ticket_type, 0))
-        for ticket in event.tickets.all()
-    )
-
-    if subtotal < float(coupon.min_order_amount):
-        raise ValidationError(
-            f"Order amount must be at least ₹{coupon.min_order_amount} to use this coupon."
-        )
 
-    if coupon.discount_type == "percentage":
-        discount = (subtotal * float(coupon.discount_value)) / 100
-    else:
-        discount = float(coupon.discount_value)
-    return subtotal, discount
+def get_coupon(code):
+    """
+    The active coupon with this code. Definitions are cached; usage counts
+    are always read from the database by evaluate_coupon.
+    """
+    key = coupon_cache_key(code)
+    coupon = cache.get(key)
+    if coupon is None:
+        coupon = Coupon.objects.filter(code=code, is_active=True).first()
+        if coupon is None:
+            raise ValidationError("Invalid coupon code.")
+        cache.set(key, coupon, COUPON_CACHE_TIMEOUT)
+    return coupon
 
 
-def validate_and_apply_coupon(code, user, event, selected_tickets):
-    coupon = get_object_or_404(Coupon, code=code, is_active=True)
+def evaluate_coupon(code, user, subtotal):
+    """
+    Check that ``user`` can use the coupon on an order of ``subtotal`` and
+    return ``(coupon, discount)``. Costs one query on a cache hit.
+    """
+    coupon = get_coupon(code)
 
-    now = timezone.now().date()
-    if now < coupon.start_date or now > coupon.end_date:
+    today = timezone.now().date()
+    if today < coupon.start_date or today > coupon.end_date:
         raise ValidationError("Coupon expired or not yet active.")
-    if coupon.used_by.filter(id=user.id).exists():
-        raise ValidationError("You have already used this coupon.")
-    if coupon.used_count >= coupon.usage_limit:
-        raise ValidationError("Coupon usage limit reached.")
 
-    subtotal = sum(
-        Decimal(ticket.price) * Decimal(selected_tickets.get(ticket.ticket_type, 0))
-        for ticket in event.tickets.all()
+    state = (
+        Coupon.objects.filter(pk=coupon.pk, code=code, is_active=True)
+        .annotate(
+            redeemed=Exists(
+                CouponRedemption.objects.filter(coupon=OuterRef("pk"), user=user)
+            )
+        )
+        .values_list("used_count", "usage_limit", "redeemed")
+        .first()
     )
+    if state is None:
+        # Deactivated or renamed since it was cached.
+        invalidate_coupon(code)
+        raise ValidationError("Invalid coupon code.")
+    used_count, usage_limit, redeemed = state
+    if redeemed:
+        raise ValidationError("You have already used this coupon.")
+    if used_count >= usage_limit:
+        raise ValidationError("Coupon usage limit reached.")
 
     if subtotal < Decimal(coupon.min_order_amount):
         raise ValidationError(f"Minimum order amount is ₹{coupon.min_order_amount}.")
@@ -64,5 +70,23 @@ def validate_and_apply_coupon(code, user, event, selected_tickets):
         discount = Decimal(coupon.discount_value)
     else:
         discount = (subtotal * Decimal(coupon.discount_value)) / Decimal("100")
+    return coupon, discount
+
+
+def redeem_coupon(coupon, user, booking):
+    """
+    Record that ``user`` used the coupon for ``booking``. Must run inside the
+    checkout transaction; raises if the user already redeemed it or the
+    usage limit was reached since the coupon was evaluated.
+    """
+    try:
+        CouponRedemption.objects.create(coupon=coupon, user=user, booking=booking)
+    except IntegrityError:
+        # No savepoint: the error rolls back the whole checkout anyway.
+        raise ValidationError("You have already used this coupon.")
 
-    return coupon, subtotal, discount
+    claimed = Coupon.objects.filter(
+        pk=coupon.pk, is_active=True, used_count__lt=F("usage_limit")
+    ).update(used_count=F("used_count") + 1)
+    if not claimed:
+        raise ValidationError("Coupon usage limit reached.")
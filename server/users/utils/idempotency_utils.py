@@ -0,0 +1,289 @@
+"""
+Idempotency-Key support for endpoints that move money.
+
+A client that retries a request sends the same ``Idempotency-Key`` header.
+The first request claims the key with an IdempotencyKey row (the unique
+constraint makes the claim exactly-once) and a short Redis lock, which only
+its holder releases. Its response is stored in the row and in the cache,
+and every later request with that key gets the stored response back
+without running the view again. Retries that arrive while the first
+request is still running poll the cache for its response instead of
+queueing on the same row locks.
+
+Requests without the header behave as before. Responses with a 5xx or 429
+status are not stored, so those requests can be retried with the same key.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import time
+import uuid
+from datetime import timedelta
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from users.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+KEY_TTL = timedelta(hours=24)
+# Longer than any checkout, Stripe call included.
+LOCK_TIMEOUT = 60
+WAIT_TIMEOUT = 10.0
+POLL_INTERVAL = 0.1
+
+# KEYS: lock; ARGV: token
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def result_key(user_id, scope, key):
+    return f"idempotency:{user_id}:{scope}:{key}"
+
+
+def lock_key(user_id, scope, key):
+    return f"idempotency:{user_id}:{scope}:{key}:lock"
+
+
+def acquire_lock(user_id, scope, key):
+    """
+    Take the key's lock and return its token, False if another request
+    holds it, or None if Redis is unreachable.
+    """
+    token = uuid.uuid4().hex
+    try:
+        acquired = get_redis_connection("default").set(
+            lock_key(user_id, scope, key), token, nx=True, ex=LOCK_TIMEOUT
+        )
+    except RedisError as e:
+        logger.warning(f"Idempotency lock unavailable: {e}")
+        return None
+    return token if acquired else False
+
+
+def release_lock(user_id, scope, key, token):
+    # Compare-and-delete: once our lock has expired another request may
+    # hold the key, and its lock must stay.
+    try:
+        get_redis_connection("default").eval(
+            RELEASE_SCRIPT, 1, lock_key(user_id, scope, key), token
+        )
+    except RedisError as e:
+        logger.warning(f"Could not release idempotency lock: {e}")
+
+
+def lock_held(user_id, scope, key):
+    try:
+        return bool(
+            get_redis_connection("default").exists(lock_key(user_id, scope, key))
+        )
+    except RedisError:
+        return False
+
+
+def fingerprint(request):
+    data = request.data
+    if hasattr(data, "lists"):
+        data = dict(data.lists())
+    payload = json.dumps(
+        [request.method, request.path, data],
+        sort_keys=True,
+        cls=DjangoJSONEncoder,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def replay(stored):
+    return Response(
+        stored["response"],
+        status=stored["status_code"],
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def mismatch():
+    return Response(
+        {"error": f"This {HEADER} was already used for a different request."},
+        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+    )
+
+
+def in_progress():
+    return Response(
+        {"error": f"A request with this {HEADER} is still being processed."},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+def stored_result(user, scope, key):
+    """
+    The stored ``{fingerprint, status_code, response}`` for a key, from the
+    cache or else the database; None while the first request is running.
+    """
+    stored = cache.get(result_key(user.id, scope, key))
+    if stored is not None:
+        return stored
+    record = (
+        IdempotencyKey.objects.filter(
+            user=user,
+            scope=scope,
+            key=key,
+            status_code__isnull=False,
+            created_at__gt=timezone.now() - KEY_TTL,
+        )
+        .values("fingerprint", "status_code", "response")
+        .first()
+    )
+    if record is not None:
+        cache.set(result_key(user.id, scope, key), record, KEY_TTL.total_seconds())
+    return record
+
+
+def wait_for_result(user, scope, key):
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        stored = cache.get(result_key(user.id, scope, key))
+        if stored is not None:
+            return stored
+        if not lock_held(user.id, scope, key):
+            # The first request finished, or died, without caching a response.
+            return stored_result(user, scope, key)
+        time.sleep(POLL_INTERVAL)
+    return None
+
+
+def claim(user, scope, key, request_fingerprint):
+    """
+    Insert the key's row and return it, or return None if another request
+    holds it. A row left behind by a request that never finished is taken
+    over once its lock has expired.
+    """
+    try:
+        return IdempotencyKey.objects.create(
+            user=user, scope=scope, key=key, fingerprint=request_fingerprint
+        )
+    except IntegrityError:
+        pass
+    record = IdempotencyKey.objects.filter(user=user, scope=scope, key=key).first()
+    if record is None:
+        return None
+    expired = record.created_at <= timezone.now() - KEY_TTL
+    abandoned = (
+        record.status_code is None
+        and record.created_at <= timezone.now() - timedelta(seconds=LOCK_TIMEOUT)
+    )
+    if not (expired or abandoned):
+        return None
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, created_at=record.created_at
+    ).update(
+        fingerprint=request_fingerprint,
+        status_code=None,
+        response=None,
+        created_at=timezone.now(),
+    )
+    return record if taken else None
+
+
+def idempotent(scope):
+    """
+    Make a view honour the Idempotency-Key header. Works on APIView methods
+    and on @api_view functions; put it below the DRF decorators.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, Request))
+            key = request.headers.get(HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            user = request.user
+            request_fingerprint = fingerprint(request)
+            stored = stored_result(user, scope, key)
+            token = None
+            if stored is None:
+                token = acquire_lock(user.id, scope, key)
+                # None means Redis is down; the row's unique constraint in
+                # claim() still keeps the request single.
+                if token is False:
+                    stored = wait_for_result(user, scope, key)
+                    if stored is None:
+                        return in_progress()
+            if stored is not None:
+                if stored["fingerprint"] != request_fingerprint:
+                    return mismatch()
+                return replay(stored)
+
+            try:
+                record = claim(user, scope, key, request_fingerprint)
+                if record is None:
+                    stored = stored_result(user, scope, key)
+                    if stored is None:
+                        return in_progress()
+                    if stored["fingerprint"] != request_fingerprint:
+                        return mismatch()
+                    return replay(stored)
+
+                try:
+                    response = view(*args, **kwargs)
+                except Exception:
+                    record.delete()
+                    raise
+                if (
+                    response.status_code >= 500
+                    or response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+                    or not hasattr(response, "data")
+                ):
+                    record.delete()
+                    return response
+
+                record.status_code = response.status_code
+                record.response = json.loads(
+                    json.dumps(response.data, cls=DjangoJSONEncoder)
+                )
+                record.save(update_fields=["status_code", "response"])
+                cache.set(
+                    result_key(user.id, scope, key),
+                    {
+                        "fingerprint": request_fingerprint,
+                        "status_code": record.status_code,
+                        "response": record.response,
+                    },
+                    KEY_TTL.total_seconds(),
+                )
+                return response
+            finally:
+                if token:
+                    release_lock(user.id, scope, key, token)
+
+        return wrapper
+
+    return decorator
+
+
+def purge_expired(now=None):
+    now = now or timezone.now()
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lte=now - KEY_TTL).delete()
+    return deleted
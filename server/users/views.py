@@ -58,27 +58,32 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 
 User = get_user_model()
-from django.shortcuts import get_object_or_404
+from django.shortcuts import get_list_or_404, get_object_or_404
 from django.utils import timezone
 from decimal import Decimal
 import uuid
 import stripe
 from datetime import datetime, timedelta
-from django.db.models import Sum
+from django.db.models import Exists, OuterRef, Sum
 from rest_framework.pagination import PageNumberPagination
 import logging
 from django.db import transaction
 from django.conf import settings
 from .tasks import send_user_notification
+from event.tasks import generate_image_variants
 import os
 import re
-from .utils.coupon_utils import (
-    validate_coupon,
-    calculate_coupon_discount,
-    validate_and_apply_coupon,
-)
+from .utils.coupon_utils import evaluate_coupon, redeem_coupon
 from django.core.exceptions import ValidationError
 from .utils.payment_utils import handle_wallet_payment, handle_stripe_payment
+from .utils.booking_utils import create_ticket_purchases
+from .utils.cancellation_utils import cancel_tickets
+from .utils.idempotency_utils import idempotent
+from rest_framework.exceptions import ValidationError as DRFValidationError
+from event import holds as ticket_holds
+from event import waiting_room
+from services import outbox_service
+from services.badge_service import record_progress
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 logger = logging.getLogger(__name__)
@@ -287,6 +292,8 @@ def google_login(request):
                 "profile_picture": profile_picture,
             },
         )
+        if created and user.profile_picture:
+            generate_image_variants.delay("profile_picture", user.pk)
         refresh = RefreshToken.for_user(user)
         access_token = str(refresh.access_token)
 
@@ -502,7 +509,9 @@ def UpdateProfilePicture(request):
         if "profile_picture" in request.FILES:
             upload_result = cloudinary.uploader.upload(request.FILES["profile_picture"])
             user.profile_picture = upload_result["url"]
+            user.profile_picture_variants = {}
             user.save()
+            generate_image_variants.delay("profile_picture", user.pk)
 
         return Response(
             {
@@ -549,34 +558,139 @@ class ApplyCouponAPIView(APIView):
         code = request.data.get("coupon_code")
         event_id = request.data.get("event_id")
         user = request.user
+        tickets = get_list_or_404(Ticket, event_id=event_id, event__is_published=True)
         try:
-            coupon, event = validate_coupon(code, user, event_id)
-            subtotal, discount = calculate_coupon_discount(coupon, event, request.data)
+            subtotal = sum(
+                Decimal(ticket.price) * int(request.data.get(ticket.ticket_type, 0))
+                for ticket in tickets
+            )
+            coupon, discount = evaluate_coupon(code, user, subtotal)
             return Response(
                 {
                     "code": coupon.code,
-                    "discount": discount,
-                    "subtotal": subtotal,
-                    "total": subtotal - discount,
+                    "discount": float(discount),
+                    "subtotal": float(subtotal),
+                    "total": float(subtotal - discount),
                 },
                 status=status.HTTP_200_OK,
             )
-        except ValidationError as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "Invalid ticket selection."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except DRFValidationError as e:
+            return Response(
+                {"error": error_message(e)}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+
+class TicketHoldAPIView(APIView):
+    """
+    Reserve tickets for a few minutes before checkout (POST) or give up a
+    reservation (DELETE). Pass the returned reservation_id to checkout.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        event_id = request.data.get("event_id")
+        selected_tickets = request.data.get("selected_tickets", {})
+        if not event_id or not selected_tickets:
+            return Response(
+                {"error": "Missing required fields."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        event = get_object_or_404(Event, id=event_id, is_published=True)
+        blocked = waiting_room_response(event, request.user)
+        if blocked is not None:
+            return blocked
+        try:
+            reservation_id, holds = ticket_holds.place_holds(
+                request.user, event, selected_tickets
+            )
+        except DRFValidationError as e:
+            return Response(
+                {"error": error_message(e)}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {
+                "reservation_id": str(reservation_id),
+                "expires_at": holds[0].expires_at,
+                "holds": [
+                    {"ticket_type": hold.ticket.ticket_type, "quantity": hold.quantity}
+                    for hold in holds
+                ],
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    def delete(self, request):
+        reservation_id = request.data.get("reservation_id")
+        try:
+            uuid.UUID(str(reservation_id))
+        except ValueError:
+            return Response(
+                {"error": "Invalid reservation."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        released = ticket_holds.release_reservation(request.user, reservation_id)
+        return Response({"released": released}, status=status.HTTP_200_OK)
+
+
+def error_message(exc):
+    detail = exc.detail
+    if isinstance(detail, list):
+        return " ".join(str(item) for item in detail)
+    return str(detail)
+
+
+def waiting_room_response(event, user):
+    """
+    The response for a buyer who has to wait in the event's waiting room
+    before reserving tickets, or None if they may go ahead.
+    """
+    if not event.queue_enabled:
+        return None
+    try:
+        if waiting_room.is_admitted(event.id, user.id):
+            return None
+    except redis.RedisError as e:
+        logger.error(f"Waiting room unavailable for event {event.id}: {str(e)}")
+        return Response(
+            {"error": "Ticket sales are busy, please try again shortly."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    return Response(
+        {
+            "error": "Join the waiting room to buy tickets for this event.",
+            "waiting_room": True,
+        },
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+    )
 
 
 class CheckoutAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent("checkout")
     def post(self, request):
+        holds, booking, payment_intent = [], None, None
+        settled = False
         try:
             event_id = request.data.get("event_id")
             payment_method = request.data.get("payment_method")
             coupon_code = request.data.get("coupon_code")
             selected_tickets = request.data.get("selected_tickets", {})
+            reservation_id = request.data.get("reservation_id")
             stripe_payment_method_id = request.data.get("stripe_payment_method_id")
 
-            if not event_id or not payment_method or not selected_tickets:
+            if (
+                not event_id
+                or not payment_method
+                or not (selected_tickets or reservation_id)
+            ):
                 return Response(
                     {"error": "Missing required fields."},
                     status=status.HTTP_400_BAD_REQUEST,
@@ -585,187 +699,204 @@ class CheckoutAPIView(APIView):
             event = get_object_or_404(Event, id=event_id, is_published=True)
             user = request.user
 
-            with transaction.atomic():
-                subtotal = Decimal("0")
-                ticket_purchases = []
+            if not reservation_id:
+                blocked = waiting_room_response(event, user)
+                if blocked is not None:
+                    return blocked
 
-                for ticket_type, quantity in selected_tickets.items():
-                    if quantity <= 0:
-                        continue
+            # Seats are reserved in a short transaction of their own, so no
+            # ticket row stays locked while the payment provider is called.
+            try:
+                if reservation_id:
+                    holds = ticket_holds.extend_holds(user, event, reservation_id)
+                else:
+                    _, holds = ticket_holds.place_holds(
+                        user, event, selected_tickets, ttl=ticket_holds.PAYMENT_TTL
+                    )
+            except DRFValidationError as e:
+                return Response(
+                    {"error": error_message(e)}, status=status.HTTP_400_BAD_REQUEST
+                )
+            selected_tickets = {
+                hold.ticket.ticket_type: hold.quantity for hold in holds
+            }
 
-                    ticket = event.tickets.select_for_update().get(
-                        ticket_type=ticket_type
+            subtotal = sum(
+                Decimal(hold.ticket.price) * Decimal(hold.quantity) for hold in holds
+            )
+            coupon = None
+            discount = Decimal("0")
+            if coupon_code:
+                try:
+                    coupon, discount = evaluate_coupon(coupon_code, user, subtotal)
+                except DRFValidationError as e:
+                    ticket_holds.release_holds([hold.pk for hold in holds])
+                    return Response(
+                        {"error": error_message(e)},
+                        status=status.HTTP_400_BAD_REQUEST,
                     )
 
-                    if ticket.quantity - ticket.sold_quantity < quantity:
-                        return Response(
-                            {"error": f"Not enough {ticket_type} tickets available."},
-                            status=status.HTTP_400_BAD_REQUEST,
-                        )
+            total = subtotal - discount
+            if total < 0:
+                total = Decimal("0")
 
-                    subtotal += Decimal(ticket.price) * Decimal(quantity)
+            total_in_cents = int(total * 100)
+            track_discount = subtotal - total
 
-                coupon = None
-                discount = Decimal("0")
-                if coupon_code:
-                    coupon, subtotal, discount = validate_and_apply_coupon(
-                        coupon_code, user, event, selected_tickets
-                    )
+            booking = Booking.objects.create(
+                user=user,
+                event=event,
+                payment_method=payment_method,
+                subtotal=subtotal,
+                discount=discount,
+                total=total,
+                track_discount=track_discount,
+                coupon=coupon,
+            )
 
-                total = subtotal - discount
-                if total < 0:
-                    total = Decimal("0")
-
-                total_in_cents = int(total * 100)
-                track_discount = subtotal - total
-
-                booking = Booking.objects.create(
-                    user=user,
-                    event=event,
-                    payment_method=payment_method,
-                    subtotal=subtotal,
-                    discount=discount,
-                    total=total,
-                    track_discount=track_discount,
-                    coupon=coupon,
+            if payment_method == "stripe":
+                payment_intent = handle_stripe_payment(
+                    stripe_payment_method_id,
+                    total_in_cents,
+                    booking,
+                    event.event_title,
+                    user,
+                    event_id,
                 )
-
-                for ticket_type, quantity in selected_tickets.items():
-                    if quantity <= 0:
-                        continue
-
-                    ticket = event.tickets.get(ticket_type=ticket_type)
-                    ticket.sold_quantity += quantity
-                    ticket.save()
-
-                    qr_code = str(uuid.uuid4())
-                    purchase = TicketPurchase.objects.create(
-                        buyer=user,
-                        event=event,
-                        ticket=ticket,
-                        quantity=quantity,
-                        used_tickets=0,
-                        total_price=Decimal(ticket.price) * Decimal(quantity),
-                        unique_qr_code=qr_code,
-                        booking_id=str(booking.booking_id),
-                    )
-                    booking.ticket_purchases.add(purchase)
-                    ticket_purchases.append(
-                        {
-                            "ticket_type": ticket_type,
-                            "quantity": quantity,
-                            "qr_code": qr_code,
-                        }
+                if payment_intent.status not in ("succeeded", "requires_action"):
+                    payment_intent = None
+                    booking.delete()
+                    ticket_holds.release_holds([hold.pk for hold in holds])
+                    return Response(
+                        {"error": "Payment failed."},
+                        status=status.HTTP_400_BAD_REQUEST,
                     )
 
-                if coupon:
-                    coupon.used_count += 1
-                    coupon.used_by.add(user)
-                    coupon.save()
-
+            with transaction.atomic():
                 if payment_method == "wallet":
                     handle_wallet_payment(user, total, booking, event.event_title)
-                elif payment_method == "stripe":
-                    payment_intent = handle_stripe_payment(
-                        stripe_payment_method_id,
-                        total_in_cents,
-                        booking,
-                        event.event_title,
-                        user,
-                        event_id,
-                    )
-                    if payment_intent.status == "requires_action":
-                        return Response(
-                            {
-                                "requires_action": True,
-                                "payment_intent_client_secret": payment_intent.client_secret,
-                                "booking_id": str(booking.booking_id),
-                            },
-                            status=status.HTTP_200_OK,
-                        )
-                    elif payment_intent.status != "succeeded":
-                        booking.delete()
-                        return Response(
-                            {"error": "Payment failed."},
-                            status=status.HTTP_400_BAD_REQUEST,
-                        )
 
-                try:
-                    if hasattr(event, "group_chat") and event.group_chat:
-                        event.group_chat.participants.add(user)
-                        send_user_notification.delay(
-                            user_id=user.id,
-                            message=f"You entered {event.event_title} group chat",
-                        )
-                except Exception as e:
-                    logger.error(f"Error adding user to group chat: {str(e)}")
+                ticket_holds.convert_holds(holds)
 
-                send_user_notification.delay(
-                    user_id=user.id,
-                    message=f"Booking successful for {event.event_title}",
-                )
+                purchases = create_ticket_purchases(booking, holds)
+                if coupon:
+                    redeem_coupon(coupon, user, booking)
+                # Credited only here, so a declined payment earns no badge.
+                record_progress(user.id, "event_attended")
+
+                if not (
+                    payment_intent is not None
+                    and payment_intent.status == "requires_action"
+                ):
+                    outbox_service.enqueue(
+                        send_user_notification,
+                        user_id=user.id,
+                        message=f"Booking successful for {event.event_title}",
+                    )
+            settled = True
 
+            ticket_purchases = [
+                {
+                    "ticket_type": purchase.ticket.ticket_type,
+                    "quantity": purchase.quantity,
+                    "qr_code": purchase.unique_qr_code,
+                }
+                for purchase in purchases
+            ]
+
+            if (
+                payment_intent is not None
+                and payment_intent.status == "requires_action"
+            ):
                 return Response(
                     {
-                        "message": "Payment successful!",
+                        "requires_action": True,
+                        "payment_intent_client_secret": payment_intent.client_secret,
                         "booking_id": str(booking.booking_id),
-                        "total": str(total),
-                        "ticket_purchases": ticket_purchases,
                     },
-                    status=status.HTTP_201_CREATED,
+                    status=status.HTTP_200_OK,
                 )
 
+            try:
+                if hasattr(event, "group_chat") and event.group_chat:
+                    with transaction.atomic():
+                        event.group_chat.participants.add(user)
+                        outbox_service.enqueue(
+                            send_user_notification,
+                            user_id=user.id,
+                            message=f"You entered {event.event_title} group chat",
+                        )
+            except Exception as e:
+                logger.error(f"Error adding user to group chat: {str(e)}")
+
+            return Response(
+                {
+                    "message": "Payment successful!",
+                    "booking_id": str(booking.booking_id),
+                    "total": str(total),
+                    "ticket_purchases": ticket_purchases,
+                },
+                status=status.HTTP_201_CREATED,
+            )
+
         except stripe.error.CardError as e:
-            if "booking" in locals():
-                booking.delete()
+            if not settled:
+                self.abandon(booking, holds, payment_intent)
             return Response(
                 {"error": str(e.user_message)}, status=status.HTTP_400_BAD_REQUEST
             )
         except stripe.error.StripeError:
-            if "booking" in locals():
-                booking.delete()
+            if not settled:
+                self.abandon(booking, holds, payment_intent)
             return Response(
                 {"error": "Something went wrong with the payment."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+        except DRFValidationError as e:
+            # The reservation expired or the coupon ran out while paying.
+            if not settled:
+                self.abandon(booking, holds, payment_intent)
+            return Response(
+                {"error": error_message(e)}, status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
-            if "booking" in locals():
-                booking.delete()
+            if not settled:
+                self.abandon(booking, holds, payment_intent)
             return Response(
                 {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def abandon(self, booking, holds, payment_intent):
+        """
+        Undo a checkout that failed after its seats were reserved.
+        """
+        if payment_intent is not None:
+            # Charged, but the seats could not be issued (e.g. the
+            # reservation was swept in the meantime): give the money back.
+            try:
+                stripe.Refund.create(payment_intent=payment_intent.id)
+            except stripe.error.StripeError as e:
+                logger.error(f"Could not refund payment {payment_intent.id}: {str(e)}")
+        if booking is not None:
+            booking.delete()
+        if holds:
+            ticket_holds.release_holds([hold.pk for hold in holds])
+
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def joined_events(request):
     try:
         user = request.user
-        current_time = datetime.now()
-
-        future_bookings = (
-            Booking.objects.filter(
-                user=user,
-                event__start_date__gt=current_time.date(),
-                ticket_purchases__isnull=False,
-            )
-            .select_related("event")
-            .prefetch_related("ticket_purchases__ticket")
+        has_tickets = Booking.ticket_purchases.through.objects.filter(
+            booking_id=OuterRef("pk")
         )
-
-        today_bookings = (
-            Booking.objects.filter(
-                user=user,
-                event__start_date=current_time.date(),
-                event__start_time__gt=current_time.time(),
-                ticket_purchases__isnull=False,
-            )
+        all_bookings = (
+            Booking.objects.filter(user=user, event__starts_at__gt=timezone.now())
+            .filter(Exists(has_tickets))
             .select_related("event")
             .prefetch_related("ticket_purchases__ticket")
-        )
-
-        all_bookings = (
-            (future_bookings | today_bookings).distinct().order_by("-created_at")
+            .order_by("-created_at")
         )
 
         serializer = ProfileEventJoinedSerializer(
@@ -782,6 +913,7 @@ def joined_events(request):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@idempotent("cancel_ticket")
 def cancel_ticket(request):
     try:
         user = request.user
@@ -824,113 +956,14 @@ def cancel_ticket(request):
 
         wallet = get_object_or_404(Wallet, user=user)
 
-        total_all_ticket_count = (
-            TicketPurchase.objects.filter(
-                event=event, buyer=user, booking_id=booking_id
-            ).aggregate(Sum("quantity"))["quantity__sum"]
-            or 0
-        )
-
-        refund_amount = Decimal("0.00")
-        total_cancel_ticket_count = 0
-        canceled_tickets = []
-        for ticket_data in tickets_to_cancel:
-            ticket_id = ticket_data.get("ticket_id")
-            cancel_quantity = ticket_data.get("quantity", 0)
-
-            if not ticket_id or cancel_quantity <= 0:
-                return Response(
-                    {"error": "Invalid ticket_id or quantity."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-            ticket_purchase = get_object_or_404(
-                TicketPurchase, id=ticket_id, buyer=user, event=event_id
-            )
-
-            if ticket_purchase not in booking.ticket_purchases.all():
-                return Response(
-                    {
-                        "error": f"Ticket {ticket_id} does not belong to booking {booking_id}."
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            if cancel_quantity > ticket_purchase.quantity:
-                return Response(
-                    {
-                        "error": f"Cannot cancel more than {ticket_purchase.quantity} tickets for ticket {ticket_id}."
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-            ticket = ticket_purchase.ticket
-            ticket.sold_quantity = max(0, ticket.sold_quantity - cancel_quantity)
-            ticket.save()
-
-            ticket_price_per_unit = (
-                ticket_purchase.total_price / ticket_purchase.quantity
-            )
-            refund_for_ticket = ticket_price_per_unit * cancel_quantity
-            refund_amount += refund_for_ticket
-            total_cancel_ticket_count += cancel_quantity
-
-            ticket_purchase.quantity -= cancel_quantity
-            if ticket_purchase.quantity == 0:
-                booking.ticket_purchases.remove(ticket_purchase)
-                ticket_purchase.delete()
-            else:
-                ticket_purchase.total_price -= refund_for_ticket
-                ticket_purchase.save()
-
-            canceled_tickets.append(
-                {
-                    "ticket_id": ticket_id,
-                    "ticket_type": ticket.ticket_type,
-                    "quantity": cancel_quantity,
-                    "refund_amount": float(refund_for_ticket),
-                }
-            )
-
-        booking = get_object_or_404(
-            Booking, user=user, booking_id=booking_id, event=event_id
-        )
-        final_refund_amount = refund_amount
-
-        if booking.track_discount > 0:
-            price_per_unit_refund_decrease = (
-                booking.track_discount / total_all_ticket_count
-            )
-            final_refund_amount = refund_amount - (
-                total_cancel_ticket_count * price_per_unit_refund_decrease
+        try:
+            final_refund_amount, canceled_tickets = cancel_tickets(
+                user, booking, wallet, tickets_to_cancel
             )
-
-            new_track_discount = booking.track_discount - round(
-                total_cancel_ticket_count * price_per_unit_refund_decrease, 2
+        except DRFValidationError as e:
+            return Response(
+                {"error": error_message(e)}, status=status.HTTP_400_BAD_REQUEST
             )
-            booking.track_discount = max(0, new_track_discount)
-            booking.save()
-
-        if final_refund_amount > 0:
-            wallet.balance += final_refund_amount
-            wallet.save()
-
-            transaction = WalletTransaction.objects.create(
-                wallet=wallet,
-                transaction_type="REFUND",
-                amount=final_refund_amount,
-                description=f"Refund for canceled tickets from {event.event_title}",
-                booking=booking,
-            )
-
-            for ticket_info in canceled_tickets:
-                TicketRefund.objects.create(
-                    wallet_transaction=transaction,
-                    ticket_type=ticket_info["ticket_type"],
-                    quantity=ticket_info["quantity"],
-                    amount=Decimal(str(ticket_info["refund_amount"])),
-                    event=event,
-                    booking=booking,
-                )
 
         return Response(
             {
@@ -1092,6 +1125,7 @@ class SubscriptionCheckout(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    @idempotent("subscription_checkout")
     def post(self, request):
         user = request.user
         data = request.data